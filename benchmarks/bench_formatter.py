@@ -0,0 +1,131 @@
+"""
+Benchmarks of PlainTextFormatter on texts of different sizes and shapes.
+"""
+import random
+
+from harness import benchmark, measure
+from formatters import PlainTextFormatter
+
+WORDS = ("translation", "clipboard", "the", "of", "monitor", "paragraph", "a", "formatter", "text", "window")
+
+
+def pdf_text(size: int, seed: int = 1) -> str:
+    """Text copied from a PDF: short lines with words split by hyphens and sentences ending at the line break"""
+    generator = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        words = [generator.choice(WORDS) for _ in range(generator.randint(6, 12))]
+        line = " ".join(words)
+        ending = generator.random()
+        if ending < 0.3:
+            line = line[:-3] + "-"
+        elif ending < 0.4:
+            line += "."
+        elif ending < 0.45:
+            line += ":"
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def short_lines(size: int, seed: int = 2) -> str:
+    """Many lines of one or two words"""
+    generator = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(generator.choice(WORDS) for _ in range(generator.randint(1, 2)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def single_paragraph(size: int, seed: int = 3) -> str:
+    """A paragraph without line breaks"""
+    generator = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = generator.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+SHAPES = {"pdf": pdf_text, "short-lines": short_lines, "paragraph": single_paragraph}
+
+
+def baseline_format(text: str) -> str:
+    """The per-character implementation replaced by PlainTextFormatter.format, kept as the reference of its output
+    and its speed. It fails if the text ends with a hyphen or a line break"""
+    old_text = text.replace("\r", "")
+    new_text = ""
+    counter = 0
+    for character in old_text:
+        if character == "-" and old_text[counter + 1] == "\n":
+            new_text += ""
+        else:
+            if character == "\n":
+                if old_text[counter - 1] == ".":
+                    new_text += "\n\n"
+                elif old_text[counter - 1] == ":":
+                    new_text += "\n"
+                if old_text[counter + 1] == " ":
+                    new_text += "  "
+            else:
+                new_text += character
+        counter += 1
+    return new_text
+
+
+def sample(shape: str, size: int) -> str:
+    """Returns a text of the shape that both implementations can format"""
+    return SHAPES[shape](size).rstrip("-\n")
+
+
+def sizes(quick: bool) -> list:
+    return [1024, 64 * 1024] if quick else [1024, 64 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+
+
+@benchmark("formatter.format")
+def format_shapes(quick: bool) -> dict:
+    """Time of a single format call and the resulting throughput, compared with the implementation it replaced,
+    which must produce the same output"""
+    results = {}
+    formatter = PlainTextFormatter()
+    for shape in SHAPES:
+        for size in sizes(quick):
+            text = sample(shape, size)
+            assert formatter.format(text) == baseline_format(text), f"The output differs for {shape}/{size}"
+            timing = measure(lambda: formatter.format(text), repeat=3 if quick else 7)
+            timing["mb-per-second"] = len(text) / timing["median"] / 1e6
+            baseline = measure(lambda: baseline_format(text), repeat=3)
+            timing["baseline-mb-per-second"] = len(text) / baseline["median"] / 1e6
+            timing["speedup"] = baseline["median"] / timing["median"]
+            results[f"{shape}/{size}"] = timing
+    return results
+
+
+@benchmark("formatter.feed")
+def format_streaming(quick: bool) -> dict:
+    """Time to format a text sent to feed in blocks of 64 KiB, compared with a single format call"""
+    size = 1024 * 1024 if quick else 8 * 1024 * 1024
+    text = pdf_text(size)
+    blocks = [text[index : index + 65536] for index in range(0, len(text), 65536)]
+
+    def stream():
+        formatter = PlainTextFormatter()
+        for block in blocks:
+            formatter.feed(block)
+        formatter.finish()
+
+    single = measure(lambda: PlainTextFormatter().format(text), repeat=3)
+    streamed = measure(stream, repeat=3)
+    return {
+        "size": size,
+        "format-mb-per-second": size / single["median"] / 1e6,
+        "feed-mb-per-second": size / streamed["median"] / 1e6,
+        "format": single,
+        "feed": streamed,
+    }
@@ -0,0 +1,74 @@
+"""
+Benchmarks of ClipboardMonitor driven by a fake clipboard and a stub translator.
+"""
+import time
+
+from harness import benchmark, summarize, StubTranslator, RecordingRequester
+from clipboard import FakeClipboard
+from monitoring import ClipboardMonitor
+from sources import FakeChangeSource, PollingChangeSource, AdaptiveScheduler
+
+
+def _end_to_end(latency: float, copies: int) -> dict:
+    """Copies texts one after another and measures the time until the content and its translation are shown"""
+    clipboard = FakeClipboard()
+    requester = RecordingRequester()
+    monitor = ClipboardMonitor(requester, StubTranslator(latency), 0.5, FakeChangeSource(clipboard, 0.05))
+    monitor.start_monitoring()
+    source_samples = []
+    target_samples = []
+    try:
+        for index in range(copies):
+            text = f"clipboard content number {index} copied by the benchmark"
+            start = time.perf_counter()
+            clipboard.copy(text)
+            source_samples.append(requester.wait_for("source", text) - start)
+            target_samples.append(requester.wait_for("target", text.upper()) - start)
+    finally:
+        monitor.stop_monitoring()
+    return {"source-shown": summarize(source_samples), "translation-shown": summarize(target_samples)}
+
+
+@benchmark("monitor.end-to-end")
+def end_to_end(quick: bool) -> dict:
+    """Latency from the clipboard change to set_content, with translators of different latencies"""
+    copies = 20 if quick else 200
+    return {f"latency-{int(latency * 1000)}ms": _end_to_end(latency, copies) for latency in (0.0, 0.05)}
+
+
+def _idle(source, clipboard: FakeClipboard, seconds: float) -> dict:
+    """Runs a monitor over a clipboard that does not change, returns the processor time used per second and the
+    readings made"""
+    monitor = ClipboardMonitor(RecordingRequester(), StubTranslator(), 0.1, source)
+    clipboard.copy("content that stays in the clipboard")
+    monitor.start_monitoring()
+    try:
+        # The first reading translates the initial content
+        time.sleep(0.3)
+        skipped = monitor.get_skipped()
+        cpu = time.process_time()
+        time.sleep(seconds)
+        cpu = time.process_time() - cpu
+        readings = monitor.get_skipped() - skipped
+    finally:
+        monitor.stop_monitoring()
+    return {"cpu-per-second": cpu / seconds, "readings-per-second": readings / seconds}
+
+
+@benchmark("monitor.idle")
+def idle(quick: bool) -> dict:
+    """Processor time used by the monitor while the clipboard does not change, with a fixed polling interval, the
+    adaptive interval and a source notified by the clipboard"""
+    seconds = 2.0 if quick else 10.0
+    results = {}
+    clipboard = FakeClipboard()
+    results["polling-fixed-100ms"] = _idle(
+        PollingChangeSource(0.1, clipboard.paste, clipboard.copy), clipboard, seconds
+    )
+    clipboard = FakeClipboard()
+    results["polling-adaptive"] = _idle(
+        PollingChangeSource(0.1, clipboard.paste, clipboard.copy, AdaptiveScheduler(0.1, 2.0, 1.5)), clipboard, seconds
+    )
+    clipboard = FakeClipboard()
+    results["notified"] = _idle(FakeChangeSource(clipboard), clipboard, seconds)
+    return results
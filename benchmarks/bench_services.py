@@ -0,0 +1,271 @@
+"""
+Benchmarks of the pooled HTTP client, the translation server, the document translation, the resilience layer and the
+rate limit, everything runs on the local machine.
+"""
+import os
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+
+from harness import benchmark, summarize, StubTranslator, temporary_directory
+from bench_formatter import pdf_text
+from batch import translate_file
+from httpclient import ConnectionPool, EventLoopThread
+from impl import AbstractTranslator
+from ratelimit import RateLimitedTranslator, PriorityScheduler, TokenBucket, priority, BACKGROUND, INTERACTIVE
+from resilience import ResilientTranslator, CircuitBreaker
+from server import TranslationServer, RemoteTranslator
+from translation import SingleFlightTranslator
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    """Answers every request with a small body keeping the connection open"""
+
+    protocol_version = "HTTP/1.1"
+    # The response is sent in a single write, otherwise the delayed acknowledgements add tens of milliseconds
+    wbufsize = -1
+
+    def do_GET(self):
+        body = b"<div class=\"result-container\">hola</div>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@benchmark("http.pooled-client")
+def pooled_client(quick: bool) -> dict:
+    """Latency of sequential requests to a local server through the pooled client and opening a connection each
+    time"""
+    requests = 100 if quick else 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/m?q=hello"
+    loop = EventLoopThread.get_instance()
+    pool = ConnectionPool(4, 5.0)
+    try:
+        pooled = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            loop.run_coroutine(pool.request("GET", url))
+            pooled.append(time.perf_counter() - start)
+        fresh = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            with urllib.request.urlopen(url) as response:
+                response.read()
+            fresh.append(time.perf_counter() - start)
+        loop.run_coroutine(pool.close())
+        loop.release()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {"pooled": summarize(pooled), "new-connection": summarize(fresh), "pool": pool.get_statistics()}
+
+
+@benchmark("server.load")
+def server_load(quick: bool) -> dict:
+    """Throughput and latency of the translation server with many local clients, each client has its own
+    connections"""
+    clients = 16 if quick else 64
+    requests = 50 if quick else 200
+    path = os.path.join(temporary_directory(), "transclip.sock")
+    stub = StubTranslator(0.001)
+    server = TranslationServer(SingleFlightTranslator(stub), path)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    def client(number: int) -> list:
+        remote = RemoteTranslator(path)
+        samples = []
+        try:
+            for index in range(requests):
+                # Half of the texts are shared by every client
+                text = f"text {index}" if index % 2 == 0 else f"text {index} of client {number}"
+                start = time.perf_counter()
+                remote.translate(text)
+                samples.append(time.perf_counter() - start)
+        finally:
+            remote.close()
+        return samples
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as executor:
+            samples = [sample for result in executor.map(client, range(clients)) for sample in result]
+        elapsed = time.perf_counter() - start
+        statistics = server.get_statistics()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {
+        "clients": clients,
+        "requests": len(samples),
+        "requests-per-second": len(samples) / elapsed,
+        "latency": summarize(samples),
+        "backend-calls": stub.calls,
+        "deduplicated": statistics.get("deduplicated", 0),
+    }
+
+
+@benchmark("batch.throughput")
+def batch_throughput(quick: bool) -> dict:
+    """Throughput of the document translation with a stub engine of 2 milliseconds per chunk"""
+    size = 1024 * 1024 if quick else 8 * 1024 * 1024
+    directory = temporary_directory()
+    source = os.path.join(directory, "document.txt")
+    with open(source, "w", encoding="utf-8") as file:
+        file.write(pdf_text(size))
+    results = {"size": size}
+    for workers in (1, 4, 8):
+        target = os.path.join(directory, f"document.{workers}.txt")
+        start = time.perf_counter()
+        chunks = translate_file(StubTranslator(0.002), source, target, 4500, workers)
+        elapsed = time.perf_counter() - start
+        results[f"workers-{workers}"] = {"seconds": elapsed, "chunks": chunks, "mb-per-second": size / elapsed / 1e6}
+    return results
+
+
+class _FaultyHandler(BaseHTTPRequestHandler):
+    """Answers like the engine but fails a fraction of the requests and delays another fraction"""
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    failure_rate = 0.1
+    slow_rate = 0.05
+    slow_delay = 0.5
+    generator = random.Random(7)
+    lock = Lock()
+
+    def do_GET(self):
+        with _FaultyHandler.lock:
+            draw = _FaultyHandler.generator.random()
+        if draw < _FaultyHandler.failure_rate:
+            status, body = 503, b"unavailable"
+        else:
+            if draw < _FaultyHandler.failure_rate + _FaultyHandler.slow_rate:
+                time.sleep(_FaultyHandler.slow_delay)
+            else:
+                time.sleep(0.005)
+            status, body = 200, b"hola"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _HttpTranslator(AbstractTranslator):
+    """Sends each text to the local server through the pooled client"""
+
+    def __init__(self, url: str):
+        super(_HttpTranslator, self).__init__()
+        self.__url = url
+        self.__pool = ConnectionPool(16, 30.0)
+        self.__loop = EventLoopThread.get_instance()
+
+    def translate(self, text: str) -> str:
+        response = self.__loop.run_coroutine(self.__pool.request("GET", self.__url))
+        if response.status != 200:
+            raise ConnectionError(f"Unexpected status {response.status}")
+        return response.text()
+
+    def get_source(self) -> str:
+        return "en"
+
+    def close(self) -> None:
+        self.__loop.run_coroutine(self.__pool.close())
+        self.__loop.release()
+
+    def get_target(self) -> str:
+        return "es"
+
+
+@benchmark("resilience.faulty-backend")
+def faulty_backend(quick: bool) -> dict:
+    """Success rate and latency against a server that fails 10 % of the requests and delays 5 % of them by half
+    a second, sending the requests directly and through the resilience layer with and without hedging"""
+    requests = 100 if quick else 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FaultyHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/m"
+    candidates = {
+        "direct": lambda: _HttpTranslator(url),
+        "retries": lambda: ResilientTranslator(
+            _HttpTranslator(url), 2.0, 3, 0.01, 0.1, CircuitBreaker(50, 1.0)
+        ),
+        "retries-hedged": lambda: ResilientTranslator(
+            _HttpTranslator(url), 2.0, 3, 0.01, 0.1, CircuitBreaker(50, 1.0), True, 90, 20
+        ),
+    }
+    results = {}
+    try:
+        for name, create in candidates.items():
+            translator = create()
+            samples = []
+            failures = 0
+            for index in range(requests):
+                start = time.perf_counter()
+                try:
+                    translator.translate(f"text {index}")
+                    samples.append(time.perf_counter() - start)
+                except Exception:
+                    failures += 1
+            translator.close()
+            results[name] = {
+                "success-rate": len(samples) / requests,
+                "latency": summarize(samples) if len(samples) > 0 else {},
+                "statistics": {
+                    key: value
+                    for key, value in translator.get_statistics().items()
+                    if isinstance(value, (int, float))
+                },
+            }
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+@benchmark("ratelimit.priority")
+def rate_limit_priority(quick: bool) -> dict:
+    """Latency of the clipboard translations while a document is translated in the background through a limit of 50
+    requests per second, and the rate actually sent to the engine"""
+    background = 100 if quick else 400
+    interactive = 10 if quick else 40
+    stub = StubTranslator(0.001)
+    translator = RateLimitedTranslator(stub, PriorityScheduler(TokenBucket(50, 5)))
+
+    def document() -> None:
+        with priority(BACKGROUND):
+            with ThreadPoolExecutor(8) as executor:
+                list(executor.map(lambda index: translator.translate(f"chunk {index}"), range(background)))
+
+    start = time.perf_counter()
+    worker = Thread(target=document)
+    worker.start()
+    samples = []
+    with priority(INTERACTIVE):
+        for index in range(interactive):
+            time.sleep(0.05)
+            sent = time.perf_counter()
+            translator.translate(f"clipboard {index}")
+            samples.append(time.perf_counter() - sent)
+    worker.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "interactive-latency": summarize(samples),
+        "requests-per-second": stub.calls / elapsed,
+        "statistics": translator.get_statistics(),
+    }
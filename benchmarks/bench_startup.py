@@ -0,0 +1,173 @@
+"""
+Benchmarks of the configuration, the resources and the startup of the application.
+"""
+import glob
+import json
+import os
+import time
+
+from harness import benchmark, measure, run_python, temporary_directory, write_config, SkipBenchmark, SOURCES
+from loaders import ResourceCache
+
+
+# Run in a new interpreter, every loader created without a path reads the configuration of the benchmark. Before the
+# store was shared each loader parsed the file when it was created, so the loaders created estimate the parses of the
+# previous implementation, the reads of the store are the parses now
+_COUNT_READS = """
+import json, loaders
+path = {path!r}
+created = [0]
+create = loaders.ConfigurationLoader.__init__
+def counted(self, file_name=path):
+    created[0] += 1
+    create(self, file_name)
+loaders.ConfigurationLoader.__init__ = counted
+{startup}
+reads = loaders.ConfigurationStore.get_instance(path).get_reads()
+print(json.dumps({{"loaders-created": created[0], "file-parses": reads}}))
+"""
+
+# Deferred startup of the headless mode, the clipboard is replaced by a fake one and it stops once it is running
+_HEADLESS_STARTUP = """
+from threading import Event
+import headless, pipeline
+from clipboard import FakeClipboard
+from sources import FakeChangeSource
+config = loaders.ConfigurationLoader(path)
+pipeline.configure_logging(config)
+stop = Event()
+stop.set()
+headless.run(config, headless.ConsoleRequester(), stop=stop, source=FakeChangeSource(FakeClipboard()))
+"""
+
+# Folders of the images and icons read by the window
+_GUI_RESOURCES = {
+    "resources": {"img": os.path.join(SOURCES, "resources", "img"), "icon": os.path.join(SOURCES, "resources", "icon")}
+}
+
+# Startup of the window, App calls OnInit and the tasks deferred until the first frame are run right after it
+_GUI_STARTUP = """
+import transclip
+app = transclip.App()
+app.on_first_frame()
+app.frame.Destroy()
+"""
+
+
+@benchmark("config.reads")
+def config_reads(quick: bool) -> dict:
+    """Number of times the configuration file is parsed during the startup of the headless mode and of the window,
+    along with an estimate of the parses made before the store was shared, one for each loader created"""
+    results = {}
+    for label, startup, sections in (("headless", _HEADLESS_STARTUP, None), ("gui", _GUI_STARTUP, _GUI_RESOURCES)):
+        path = write_config(temporary_directory(), sections)
+        try:
+            run = run_python(_COUNT_READS.format(path=path, startup=startup))
+        except RuntimeError as ex:
+            results[label] = f"skipped: {ex}"
+            continue
+        counts = json.loads(run["output"].strip().splitlines()[-1])
+        results[label] = {
+            "estimated-file-parses-before": counts["loaders-created"],
+            "file-parses": counts["file-parses"],
+            "wall": run["wall"],
+        }
+    return results
+
+
+# The bitmaps can only be created while there is an application
+_app = None
+
+
+def _load_wx():
+    """Returns the wx module with an application created, raises SkipBenchmark if it can't be used"""
+    global _app
+    try:
+        import wx
+
+        if wx.GetApp() is None:
+            _app = wx.App(False)
+        return wx
+    except Exception as ex:
+        raise SkipBenchmark(f"wxPython is not available: {ex}")
+
+
+@benchmark("resources.load")
+def resources_load(quick: bool) -> dict:
+    """Time to load and scale the images of the interface the first time, from the disk cache and from memory"""
+    _load_wx()
+    images = sorted(glob.glob(os.path.join(SOURCES, "resources", "img", "*.png")))
+    if len(images) == 0:
+        raise SkipBenchmark("There are no images in the resources folder")
+    directory = temporary_directory()
+    results = {"images": len(images)}
+    for label in ("cold", "disk-cache"):
+        cache = ResourceCache(directory)
+        start = time.perf_counter()
+        for image in images:
+            cache.get_bitmap(image, (32, 32))
+        results[label] = time.perf_counter() - start
+    start = time.perf_counter()
+    for image in images:
+        cache.get_bitmap(image, (32, 32))
+    results["memory"] = time.perf_counter() - start
+    return results
+
+
+# Run in a new interpreter, the window reads the configuration of the benchmark and the statistics of the resources it
+# loaded are reported
+_RESOURCE_STATISTICS = """
+import json, loaders
+loaders.ConfigurationLoader.__init__.__defaults__ = ({path!r},)
+{startup}
+print(json.dumps(loaders.ResourceCache.get_instance().get_statistics()))
+"""
+
+
+@benchmark("resources.startup")
+def resources_startup(quick: bool) -> dict:
+    """Resources loaded and time spent loading them during the startup of the window, the first time and with the
+    scaled bitmaps left on disk by the previous run"""
+    path = write_config(temporary_directory(), _GUI_RESOURCES)
+    results = {}
+    for label in ("cold", "disk-cache"):
+        try:
+            run = run_python(_RESOURCE_STATISTICS.format(path=path, startup=_GUI_STARTUP))
+        except RuntimeError as ex:
+            raise SkipBenchmark(f"The window can't be started: {ex}")
+        results[label] = json.loads(run["output"].strip().splitlines()[-1])
+    return results
+
+
+HEADLESS_IMPORTS = "import headless, pipeline, monitoring, translation, segmentation, cache, sources"
+
+
+@benchmark("startup.headless")
+def startup_headless(quick: bool) -> dict:
+    """Time and memory of a new process that imports the headless mode and builds its translator"""
+    path = write_config(temporary_directory())
+    code = (
+        f"{HEADLESS_IMPORTS}\n"
+        "from loaders import ConfigurationLoader\n"
+        f"pipeline.build_translator(ConfigurationLoader({path!r}))\n"
+        "import sys; print('wx' in sys.modules)"
+    )
+    runs = [run_python(code) for _ in range(3 if quick else 10)]
+    return {
+        "wall-median": sorted(run["wall"] for run in runs)[len(runs) // 2],
+        "max-rss-kb": max(run["max-rss-kb"] for run in runs),
+        "imports-wx": runs[0]["output"].strip() == "True",
+    }
+
+
+@benchmark("startup.gui")
+def startup_gui(quick: bool) -> dict:
+    """Time and memory of a new process that imports wxPython and the window, to compare with the headless mode"""
+    try:
+        runs = [run_python("import wx\nimport transclip") for _ in range(3 if quick else 10)]
+    except RuntimeError as ex:
+        raise SkipBenchmark(f"The window can't be imported: {ex}")
+    return {
+        "wall-median": sorted(run["wall"] for run in runs)[len(runs) // 2],
+        "max-rss-kb": max(run["max-rss-kb"] for run in runs),
+    }
@@ -0,0 +1,115 @@
+"""
+Benchmarks of the layers that wrap the translation engine, measured with a stub translator of fixed latency.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import benchmark, measure, StubTranslator, temporary_directory
+from bench_formatter import single_paragraph
+from cache import TranslationMemory
+from segmentation import ChunkedTranslator, SegmentedTranslator
+from translation import SingleFlightTranslator, translate_packed
+
+
+@benchmark("translation.chunked-workers")
+def chunked_workers(quick: bool) -> dict:
+    """Time to translate a long text split into chunks with different numbers of concurrent requests"""
+    text = single_paragraph(20 * 450 if quick else 40 * 450)
+    results = {}
+    for workers in (1, 2, 4, 8):
+        stub = StubTranslator(0.02)
+        translator = ChunkedTranslator(stub, 500, workers)
+        try:
+            timing = measure(lambda: translator.translate(text), repeat=3)
+        finally:
+            translator.close()
+        timing["requests-per-call"] = stub.calls // 4
+        results[f"workers-{workers}"] = timing
+    return results
+
+
+@benchmark("translation.memory")
+def memory(quick: bool) -> dict:
+    """Cost of storing a translation, finding it in memory and finding it on disk"""
+    count = 200 if quick else 2000
+    path = os.path.join(temporary_directory(), "translations.sqlite3")
+    texts = [f"text number {index} to remember" for index in range(count)]
+    store = TranslationMemory(path, count, count * 10)
+    start = time.perf_counter()
+    for text in texts:
+        store.put("en", "es", text, text.upper())
+    put = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for text in texts:
+        store.get("en", "es", text)
+    memory_hit = (time.perf_counter() - start) / count
+    # A memory that keeps a single entry reads the others from the database
+    cold = TranslationMemory(path, 1, count * 10)
+    start = time.perf_counter()
+    for text in texts:
+        cold.get("en", "es", text)
+    disk_hit = (time.perf_counter() - start) / count
+    return {"put": put, "memory-hit": memory_hit, "disk-hit": disk_hit, "entries": count}
+
+
+@benchmark("translation.segmented-edit")
+def segmented_edit(quick: bool) -> dict:
+    """Requests sent to the engine when one paragraph of a translated text is edited"""
+    paragraphs = [single_paragraph(400, seed) for seed in range(10 if quick else 40)]
+    stub = StubTranslator(0.002)
+    translator = SegmentedTranslator(stub)
+    start = time.perf_counter()
+    translator.translate("\n\n".join(paragraphs))
+    first = time.perf_counter() - start
+    calls = stub.calls
+    paragraphs[len(paragraphs) // 2] += " edited"
+    start = time.perf_counter()
+    translator.translate("\n\n".join(paragraphs))
+    edited = time.perf_counter() - start
+    return {
+        "paragraphs": len(paragraphs),
+        "first-seconds": first,
+        "first-requests": calls,
+        "edited-seconds": edited,
+        "edited-requests": stub.calls - calls,
+    }
+
+
+@benchmark("translation.single-flight")
+def single_flight(quick: bool) -> dict:
+    """Requests sent to the engine when many threads ask for the same text at the same time"""
+    threads = 16
+    stub = StubTranslator(0.05)
+    translator = SingleFlightTranslator(stub)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda _: translator.translate("the same text"), range(threads)))
+    return {
+        "callers": threads,
+        "seconds": time.perf_counter() - start,
+        "backend-calls": stub.calls,
+        "deduplicated": translator.get_statistics()["deduplicated"],
+    }
+
+
+@benchmark("translation.batch-packing")
+def batch_packing(quick: bool) -> dict:
+    """Requests and time to translate many short texts one by one and packed in batches"""
+    texts = [f"short text number {index}" for index in range(50 if quick else 200)]
+    stub = StubTranslator(0.005)
+    start = time.perf_counter()
+    for text in texts:
+        stub.translate(text)
+    single = time.perf_counter() - start
+    single_calls = stub.calls
+    start = time.perf_counter()
+    translate_packed(stub.translate, texts)
+    packed = time.perf_counter() - start
+    return {
+        "texts": len(texts),
+        "one-by-one-seconds": single,
+        "one-by-one-requests": single_calls,
+        "packed-seconds": packed,
+        "packed-requests": stub.calls - single_calls,
+    }
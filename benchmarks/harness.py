@@ -0,0 +1,187 @@
+"""
+This module provides what the benchmarks share: the registry of benchmarks, the timing functions, the stubs that
+replace the network and the clipboard, and the JSON report.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Condition
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES = os.path.join(ROOT, "src")
+if SOURCES not in sys.path:
+    sys.path.insert(0, SOURCES)
+
+from impl import AbstractTranslator, Requester  # noqa: E402
+from translation import translate_packed  # noqa: E402
+
+# Benchmarks indexed by name, in registration order
+_BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """This exception is thrown by a benchmark that cannot run in the current environment"""
+
+    def __init__(self, msg):
+        super(SkipBenchmark, self).__init__(msg)
+
+
+def benchmark(name: str):
+    """Registers the decorated function as a benchmark, it receives whether the run is quick and returns a dictionary
+    with its results"""
+
+    def register(function):
+        _BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def get_benchmarks() -> dict:
+    """Returns the registered benchmarks"""
+    return dict(_BENCHMARKS)
+
+
+def summarize(samples: list) -> dict:
+    """Returns the statistics of a list of durations in seconds"""
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def measure(function, repeat: int = 5, number: int = 1) -> dict:
+    """Calls the function number times in each of the repetitions, returns the statistics of the time per call"""
+    function()
+    samples = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if enabled:
+            gc.enable()
+    return summarize(samples)
+
+
+# Appended to the code run in a new interpreter, it reports the peak memory of the process
+_REPORT_MEMORY = "\nimport resource as _resource\nprint(_resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def run_python(code: str) -> dict:
+    """Runs the code in a new interpreter with the sources in the path, returns the wall time, the peak memory in
+    kilobytes and the output"""
+    paths = [SOURCES] + [path for path in [os.environ.get("PYTHONPATH")] if path]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(paths))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", code + _REPORT_MEMORY], env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if len(lines) > 0 else "failed")
+    output, _, memory = completed.stdout.rstrip("\n").rpartition("\n")
+    return {"wall": elapsed, "max-rss-kb": int(memory), "output": output}
+
+
+class StubTranslator(AbstractTranslator):
+    """Translates without network by converting the text to upper case after sleeping the configured latency"""
+
+    def __init__(self, latency: float = 0.0, source: str = "en", target: str = "es"):
+        """Registers the seconds each call takes and the languages"""
+        super(StubTranslator, self).__init__()
+        self.latency = latency
+        self.calls = 0
+        self.__source = source
+        self.__target = target
+
+    def translate(self, text: str) -> str:
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return text.upper()
+
+    def translate_batch(self, texts: list) -> list:
+        """Packs the texts in as few calls as possible, like the engines do"""
+        return translate_packed(self.translate, texts)
+
+    def get_source(self) -> str:
+        return self.__source
+
+    def get_target(self) -> str:
+        return self.__target
+
+
+class RecordingRequester(Requester):
+    """Records the moment in which each content is shown, a benchmark can wait for a translation to be shown"""
+
+    def __init__(self):
+        """Starts without contents"""
+        super(RecordingRequester, self).__init__()
+        self.__condition = Condition()
+        self.__shown = {}
+
+    def set_content(self, target: str, content: str):
+        with self.__condition:
+            self.__shown[(target, content)] = time.perf_counter()
+            self.__condition.notify_all()
+
+    def wait_for(self, target: str, content: str, timeout: float = 5.0) -> float:
+        """Returns the moment in which the content was shown, raises TimeoutError if it was not shown in time"""
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: (target, content) in self.__shown, timeout):
+                raise TimeoutError(f"'{content[:20]}' was not shown in {target}")
+            return self.__shown[(target, content)]
+
+
+def temporary_directory() -> str:
+    """Returns a new temporary directory for the files of a benchmark"""
+    return tempfile.mkdtemp(prefix="transclip-bench-")
+
+
+def write_config(directory: str, sections: dict = None) -> str:
+    """Writes a configuration file in the directory with the sections indicated, returns its path"""
+    config = {
+        "core": {"delay": 0.5},
+        "language": {"source": "en", "target": "es", "engine": "dictionary"},
+        "cache": {"enabled": False},
+    }
+    for section, values in (sections or {}).items():
+        config.setdefault(section, {}).update(values)
+    path = os.path.join(directory, "config.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(config, file)
+    return path
+
+
+def environment() -> dict:
+    """Returns the description of the machine and the revision measured"""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processors": os.cpu_count(),
+    }
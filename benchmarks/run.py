@@ -0,0 +1,118 @@
+"""
+Runs the benchmarks and writes their results as JSON, the results of another run can be compared with the new ones:
+
+    python benchmarks/run.py --quick --output results.json
+    python benchmarks/run.py --compare baseline.json --output results.json
+"""
+import argparse
+import json
+import sys
+import time
+import traceback
+
+import harness
+
+# The modules register their benchmarks when they are imported
+import bench_formatter  # noqa: F401
+import bench_monitor  # noqa: F401
+import bench_translation  # noqa: F401
+import bench_services  # noqa: F401
+import bench_startup  # noqa: F401
+
+
+def parse_arguments(arguments: list):
+    """Reads the command line options"""
+    parser = argparse.ArgumentParser(prog="benchmarks")
+    parser.add_argument("--quick", action="store_true", help="use smaller inputs and fewer repetitions")
+    parser.add_argument("--output", help="file where the results are written, by default the standard output")
+    parser.add_argument("--only", action="append", default=[], help="run the benchmarks whose name contains it")
+    parser.add_argument("--compare", help="results of a previous run to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative change reported by the comparison, by default 0.2",
+    )
+    parser.add_argument("--list", action="store_true", help="show the names of the benchmarks")
+    return parser.parse_args(arguments)
+
+
+def run(names: list, quick: bool) -> dict:
+    """Runs the benchmarks, a benchmark that fails does not stop the others"""
+    results = {}
+    for name in names:
+        function = harness.get_benchmarks()[name]
+        sys.stderr.write(f"{name} ... ")
+        sys.stderr.flush()
+        start = time.perf_counter()
+        try:
+            results[name] = {"status": "ok", "results": function(quick)}
+        except harness.SkipBenchmark as ex:
+            results[name] = {"status": "skipped", "reason": str(ex)}
+        except Exception as ex:
+            traceback.print_exc()
+            results[name] = {"status": "error", "reason": f"{type(ex).__name__}: {ex}"}
+        results[name]["seconds"] = time.perf_counter() - start
+        sys.stderr.write(f"{results[name]['status']} ({results[name]['seconds']:.1f} s)\n")
+    return results
+
+
+def flatten(value, prefix: str = "") -> dict:
+    """Returns the numeric values of nested dictionaries indexed by their path"""
+    if isinstance(value, dict):
+        values = {}
+        for key, item in value.items():
+            values.update(flatten(item, f"{prefix}/{key}" if prefix else str(key)))
+        return values
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Returns the values that changed more than the threshold, as tuples (path, before, after, ratio)"""
+    before = flatten({name: entry.get("results", {}) for name, entry in baseline["benchmarks"].items()})
+    after = flatten({name: entry.get("results", {}) for name, entry in current["benchmarks"].items()})
+    changes = []
+    for path, old in sorted(before.items()):
+        new = after.get(path)
+        if new is None or old == 0:
+            continue
+        ratio = new / old
+        if abs(ratio - 1) > threshold:
+            changes.append((path, old, new, ratio))
+    return changes
+
+
+def main():
+    options = parse_arguments(sys.argv[1:])
+    names = [
+        name
+        for name in harness.get_benchmarks()
+        if len(options.only) == 0 or any(fragment in name for fragment in options.only)
+    ]
+    if options.list:
+        print("\n".join(names))
+        return 0
+    report = {
+        "environment": harness.environment(),
+        "quick": options.quick,
+        "benchmarks": run(names, options.quick),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        for path, old, new, ratio in compare(baseline, report, options.threshold):
+            sys.stderr.write(f"{path:<70}{old:>14.6g}{new:>14.6g}{ratio:>8.2f}x\n")
+    failed = [name for name, entry in report["benchmarks"].items() if entry["status"] == "error"]
+    return 1 if len(failed) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,88 @@
-import wx
+import profiling
 
+import argparse
 import sys
-import logger
-from transclip import AppWindow
-from clipboard import clear, UnsupportedOperation
-
 
-# noinspection PyAttributeOutsideInit
-class App(wx.App):
-    """This class starts the application"""
+import logger
+import metrics
 
-    def __init__(self):
-        """Call the constructor of Object"""
-        super(App, self).__init__()
 
-    def OnInit(self) -> bool:
-        """This method is used to start the application"""
-        try:
-            logger.info("Initializing application")
-            self.frame = AppWindow()
-            self.frame.Show()
-            self.SetTopWindow(self.frame)
-            return True
-        except Exception as ex:
-            logger.log(ex)
-            return False
+def parse_arguments(arguments: list):
+    """Reads the command line options"""
+    parser = argparse.ArgumentParser(prog="transclip")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print the time spent in each phase of the startup",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="translate the clipboard without a graphical interface",
+    )
+    parser.add_argument("--config", help="configuration file used in headless and batch modes")
+    parser.add_argument("--output", help="file where the headless mode appends the translations")
+    parser.add_argument(
+        "--show-source",
+        action="store_true",
+        help="write the original content before each translation in headless mode",
+    )
+    parser.add_argument(
+        "--copy-translation",
+        action="store_true",
+        help="write the translations back to the clipboard in headless mode",
+    )
+    commands = parser.add_subparsers(dest="command")
+    translate = commands.add_parser("translate", help="translate a document instead of the clipboard")
+    translate.add_argument("--in", dest="input", default="-", help="file to translate, by default the standard input")
+    translate.add_argument("--out", dest="output", default="-", help="file where the translation is written")
+    translate.add_argument("--config", default=argparse.SUPPRESS, help="configuration file")
+    translate.add_argument("--workers", type=int, default=0, help="number of chunks translated at the same time")
+    translate.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted translation from its checkpoint",
+    )
+    serve = commands.add_parser("serve", help="share the translator with other clients through a local socket")
+    serve.add_argument("--socket", help="Unix socket where the server listens")
+    serve.add_argument("--config", default=argparse.SUPPRESS, help="configuration file")
+    return parser.parse_args(arguments)
 
 
 def main():
     """Run the app"""
+    options = parse_arguments(sys.argv[1:])
+    if options.profile_startup:
+        profiling.enable()
+    metrics.install_dump_signal()
+    if options.command == "translate":
+        from batch import main as batch_main
+
+        sys.exit(batch_main(options))
+    if options.command == "serve":
+        from server import main as server_main
+
+        sys.exit(server_main(options))
+    if options.headless:
+        from headless import main as headless_main
+
+        sys.exit(headless_main(options))
     try:
         logger.info("Running the application")
-        app = App()
-        try:
-            logger.info("Cleaning the clipboard...")
-            clear()
-        except UnsupportedOperation as ex:
-            logger.error("A error has occurred while cleaning the clipboard")
-            logger.log(ex)
-            sys.exit(1)
+        with profiling.phase("import wx"):
+            import wx
+        with profiling.phase("import window"):
+            from transclip import App
+        with profiling.phase("configure logging"):
+            from loaders import ConfigurationLoader
+            from pipeline import configure_logging
+
+            configure_logging(ConfigurationLoader())
+        with profiling.phase("create application"):
+            app = App()
         app.MainLoop()
+        if app.exit_code != 0:
+            sys.exit(app.exit_code)
     except Exception as ex:
         logger.log(ex)
 
@@ -0,0 +1,233 @@
+"""
+This module translates documents read from a file or from the standard input, the text is formatted and split into
+chunks while it is read, so the memory used does not depend on the size of the document. The chunks are translated
+concurrently and written in their original order, a checkpoint allows resuming an interrupted translation.
+"""
+import contextvars
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import logger
+from formatters import PlainTextFormatter
+from impl import AbstractTranslator
+from ratelimit import priority, BACKGROUND
+from segmentation import split_chunks, translate_surrounded
+
+# Number of characters read from the input at a time
+BLOCK_SIZE = 64 * 1024
+
+
+class CheckpointException(Exception):
+    """This exception is thrown in case a checkpoint does not belong to the translation that is resumed"""
+
+    def __init__(self, msg):
+        super(CheckpointException, self).__init__(msg)
+
+
+def read_chunks(stream, limit: int, block_size: int = BLOCK_SIZE):
+    """Formats the text read from the stream and yields it in chunks of at most limit characters, the same input
+    always produces the same chunks"""
+    formatter = PlainTextFormatter()
+    buffer = ""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        buffer += formatter.feed(block)
+        if len(buffer) > limit:
+            chunks = split_chunks(buffer, limit)
+            # The last chunk may continue in the next block
+            for chunk in chunks[:-1]:
+                yield chunk
+            buffer = chunks[-1]
+    buffer += formatter.finish()
+    yield from split_chunks(buffer, limit)
+
+
+class Checkpoint:
+    """Records how many chunks of a document have been written and the size of the output at that moment"""
+
+    def __init__(self, path: str, input_path: str, limit: int):
+        """Registers the file of the checkpoint and the document it describes"""
+        super(Checkpoint, self).__init__()
+        self.__path = path
+        stat = os.stat(input_path)
+        self.__document = {
+            "input": os.path.abspath(input_path),
+            "input-size": stat.st_size,
+            "input-mtime": stat.st_mtime,
+            "chunk-size": limit,
+        }
+
+    def load(self) -> tuple:
+        """Returns the number of chunks written and the size of the output, raises CheckpointException if the
+        checkpoint was made for another document or another chunk size"""
+        try:
+            with open(self.__path, encoding="utf-8") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return 0, 0
+        for key, value in self.__document.items():
+            if state.get(key) != value:
+                raise CheckpointException(f"The checkpoint '{self.__path}' does not match the input ({key})")
+        return int(state["chunks"]), int(state["output-size"])
+
+    def save(self, chunks: int, output_size: int) -> None:
+        """Stores the progress, the file is replaced atomically so an interruption never leaves it incomplete"""
+        state = dict(self.__document, chunks=chunks)
+        state["output-size"] = output_size
+        temporary = self.__path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(temporary, self.__path)
+
+    def remove(self) -> None:
+        """Deletes the checkpoint once the translation is complete"""
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+
+class DocumentTranslator:
+    """Translates the chunks of a document concurrently and writes the translations as soon as every chunk before
+    them has been written"""
+
+    def __init__(self, translator: AbstractTranslator, limit: int = 4500, workers: int = 4):
+        """Registers the translator, the maximum size of each chunk and the number of concurrent translations"""
+        super(DocumentTranslator, self).__init__()
+        self.__translator = translator
+        self.__limit = limit
+        self.__workers = max(1, workers)
+
+    def translate(self, reader, writer, skip: int = 0, written: int = 0, checkpoint: Checkpoint = None) -> int:
+        """Translates the text read from the reader and writes it encoded in UTF-8 to the binary writer, the first
+        chunks are skipped when a translation is resumed. Returns the number of chunks of the document"""
+        # Only a few chunks wait to be written, so the memory is bounded
+        pending = deque()
+        total = skip
+        executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix="batch")
+        try:
+            for index, chunk in enumerate(read_chunks(reader, self.__limit)):
+                if index < skip:
+                    continue
+                context = contextvars.copy_context()
+                pending.append(executor.submit(context.run, translate_surrounded, self.__translator, chunk))
+                if len(pending) >= 2 * self.__workers:
+                    written += self.__write(writer, pending.popleft().result())
+                    total += 1
+                    self.__save(writer, checkpoint, total, written)
+            while len(pending) > 0:
+                written += self.__write(writer, pending.popleft().result())
+                total += 1
+                self.__save(writer, checkpoint, total, written)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return total
+
+    @staticmethod
+    def __write(writer, translation: str) -> int:
+        """Writes a translation, returns the number of bytes written"""
+        data = translation.encode("utf-8")
+        writer.write(data)
+        return len(data)
+
+    @staticmethod
+    def __save(writer, checkpoint: Checkpoint, chunks: int, written: int) -> None:
+        """Records the progress once the output is on disk"""
+        if checkpoint is not None:
+            writer.flush()
+            checkpoint.save(chunks, written)
+
+
+def translate_file(
+    translator: AbstractTranslator,
+    input_path: str,
+    output_path: str,
+    limit: int = 4500,
+    workers: int = 4,
+    resume: bool = False,
+) -> int:
+    """Translates the input file into the output file, the path '-' means the standard input or output. When both
+    are files the progress is saved next to the output and resume continues from it. Returns the number of chunks"""
+    document = DocumentTranslator(translator, limit, workers)
+    use_checkpoint = input_path != "-" and output_path != "-"
+    if resume and not use_checkpoint:
+        raise CheckpointException("Only the translations between files can be resumed")
+    if input_path == "-":
+        reader = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    else:
+        reader = open(input_path, encoding="utf-8", newline="")
+    try:
+        if not use_checkpoint:
+            writer = sys.stdout.buffer if output_path == "-" else open(output_path, "wb")
+            try:
+                return document.translate(reader, writer)
+            finally:
+                writer.flush()
+                if writer is not sys.stdout.buffer:
+                    writer.close()
+        checkpoint = Checkpoint(output_path + ".checkpoint", input_path, limit)
+        skip, written = checkpoint.load() if resume else (0, 0)
+        if skip > 0:
+            logger.info("Resuming the translation after %d chunks", skip)
+        with open(output_path, "r+b" if skip > 0 else "wb") as writer:
+            # The output written after the last checkpoint is translated again
+            writer.truncate(written)
+            writer.seek(written)
+            total = document.translate(reader, writer, skip, written, checkpoint)
+        checkpoint.remove()
+        return total
+    finally:
+        if input_path == "-":
+            # The standard input stays open
+            reader.detach()
+        else:
+            reader.close()
+
+
+def main(options) -> int:
+    """Translates the document indicated by the command line options, returns the exit code"""
+    from httpclient import HttpException
+    from loaders import ConfigurationLoader
+    from pipeline import build_translator, configure_logging
+    from resilience import TranslationTimeout, CircuitOpenException
+    from server import ProtocolException
+    from translation import TranslationException
+
+    config = ConfigurationLoader(options.config) if getattr(options, "config", None) else ConfigurationLoader()
+    configure_logging(config)
+    workers = options.workers or int(config.get_option("language", "workers", 4))
+    limit = int(config.get_option("language", "chunk-size", 4500))
+    translator = build_translator(config)
+    try:
+        # The documents wait behind the translations of the clipboard when the engine is shared
+        with priority(BACKGROUND):
+            chunks = translate_file(translator, options.input, options.output, limit, workers, options.resume)
+        logger.info("Translated %d chunks", chunks)
+        return 0
+    except CheckpointException as ex:
+        logger.error("The document could not be translated")
+        logger.log(ex)
+        print(ex, file=sys.stderr)
+        return 1
+    except (
+        TranslationException,
+        TranslationTimeout,
+        CircuitOpenException,
+        ProtocolException,
+        HttpException,
+        OSError,
+    ) as ex:
+        logger.error("The document could not be translated")
+        logger.log(ex)
+        print(f"The document could not be translated: {ex}", file=sys.stderr)
+        if os.path.exists(options.output + ".checkpoint"):
+            print("The translated chunks were saved, run the command again with --resume to continue", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        translator.close()
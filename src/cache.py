@@ -0,0 +1,174 @@
+"""
+This module provides a translation memory that keeps the translations already made, in memory and on disk.
+"""
+import hashlib
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+
+import logger
+
+
+def normalize(text: str) -> str:
+    """Returns the form of the text used to identify it, the differences in the surrounding spaces or the unicode
+    representation do not produce a new translation"""
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def digest(text: str) -> str:
+    """Returns the hash of the normalized text"""
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """Stores the translations in a least recently used table in memory backed by a SQLite database, the entries older
+    than the time to live are discarded"""
+
+    def __init__(self, path: str = None, memory_size: int = 1024, disk_size: int = 100000, ttl: float = 2592000):
+        """Opens the database indicated by the path, without a path the translations are only kept in memory"""
+        super(TranslationMemory, self).__init__()
+        self.__memory_size = memory_size
+        self.__disk_size = disk_size
+        self.__ttl = ttl
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+        # The database has its own lock so the lookups in memory never wait for the disk
+        self.__database_lock = Lock()
+        # Moments in which the entries read from the database were used, they are written in groups
+        self.__accessed = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__writes = 0
+        self.__connection = None
+        if path is not None:
+            try:
+                self.__connection = sqlite3.connect(path, check_same_thread=False)
+                self.__connection.execute(
+                    "CREATE TABLE IF NOT EXISTS translations (source TEXT, target TEXT, digest TEXT, "
+                    "translation TEXT, created REAL, accessed REAL, PRIMARY KEY (source, target, digest))"
+                )
+                self.__connection.execute(
+                    "DELETE FROM translations WHERE created < ?", (time.time() - self.__ttl,)
+                )
+                self.__connection.commit()
+            except sqlite3.Error as ex:
+                logger.error("The translation database could not be opened")
+                logger.log(ex)
+                self.__connection = None
+
+    def get(self, source: str, target: str, text: str):
+        """Returns the stored translation of the text or None if there is not one"""
+        key = (source, target, digest(text))
+        now = time.time()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self.__ttl:
+                    self.__entries.move_to_end(key)
+                    self.__hits += 1
+                    return entry[0]
+                del self.__entries[key]
+        entry = self.__load(key, now)
+        with self.__lock:
+            if entry is None:
+                self.__misses += 1
+                return None
+            # A translation stored while the database was read is newer
+            if key not in self.__entries:
+                self.__remember(key, entry)
+            self.__hits += 1
+            return entry[0]
+
+    def put(self, source: str, target: str, text: str, translation: str) -> None:
+        """Stores the translation of the text"""
+        key = (source, target, digest(text))
+        now = time.time()
+        with self.__lock:
+            self.__remember(key, (translation, now))
+        self.__store(key, translation, now)
+
+    def __remember(self, key: tuple, entry: tuple) -> None:
+        """Adds the entry to the memory table discarding the least recently used ones"""
+        self.__entries[key] = entry
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__memory_size:
+            self.__entries.popitem(last=False)
+
+    def __load(self, key: tuple, now: float):
+        """Reads an entry from the database, the moment it was used is written later along with others"""
+        with self.__database_lock:
+            if self.__connection is None:
+                return None
+            try:
+                row = self.__connection.execute(
+                    "SELECT translation, created FROM translations WHERE source = ? AND target = ? AND digest = ?",
+                    key,
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] >= self.__ttl:
+                    self.__connection.execute(
+                        "DELETE FROM translations WHERE source = ? AND target = ? AND digest = ?", key
+                    )
+                    self.__connection.commit()
+                    return None
+                self.__accessed[key] = now
+                if len(self.__accessed) >= 64:
+                    self.__flush_accessed()
+                    self.__connection.commit()
+                return row
+            except sqlite3.Error as ex:
+                logger.log(ex)
+                return None
+
+    def __flush_accessed(self) -> None:
+        """Writes the moments in which the entries read from the database were used, the database lock must be
+        held"""
+        if len(self.__accessed) > 0:
+            self.__connection.executemany(
+                "UPDATE translations SET accessed = ? WHERE source = ? AND target = ? AND digest = ?",
+                [(accessed,) + key for key, accessed in self.__accessed.items()],
+            )
+            self.__accessed.clear()
+
+    def __store(self, key: tuple, translation: str, now: float) -> None:
+        """Writes an entry to the database discarding the least recently used ones"""
+        with self.__database_lock:
+            if self.__connection is None:
+                return
+            try:
+                self.__connection.execute(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)", key + (translation, now, now)
+                )
+                self.__accessed.pop(key, None)
+                self.__writes += 1
+                # The size limit is enforced from time to time, sorting the table on every write is expensive
+                if self.__writes % 64 == 0:
+                    self.__flush_accessed()
+                    self.__connection.execute(
+                        "DELETE FROM translations WHERE rowid IN (SELECT rowid FROM translations "
+                        "ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                        (self.__disk_size,),
+                    )
+                self.__connection.commit()
+            except sqlite3.Error as ex:
+                logger.log(ex)
+
+    def get_statistics(self) -> dict:
+        """Returns the number of hits and misses"""
+        with self.__lock:
+            return {"cache-hits": self.__hits, "cache-misses": self.__misses}
+
+    def close(self) -> None:
+        """Writes the pending moments of use and closes the database"""
+        with self.__database_lock:
+            if self.__connection is not None:
+                try:
+                    self.__flush_accessed()
+                    self.__connection.commit()
+                except sqlite3.Error as ex:
+                    logger.log(ex)
+                self.__connection.close()
+                self.__connection = None
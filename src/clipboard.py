@@ -1,5 +1,4 @@
-import wx
-import pyperclip
+from threading import Condition
 
 class UnsupportedOperation(Exception):
     """This exception is thrown in case an operation cannot be performed on the system"""
@@ -17,6 +16,8 @@ def copy(content: str):
     #        wx.TheClipboard.Close()
     #except:
     #    raise UnsupportedOperation("Your system does not have clipboard support")
+    import pyperclip
+
     pyperclip.copy(content)
 
 
@@ -34,6 +35,8 @@ def paste() -> str:
     #        return None
     #except:
     #    raise UnsupportedOperation("Your system does not have clipboard support")
+    import pyperclip
+
     return str(pyperclip.paste())
 
 
@@ -44,3 +47,39 @@ def clear():
     #    wx.TheClipboard.Flush()
     #    wx.TheClipboard.Close()
     copy("")
+
+
+class FakeClipboard:
+    """In-memory clipboard that notifies its listeners on every write, it is used to measure the monitors without a
+    display server"""
+
+    def __init__(self, content: str = ""):
+        """Starts the clipboard with an initial content"""
+        super(FakeClipboard, self).__init__()
+        self.__content = content
+        self.__sequence = 0
+        self.__condition = Condition()
+
+    def copy(self, content: str):
+        """Write some text to the clipboard and wake up the threads waiting for a change"""
+        with self.__condition:
+            self.__content = content
+            self.__sequence += 1
+            self.__condition.notify_all()
+
+    def paste(self) -> str:
+        """Read some text"""
+        with self.__condition:
+            return self.__content
+
+    def sequence(self) -> int:
+        """Returns a number that increases every time the content is written"""
+        with self.__condition:
+            return self.__sequence
+
+    def wait_for_change(self, sequence: int, timeout: float = None) -> int:
+        """Blocks until the sequence number differs from the given one or the timeout expires, returns the current
+        sequence number"""
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__sequence != sequence, timeout)
+            return self.__sequence
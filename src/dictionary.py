@@ -0,0 +1,88 @@
+"""
+This module provides a translator that works without network, it replaces the words and phrases of the text using a
+phrase table loaded from disk.
+
+The phrase table is a JSON file indexed by source language and then by target language:
+
+    {"en": {"es": {"good morning": "buenos días", "world": "mundo"}}}
+"""
+import json
+import re
+
+import logger
+from impl import AbstractTranslator
+
+# Words and the text between them
+_TOKENS = re.compile(r"\w+|\W+")
+
+
+class DictionaryTranslator(AbstractTranslator):
+    """Translates the text replacing the longest known phrases, the unknown words are kept as they are"""
+
+    def __init__(self, source: str, target: str, path: str):
+        """Loads the phrase table of the pair of languages from the indicated file"""
+        super(DictionaryTranslator, self).__init__()
+        self.__source = source
+        self.__target = target
+        try:
+            with open(path, encoding="utf-8") as file:
+                self.__tables = json.load(file)
+        except FileNotFoundError:
+            logger.error("Dictionary file '%s' not found", path)
+            self.__tables = {}
+        self.__phrases = {
+            key.lower(): value for key, value in self.__tables.get(source, {}).get(target, {}).items()
+        }
+        self.__longest = max((len(_TOKENS.findall(key)) for key in self.__phrases), default=0)
+
+    def translate(self, text: str) -> str:
+        whole = self.__phrases.get(text.strip().lower())
+        if whole is not None:
+            return whole
+        tokens = _TOKENS.findall(text)
+        result = []
+        index = 0
+        while index < len(tokens):
+            translation, length = self.__match(tokens, index)
+            if translation is None:
+                result.append(tokens[index])
+                index += 1
+            else:
+                if tokens[index][:1].isupper():
+                    translation = translation[:1].upper() + translation[1:]
+                result.append(translation)
+                index += length
+        return "".join(result)
+
+    def __match(self, tokens: list, index: int) -> tuple:
+        """Searches the longest phrase that starts at the token, returns its translation and the number of tokens it
+        covers"""
+        if not tokens[index][:1].isalnum() and tokens[index][:1] != "_":
+            return None, 0
+        end = min(len(tokens), index + self.__longest)
+        # A phrase starts and ends with a word, so the candidates have an odd number of tokens
+        for stop in range(end, index, -1):
+            if (stop - index) % 2 == 0:
+                continue
+            translation = self.__phrases.get("".join(tokens[index:stop]).lower())
+            if translation is not None:
+                return translation, stop - index
+        return None, 0
+
+    def detect(self, text: str):
+        """Returns the language whose phrase tables know the most words of the text"""
+        words = {token.lower() for token in _TOKENS.findall(text) if token[:1].isalnum()}
+        scores = {}
+        for source, targets in self.__tables.items():
+            for target, phrases in targets.items():
+                scores[source] = scores.get(source, 0) + len(words.intersection(k.lower() for k in phrases))
+                scores[target] = scores.get(target, 0) + len(words.intersection(v.lower() for v in phrases.values()))
+        if len(scores) == 0 or max(scores.values()) == 0:
+            return None
+        return max(scores, key=scores.get)
+
+    def get_source(self) -> str:
+        return self.__source
+
+    def get_target(self) -> str:
+        return self.__target
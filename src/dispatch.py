@@ -0,0 +1,85 @@
+"""
+This module provides a channel to update the interface from other threads without flooding its event queue.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import metrics
+
+
+class UpdateDispatcher:
+    """Merges the updates posted from any thread, only the last update of each target is applied and the pending
+    updates are applied at most once per frame interval"""
+
+    def __init__(self, schedule, schedule_later, interval: float = 1 / 60):
+        """Registers the function that runs a callable in the interface thread as soon as possible, the function that
+        runs it after a number of milliseconds (called from the interface thread) and the minimum interval between two
+        flushes in seconds"""
+        super(UpdateDispatcher, self).__init__()
+        self.__schedule = schedule
+        self.__schedule_later = schedule_later
+        self.__interval = interval
+        self.__pending = OrderedDict()
+        self.__applied_values = {}
+        self.__lock = Lock()
+        self.__scheduled = False
+        self.__last_flush = 0.0
+        self.__posted = 0
+        self.__applied = 0
+        self.__merged = 0
+        self.__redundant = 0
+
+    def post(self, target, function, *args) -> None:
+        """Requests the function to be called with the arguments in the interface thread, it replaces the update of
+        the same target that has not been applied yet"""
+        with self.__lock:
+            self.__posted += 1
+            if target in self.__pending:
+                self.__merged += 1
+            elif self.__applied_values.get(target) == (function, args):
+                # The interface already shows this value
+                self.__redundant += 1
+                return
+            self.__pending[target] = (function, args)
+            if self.__scheduled:
+                return
+            self.__scheduled = True
+        self.__schedule(self.flush)
+
+    def flush(self) -> None:
+        """Applies the pending updates, it must be called from the interface thread"""
+        remaining = self.__interval - (time.monotonic() - self.__last_flush)
+        if remaining > 0:
+            self.__schedule_later(max(1, int(remaining * 1000)), self.__apply)
+        else:
+            self.__apply()
+
+    def __apply(self) -> None:
+        """Calls the functions of the pending updates"""
+        with self.__lock:
+            pending = self.__pending
+            self.__pending = OrderedDict()
+            self.__scheduled = False
+            self.__last_flush = time.monotonic()
+            self.__applied_values.update(pending)
+            self.__applied += len(pending)
+        with metrics.span("ui-update"):
+            for function, args in pending.values():
+                function(*args)
+
+    def forget(self, target) -> None:
+        """Discards the last value applied to the target, it is used when the target is modified by other means"""
+        with self.__lock:
+            self.__applied_values.pop(target, None)
+
+    def get_statistics(self) -> dict:
+        """Returns the number of updates posted, applied, merged with a newer one and dropped because the interface
+        already showed them"""
+        with self.__lock:
+            return {
+                "updates-posted": self.__posted,
+                "updates-applied": self.__applied,
+                "updates-merged": self.__merged,
+                "updates-redundant": self.__redundant,
+            }
@@ -0,0 +1,205 @@
+"""
+This module exports the metrics in the Prometheus text format, through an HTTP endpoint on a local address or through
+a file read by the textfile collector of the node exporter. Nothing runs unless the export is started.
+"""
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Event, Lock
+
+import logger
+import metrics
+
+PREFIX = "transclip_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# Statistics of the collectors that only grow, they are exported as counters and the rest as gauges
+MONOTONIC_STATISTICS = frozenset(
+    (
+        "backend-calls",
+        "cache-hits",
+        "cache-misses",
+        "circuit-rejections",
+        "connections-opened",
+        "connections-reused",
+        "deduplicated",
+        "hedge-wins",
+        "hedged",
+        "polls",
+        "queue-discarded",
+        "rate-limit-wait",
+        "rate-limited",
+        "readings-skipped",
+        "retries",
+        "segments",
+        "segments-translated",
+        "server-requests",
+        "timeouts",
+        "translations-dropped",
+        "updates-applied",
+        "updates-merged",
+        "updates-posted",
+        "updates-redundant",
+    )
+)
+
+
+def _metric_name(name: str) -> str:
+    """Converts a name used by the application into a valid metric name"""
+    return PREFIX + "".join(character if character.isalnum() else "_" for character in name).lower()
+
+
+def _labels(pairs) -> str:
+    """Formats the label pairs"""
+    if len(pairs) == 0:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    """Formats a value as Prometheus expects it"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """Returns the histograms, the counters and the statistics of the collectors in the text format"""
+    lines = []
+    histograms = metrics.get_histograms()
+    if len(histograms) > 0:
+        name = PREFIX + "stage_duration_seconds"
+        lines.append(f"# HELP {name} Time spent in each stage of the pipeline.")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, histogram in sorted(histograms.items()):
+            data = histogram.snapshot()
+            cumulative = 0
+            limits = list(histogram.get_buckets()) + [float("inf")]
+            for limit, count in zip(limits, data["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels([('stage', stage), ('le', _number(limit))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels([('stage', stage)])} {_number(data['sum'])}")
+            lines.append(f"{name}_count{_labels([('stage', stage)])} {data['count']}")
+    counters = {}
+    for (counter, labels), value in metrics.get_counters().items():
+        counters.setdefault(counter, []).append((labels, value))
+    for counter, values in sorted(counters.items()):
+        name = _metric_name(counter) + "_total"
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in sorted(values):
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    for key, value in sorted(metrics.collect().items()):
+        if key in MONOTONIC_STATISTICS:
+            name = _metric_name(key) + "_total"
+            lines.append(f"# TYPE {name} counter")
+        else:
+            name = _metric_name(key)
+            lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Answers the scrapes of the metrics"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class MetricsServer(Thread):
+    """Serves the metrics over HTTP from a daemon thread"""
+
+    def __init__(self, address: str = "127.0.0.1", port: int = 9464):
+        """Opens the socket, the port 0 chooses a free one"""
+        super(MetricsServer, self).__init__(name="metrics-server", daemon=True)
+        self.__server = ThreadingHTTPServer((address, port), _MetricsHandler)
+        self.__server.daemon_threads = True
+
+    def get_port(self) -> int:
+        """Returns the port where the server listens"""
+        return self.__server.server_address[1]
+
+    def run(self):
+        self.__server.serve_forever()
+
+    def stop(self) -> None:
+        """Stops the server and closes its socket"""
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+class TextfileWriter(Thread):
+    """Writes the metrics to a file every interval, the file is replaced atomically so it is never read half
+    written"""
+
+    def __init__(self, path: str, interval: float = 15.0):
+        """Registers the file and the seconds between two writings"""
+        super(TextfileWriter, self).__init__(name="metrics-textfile", daemon=True)
+        self.__path = path
+        self.__interval = interval
+        self.__stopped = Event()
+
+    def write(self) -> None:
+        """Writes the current metrics"""
+        temporary = self.__path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(render())
+        os.replace(temporary, self.__path)
+
+    def run(self):
+        while not self.__stopped.wait(self.__interval):
+            try:
+                self.write()
+            except OSError as ex:
+                logger.log(ex)
+
+    def stop(self) -> None:
+        """Writes the metrics one last time and stops the thread"""
+        self.__stopped.set()
+        try:
+            self.write()
+        except OSError as ex:
+            logger.log(ex)
+
+
+_exporters = []
+_lock = Lock()
+
+
+def start(address: str = "127.0.0.1", port: int = None, textfile: str = "", interval: float = 15.0) -> list:
+    """Starts the HTTP endpoint if there is a port, the port 0 chooses a free one, and the file writer if there is
+    a file, only the first call starts them. Returns the exporters running"""
+    with _lock:
+        if len(_exporters) == 0:
+            if port is not None:
+                server = MetricsServer(address, port)
+                _exporters.append(server)
+                logger.info("Metrics served on http://%s:%d/metrics", address, server.get_port())
+            if textfile:
+                _exporters.append(TextfileWriter(textfile, interval))
+                logger.info("Metrics written to %s", textfile)
+            for exporter in _exporters:
+                exporter.start()
+        return list(_exporters)
+
+
+def stop() -> None:
+    """Stops the exporters"""
+    with _lock:
+        for exporter in _exporters:
+            exporter.stop()
+        _exporters.clear()
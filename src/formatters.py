@@ -1,34 +1,72 @@
+import re
+
 from impl import AbstractFormatter
 
+# A hyphen that splits a word at the end of a line, or a line break
+_LINE_BREAKS = re.compile(r"-(?=\n)|\n")
+
 
 def available_character(character: str):
     return 48 <= ord(character) <= 57 or 65 <= ord(character) <= 122
 
 
+def _format_range(text: str, start: int, end: int, pieces: list) -> None:
+    """Appends to the pieces the formatted text between start and end, the characters outside the range are only
+    consulted as the neighbors of a line break"""
+    last = start
+    for match in _LINE_BREAKS.finditer(text, start):
+        index = match.start()
+        if index >= end:
+            break
+        pieces.append(text[last:index])
+        last = match.end()
+        if match.group() == "\n":
+            previous = text[index - 1] if index > 0 else ""
+            if previous == ".":
+                pieces.append("\n\n")
+            elif previous == ":":
+                pieces.append("\n")
+            if index + 1 < len(text) and text[index + 1] == " ":
+                pieces.append("  ")
+    pieces.append(text[last:end])
+
+
 class PlainTextFormatter(AbstractFormatter):
     """Provides a formatter for plain texts, rearranging by paragraphs and removing strange characters from the text"""
 
     def __init__(self):
         """Default constructor"""
         super(PlainTextFormatter, self).__init__()
+        self.__pending = ""
+        self.__start = 0
 
     def format(self, text: str) -> str:
         """Format text, clean up weird characters and rearrange it"""
-        old_text = text.replace("\r", "")
-        new_text = ""
-        counter = 0
-        for character in old_text:
-            if character == "-" and old_text[counter + 1] == "\n":
-                new_text += ""
-            else:
-                if character == "\n":
-                    if old_text[counter - 1] == ".":
-                        new_text += "\n\n"
-                    elif old_text[counter - 1] == ":":
-                        new_text += "\n"
-                    if old_text[counter + 1] == " ":
-                        new_text += "  "
-                else:
-                    new_text += character
-            counter += 1
-        return new_text
+        text = text.replace("\r", "")
+        pieces = []
+        _format_range(text, 0, len(text), pieces)
+        return "".join(pieces)
+
+    def feed(self, chunk: str) -> str:
+        """Formats a piece of a larger text, returns the part of the result that no longer depends on the following
+        pieces"""
+        self.__pending += chunk.replace("\r", "")
+        end = len(self.__pending)
+        # A trailing hyphen or line break needs the next character to be formatted
+        if end > self.__start and self.__pending[end - 1] in "-\n":
+            end -= 1
+        pieces = []
+        _format_range(self.__pending, self.__start, end, pieces)
+        # The last formatted character is kept since the next line break looks at it
+        if end > 0:
+            self.__pending = self.__pending[end - 1:]
+            self.__start = 1
+        return "".join(pieces)
+
+    def finish(self) -> str:
+        """Formats what is left of the text sent to the feed method and resets the formatter"""
+        pieces = []
+        _format_range(self.__pending, self.__start, len(self.__pending), pieces)
+        self.__pending = ""
+        self.__start = 0
+        return "".join(pieces)
@@ -0,0 +1,68 @@
+"""
+This module runs the monitoring and translation of the clipboard without a graphical interface, the translations are
+written to the standard output or to a file.
+"""
+import signal
+import sys
+from threading import Event
+
+import logger
+from impl import Requester
+from loaders import ConfigurationLoader
+
+
+class ConsoleRequester(Requester):
+    """Writes every completed translation to a stream"""
+
+    def __init__(self, stream=sys.stdout, show_source: bool = False):
+        """Registers the stream and whether the original content is written before its translation"""
+        super(ConsoleRequester, self).__init__()
+        self.__stream = stream
+        self.__show_source = show_source
+
+    def translation_completed(self, content: str, translation: str):
+        if self.__show_source:
+            self.__stream.write(content + "\n---\n")
+        self.__stream.write(translation + "\n\n")
+        self.__stream.flush()
+
+
+def run(config, requester: Requester, copy_translation: bool = False, stop: Event = None, source=None) -> int:
+    """Monitors the clipboard until the stop event is set, returns the exit code"""
+    from pipeline import build_translator, build_monitor, start_metrics_export, stop_metrics_export
+
+    if stop is None:
+        stop = Event()
+    try:
+        translator = build_translator(config)
+        monitor = build_monitor(config, requester, translator, source, copy_translation)
+    except Exception as ex:
+        logger.error("The translator could not be started")
+        logger.log(ex)
+        return 1
+    logger.info("Translating from %s to %s", translator.get_source(), translator.get_target())
+    start_metrics_export(config)
+    monitor.start_monitoring()
+    try:
+        while not stop.wait(0.5):
+            pass
+    finally:
+        monitor.stop_monitoring()
+        translator.close()
+        stop_metrics_export()
+    return 0
+
+
+def main(options) -> int:
+    """Starts the headless mode with the command line options"""
+    from pipeline import configure_logging
+
+    config = ConfigurationLoader(options.config) if options.config else ConfigurationLoader()
+    configure_logging(config)
+    stop = Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda number, frame: stop.set())
+    if options.output:
+        with open(options.output, "a", encoding="utf-8") as stream:
+            return run(config, ConsoleRequester(stream, options.show_source), options.copy_translation, stop)
+    return run(config, ConsoleRequester(sys.stdout, options.show_source), options.copy_translation, stop)
@@ -0,0 +1,227 @@
+"""
+This module provides an asynchronous HTTP/1.1 client that keeps the connections open between requests, the requests
+to the same host reuse the connections instead of opening a new one each time.
+"""
+import asyncio
+import ssl
+from collections import defaultdict
+from threading import Thread, Lock
+from urllib.parse import urlsplit
+
+import logger
+
+
+class HttpException(Exception):
+    """This exception is thrown in case the server sends a response that cannot be read"""
+
+    def __init__(self, msg):
+        super(HttpException, self).__init__(msg)
+
+
+class HttpResponse:
+    """Represents the response of a request"""
+
+    def __init__(self, status: int, headers: dict, body: bytes):
+        """Registers the status code, the headers with their names in lower case and the body"""
+        super(HttpResponse, self).__init__()
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self, encoding: str = "utf-8") -> str:
+        """Returns the body decoded"""
+        return self.body.decode(encoding, errors="replace")
+
+
+class _Connection:
+    """Stream pair of an open connection"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keeps the idle connections of each host and limits the number of connections open at the same time"""
+
+    def __init__(self, limit_per_host: int = 4, timeout: float = 10.0):
+        """Registers the maximum number of connections per host and the time limit of each request"""
+        super(ConnectionPool, self).__init__()
+        self.__limit_per_host = limit_per_host
+        self.__timeout = timeout
+        self.__idle = defaultdict(list)
+        self.__semaphores = {}
+        self.__ssl_context = ssl.create_default_context()
+        self.__opened = 0
+        self.__reused = 0
+
+    def __semaphore(self, key: tuple) -> asyncio.Semaphore:
+        """Returns the semaphore that limits the connections to a host"""
+        if key not in self.__semaphores:
+            self.__semaphores[key] = asyncio.Semaphore(self.__limit_per_host)
+        return self.__semaphores[key]
+
+    async def __connect(self, key: tuple) -> _Connection:
+        """Opens a new connection"""
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self.__ssl_context if scheme == "https" else None
+        )
+        self.__opened += 1
+        return _Connection(reader, writer)
+
+    async def request(self, method: str, url: str, headers: dict = None, body: bytes = b"") -> HttpResponse:
+        """Sends a request through an idle connection to the host, or a new one if there is not one"""
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}", f"Content-Length: {len(body)}"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        message = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        async with self.__semaphore(key):
+            return await asyncio.wait_for(self.__send(key, message, method), self.__timeout)
+
+    async def __send(self, key: tuple, message: bytes, method: str) -> HttpResponse:
+        """Writes the request and reads the response, a reused connection closed by the server is replaced by a new
+        one"""
+        while True:
+            reused = len(self.__idle[key]) > 0
+            connection = self.__idle[key].pop() if reused else await self.__connect(key)
+            try:
+                connection.writer.write(message)
+                await connection.writer.drain()
+                response, keep_alive = await self.__read_response(connection.reader, method)
+            except (ConnectionError, asyncio.IncompleteReadError, HttpException):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            if reused:
+                self.__reused += 1
+            if keep_alive:
+                self.__idle[key].append(connection)
+            else:
+                connection.close()
+            return response
+
+    @staticmethod
+    async def __read_response(reader: asyncio.StreamReader, method: str) -> tuple:
+        """Reads a response, returns it along with whether the connection can be reused"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise HttpException("The connection was closed by the server")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise HttpException(f"Malformed status line: {status_line!r}")
+        version, status = parts[0], int(parts[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Trailers end with an empty line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return HttpResponse(status, headers, body), keep_alive
+
+    def get_statistics(self) -> dict:
+        """Returns the number of connections opened and the number of requests sent through a reused connection"""
+        return {"connections-opened": self.__opened, "connections-reused": self.__reused}
+
+    async def close(self) -> None:
+        """Closes the idle connections"""
+        for connections in self.__idle.values():
+            for connection in connections:
+                connection.close()
+        self.__idle.clear()
+
+
+class EventLoopThread(Thread):
+    """Runs an asyncio event loop in a daemon thread, the coroutines can be sent to it from any other thread"""
+
+    __instance = None
+    __users = 0
+    __lock = Lock()
+
+    def __init__(self):
+        """Creates the event loop"""
+        super(EventLoopThread, self).__init__(name="asyncio-loop", daemon=True)
+        self.__loop = asyncio.new_event_loop()
+
+    @staticmethod
+    def get_instance():
+        """Returns the thread shared by the process, it is started the first time. Each caller that no longer needs
+        it calls release"""
+        with EventLoopThread.__lock:
+            if EventLoopThread.__instance is None:
+                EventLoopThread.__instance = EventLoopThread()
+                EventLoopThread.__instance.start()
+                logger.info("Event loop thread started")
+            EventLoopThread.__users += 1
+            return EventLoopThread.__instance
+
+    def release(self) -> None:
+        """Stops the loop when the last of the callers of get_instance releases it, a later call to get_instance
+        starts a new one"""
+        with EventLoopThread.__lock:
+            if EventLoopThread.__instance is not self:
+                return
+            EventLoopThread.__users -= 1
+            if EventLoopThread.__users > 0:
+                return
+            EventLoopThread.__instance = None
+        # The threads still waiting for a coroutine receive a CancelledError instead of waiting forever
+        self.submit(self.__cancel_tasks()).result()
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.join()
+        self.__loop.close()
+        logger.info("Event loop thread stopped")
+
+    @staticmethod
+    async def __cancel_tasks() -> None:
+        """Cancels the coroutines running in the loop and waits for them to end"""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self):
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.run_forever()
+
+    def submit(self, coroutine):
+        """Schedules the coroutine in the loop and returns a concurrent future with its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.__loop)
+
+    def run_coroutine(self, coroutine):
+        """Runs the coroutine in the loop and blocks the current thread until it ends"""
+        return self.submit(coroutine).result()
@@ -4,7 +4,8 @@ This module contains a series of classes with undefined methods to later be impl
 
 
 class Requester:
-    """Any class that requires content from the clipboard or test source must implement this class"""
+    """Any class that requires content from the clipboard or test source must implement this class, its methods are
+    called from the monitoring threads"""
 
     def __init__(self):
         """Constructor that starts the object"""
@@ -14,6 +15,18 @@ class Requester:
         """This method receives a series of key-value pairs"""
         pass
 
+    def set_number_characters(self, n_char: int):
+        """Receives the number of characters of the content"""
+        pass
+
+    def set_statistics(self, statistics: dict):
+        """Receives the statistics reported by the translator"""
+        pass
+
+    def translation_completed(self, content: str, translation: str):
+        """Receives a content along with its final translation"""
+        pass
+
 
 class AbstractMonitor:
     """Provides an abstract monitor model that can be used to monitor anything"""
@@ -62,3 +75,83 @@ class AbstractFormatter:
     def format(self, content) -> object:
         """Used to format objects"""
         pass
+
+
+class AbstractChangeSource:
+    """Provides the schema of a source that reports when the clipboard content may have changed"""
+
+    def __init__(self):
+        """Default constructor"""
+        super(AbstractChangeSource, self).__init__()
+
+    def open(self) -> None:
+        """Acquires the resources needed to listen for changes, it is called from the monitoring thread"""
+        pass
+
+    def wait(self) -> bool:
+        """Blocks until the clipboard content may have changed, returns False if there was no change"""
+        pass
+
+    def interrupt(self) -> None:
+        """Wakes up any thread blocked in the wait method"""
+        pass
+
+    def changed(self) -> None:
+        """Informs the source that the last content read was new"""
+        pass
+
+    def get_statistics(self) -> dict:
+        """Returns the counters collected by the source"""
+        return {}
+
+    def read(self) -> str:
+        """Returns the current content of the clipboard"""
+        pass
+
+    def write(self, content: str) -> None:
+        """Writes some text to the clipboard"""
+        pass
+
+    def close(self) -> None:
+        """Releases the resources acquired by the open method"""
+        pass
+
+
+class AbstractTranslator:
+    """Provides the schema of a translator from a source language to a target language"""
+
+    def __init__(self):
+        """Default constructor"""
+        super(AbstractTranslator, self).__init__()
+
+    def translate(self, text: str) -> str:
+        """Returns the translation of the text"""
+        pass
+
+    def translate_batch(self, texts: list) -> list:
+        """Returns the translations of a list of texts in the same order"""
+        return [self.translate(text) for text in texts]
+
+    def detect(self, text: str):
+        """Returns the language of the text, or None if the translator can't detect it"""
+        return None
+
+    def get_source(self) -> str:
+        """Returns the language of the texts received"""
+        pass
+
+    def get_target(self) -> str:
+        """Returns the language of the translations"""
+        pass
+
+    def get_statistics(self) -> dict:
+        """Returns the counters collected by the translator"""
+        return {}
+
+    def set_progress_listener(self, listener) -> None:
+        """Registers a function that receives the partial translations of long texts"""
+        pass
+
+    def close(self) -> None:
+        """Releases the threads and connections used by the translator"""
+        pass
@@ -4,10 +4,18 @@
 """
 
 import json
+import os
 import sys
+import time
+from threading import Lock, RLock
 
-import wx
-from wx import Image, Icon
+try:
+    import wx
+    from wx import Image, Icon
+except ImportError:
+    # The headless mode only uses the configuration loader
+    wx = None
+    Image = Icon = None
 
 import logger
 from __version__ import __version__
@@ -17,38 +25,153 @@ from impl import AbstractLoader
 INSTALL_DIR = str(__file__).replace("/loaders.py", "")
 
 
+class ConfigurationStore:
+    """Keeps the content of a configuration file shared by the whole process, the file is parsed once and read again
+    only when its modification time changes"""
+
+    # Minimum time in seconds between two checks of the modification time
+    CHECK_INTERVAL = 1.0
+
+    __instances = {}
+    __instances_lock = Lock()
+
+    def __init__(self, file_name: str, on_missing=None):
+        """Registers the file and the function called to create it if it does not exist"""
+        super(ConfigurationStore, self).__init__()
+        self.__file_name = file_name
+        self.__on_missing = on_missing
+        self.__data = None
+        self.__mtime = None
+        self.__last_check = 0.0
+        self.__reads = 0
+        self.__subscribers = []
+        self.__lock = RLock()
+
+    @staticmethod
+    def get_instance(file_name: str, on_missing=None):
+        """Returns the store of the file, it is created the first time it is requested"""
+        with ConfigurationStore.__instances_lock:
+            if file_name not in ConfigurationStore.__instances:
+                ConfigurationStore.__instances[file_name] = ConfigurationStore(file_name, on_missing)
+            return ConfigurationStore.__instances[file_name]
+
+    def get_data(self) -> dict:
+        """Returns the content of the file, reading it again if it was modified"""
+        with self.__lock:
+            now = time.monotonic()
+            if self.__data is None or now - self.__last_check >= ConfigurationStore.CHECK_INTERVAL:
+                self.__last_check = now
+                self.__refresh()
+            return self.__data
+
+    def __modification_time(self):
+        """Returns the modification time of the file or None if it does not exist"""
+        try:
+            return os.stat(self.__file_name).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def __refresh(self) -> None:
+        """Reads the file if its modification time changed and notifies the subscribers"""
+        mtime = self.__modification_time()
+        if self.__data is not None and mtime == self.__mtime:
+            return
+        if mtime is None and self.__on_missing is not None:
+            logger.error("Configuration file not found")
+            self.__on_missing()
+        first_load = self.__data is None
+        with open(self.__file_name) as file:
+            self.__data = json.load(file)
+        self.__reads += 1
+        self.__mtime = self.__modification_time()
+        if not first_load:
+            logger.info("Configuration file reloaded")
+            self.__notify()
+
+    def write(self, data: dict) -> None:
+        """Dumps the data to the file and notifies the subscribers"""
+        with self.__lock:
+            with open(self.__file_name, "w") as file:
+                json.dump(data, file, indent=4)
+            self.__data = data
+            self.__mtime = self.__modification_time()
+            self.__notify()
+
+    def __notify(self) -> None:
+        """Sends the new content to the subscribers"""
+        for subscriber in list(self.__subscribers):
+            try:
+                subscriber(self.__data)
+            except Exception as ex:
+                logger.log(ex)
+
+    def subscribe(self, subscriber) -> None:
+        """Registers a function that receives the content every time the file changes"""
+        with self.__lock:
+            self.__subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber) -> None:
+        """Removes a function registered by the subscribe method"""
+        with self.__lock:
+            if subscriber in self.__subscribers:
+                self.__subscribers.remove(subscriber)
+
+    def get_reads(self) -> int:
+        """Returns the number of times the file was parsed"""
+        return self.__reads
+
+
 # noinspection PyMethodMayBeStatic
 class ConfigurationLoader(AbstractLoader):
-    """This class is used to obtain information from the configuration file for the program"""
+    """This class is used to obtain information from the configuration file for the program, the content is shared
+    by every loader of the same file"""
 
     def __init__(self, file_name="/home/jhon/.local/share/transclip/config.json"):
-        """This constructor starts by loading the config file"""
+        """This constructor starts by getting the store of the config file"""
         super(ConfigurationLoader, self).__init__()
         self.__file_name = file_name
-        self.__load_configuration_file()
+        self.__store = ConfigurationStore.get_instance(file_name, self.__load_default_config)
 
-    def __load_configuration_file(self) -> None:
-        """Read the configuration file, if it does not exist, create one with a default configuration"""
-        try:
-            with open(self.__file_name) as file:
-                self.__data_file = json.load(file)
-        except FileNotFoundError:
-            logger.error("Configuration file not found")
-            self.__load_default_config()
-            with open(self.__file_name) as file:
-                self.__data_file = json.load(file)
+    @property
+    def __data_file(self) -> dict:
+        """Content of the configuration file"""
+        return self.__store.get_data()
+
+    def get_store(self) -> ConfigurationStore:
+        """Returns the store shared by the loaders of the file"""
+        return self.__store
+
+    def subscribe(self, subscriber) -> None:
+        """Registers a function that receives the content every time the configuration file changes"""
+        self.__store.subscribe(subscriber)
 
     def get(self, key) -> object:
         """Returns a value a from the configuration file through the indicated key"""
         return self.__data_file[key]
 
+    def get_option(self, section: str, key: str, default):
+        """Returns the value of a key inside a section, or the default value if the configuration file does not
+        have it"""
+        try:
+            return self.__data_file[section][key]
+        except (KeyError, TypeError):
+            return default
+
+    def get_path(self) -> str:
+        """Returns the path of the configuration file"""
+        return self.__file_name
+
     def set(self, key, value) -> None:
         """Set a new value for a key in the configuration file"""
-        self.__data_file[key] = value
-        self.write(self.__data_file, "/home/jhon/.local/share/transclip/config.json")
+        data = dict(self.__data_file)
+        data[key] = value
+        self.__store.write(data)
 
     def write(self, data, name):
         """Used to dump the data to the configuration file"""
+        if name == self.__file_name:
+            self.__store.write(data)
+            return
         with open(name, "w") as file:
             json.dump(data, file, indent=4)
 
@@ -65,9 +188,25 @@ class ConfigurationLoader(AbstractLoader):
             #     true: the program sets the field to see the original text.
             #     false: the program hides the original text field
             # font-size: indicates to the program the font size that the program's text containers will have.
+            # change-source: how the changes of the clipboard are detected.
+            # example:
+            #     "auto": uses the cheapest method available on the system.
+            #     "polling": reads the clipboard every delay time.
+            #     "sequence": queries the clipboard sequence number (Windows and macOS).
+            #     "xfixes": waits for the X11 selection owner notifications (Linux).
+            # poll-min, poll-max, poll-backoff: when the clipboard is polled, the interval starts at
+            # poll-min seconds after a change and is multiplied by poll-backoff while the clipboard is
+            # idle, up to poll-max seconds.
+            # batch-size: number of copies kept while a translation is in progress, they are translated
+            # together in as few requests as possible. With 1 only the newest copy is translated.
             "core": {
                 "version": __version__,
                 "delay": 0.5,
+                "change-source": "auto",
+                "poll-min": 0.1,
+                "poll-max": 2.0,
+                "poll-backoff": 1.5,
+                "batch-size": 1,
                 "source-preview": True,
                 "font-size": 15,
             },
@@ -76,18 +215,177 @@ class ConfigurationLoader(AbstractLoader):
             # example:
             # "source": "en"    spanish
             # "target": "ru"    russian
-            "language": {"source": "en", "target": "es"},
+            #
+            # segmentation: how the texts are split before being translated, only the modified
+            # segments of a text are translated again: "paragraph", "sentence" or "none".
+            # engine: "google" opens a connection for each request, "google-pooled" keeps them open
+            # between requests, up to "connections" per host, "dictionary" translates without network
+            # through the phrase table of the "dictionary" file (dictionary.json next to this file),
+            # "remote" sends the texts to the translation server described in the "server" section.
+            # chunk-size: maximum number of characters sent in a single request.
+            # workers: number of requests made at the same time for the long texts.
+            # timeout: seconds the google engines wait to connect and for each read of a response.
+            "language": {
+                "source": "en",
+                "target": "es",
+                "engine": "google",
+                "connections": 4,
+                "timeout": 10.0,
+                "segmentation": "paragraph",
+                "chunk-size": 4500,
+                "workers": 4,
+            },
             # Description of resources:
             # If you move or rearrange the resources folder, you can edit this
             # lines to indicate the new location of the resources
             # example:
             # /home/user/pictures/resources/img     for linux
             # C:/Users/user/resources/image         for windows
-            "resources": {"img": f"{INSTALL_DIR}/resources/img", "icon": f"{INSTALL_DIR}/resources/icon"},
+            # scaled-cache: keeps the scaled bitmaps as PNG files next to this file.
+            "resources": {
+                "img": f"{INSTALL_DIR}/resources/img",
+                "icon": f"{INSTALL_DIR}/resources/icon",
+                "scaled-cache": True,
+            },
+            # The translations already made are kept to avoid asking for them again:
+            # enabled: indicates if the translations are stored.
+            # memory-size: number of translations kept in memory.
+            # disk-size: number of translations kept in the database next to this file.
+            # ttl: seconds after which a translation is discarded.
+            "cache": {"enabled": True, "memory-size": 1024, "disk-size": 100000, "ttl": 2592000},
+            # The requests to the engine are protected against a slow or failing network:
+            # timeout: seconds each request may take.
+            # retries: times a failed request is sent again, waiting a random time up to
+            # backoff * 2^attempt seconds, without exceeding backoff-max.
+            # failure-threshold: consecutive failures after which the requests are rejected
+            # for reset-timeout seconds, the cached translations are still served.
+            # hedge: sends a request again when it takes longer than the hedge-percentile of
+            # the recent latencies, once there are hedge-min-samples of them.
+            "resilience": {
+                "enabled": True,
+                "timeout": 10.0,
+                "retries": 2,
+                "backoff": 0.25,
+                "backoff-max": 4.0,
+                "failure-threshold": 5,
+                "reset-timeout": 30.0,
+                "hedge": False,
+                "hedge-percentile": 95,
+                "hedge-min-samples": 20,
+            },
+            # The requests to the engine are limited so the public endpoints do not throttle them:
+            # rate: requests per second, retries included, the ones that exceed it wait in a queue
+            # where the latest clipboard content goes first and the documents translated with
+            # "translate" go last.
+            # burst: requests that can be sent at once after a pause.
+            "limits": {"enabled": True, "rate": 5.0, "burst": 10},
+            # The translation server started with "serve" shares its translator with every client:
+            # socket: Unix socket of the server, empty to use transclip.sock in a folder private to
+            # the user, the runtime folder of the session or transclip-<uid> in the temporary folder.
+            # engine: translation engine used by the server.
+            # shared: allows the clients of every user of the host to connect, the socket must
+            # then be in a folder they can reach.
+            # timeout: seconds a client waits for each response.
+            # owner: id of the user that must be running the server, -1 for the current user.
+            "server": {"socket": "", "engine": "google", "shared": False, "timeout": 30.0, "owner": -1},
+            # The messages are written by a background thread to a file rotated when it reaches max-bytes:
+            # file: path of the log, empty to use transclip.log next to this file.
+            # level: "DEBUG", "INFO", "WARNING" or "ERROR".
+            # backups: number of rotated files kept.
+            # console: also writes the messages to the standard error.
+            "logging": {"file": "", "level": "INFO", "max-bytes": 1048576, "backups": 3, "console": False},
+            # The metrics can be exported in the Prometheus text format:
+            # port: HTTP port on the address where they are served, 0 to not serve them.
+            # textfile: file rewritten every interval seconds for the node exporter, empty to not write it.
+            "metrics": {"enabled": False, "address": "127.0.0.1", "port": 9464, "textfile": "", "interval": 15.0},
         }
         self.write(config, f"{INSTALL_DIR}/config.json")
 
 
+class ResourceCache:
+    """Keeps the images, icons and bitmaps already decoded so that each resource is read and scaled only once, the
+    scaled bitmaps can also be kept on disk as PNG files"""
+
+    __instance = None
+    __instance_lock = Lock()
+
+    def __init__(self, directory: str = None):
+        """Registers the directory of the scaled bitmaps, without a directory they are only kept in memory"""
+        super(ResourceCache, self).__init__()
+        self.__directory = directory
+        self.__entries = {}
+        self.__lock = RLock()
+        self.__load_time = 0.0
+        self.__hits = 0
+        self.__misses = 0
+
+    @staticmethod
+    def get_instance():
+        """Returns the cache shared by the process, the directory of the scaled bitmaps is next to the configuration
+        file if the option resources.scaled-cache is enabled"""
+        with ResourceCache.__instance_lock:
+            if ResourceCache.__instance is None:
+                config = ConfigurationLoader()
+                directory = None
+                if bool(config.get_option("resources", "scaled-cache", True)):
+                    directory = os.path.join(os.path.dirname(config.get_path()), "scaled")
+                ResourceCache.__instance = ResourceCache(directory)
+            return ResourceCache.__instance
+
+    def __lookup(self, key: tuple, load):
+        """Returns the resource of the key, loading it the first time"""
+        with self.__lock:
+            if key in self.__entries:
+                self.__hits += 1
+                return self.__entries[key]
+            self.__misses += 1
+            start = time.perf_counter()
+            resource = load()
+            self.__load_time += time.perf_counter() - start
+            self.__entries[key] = resource
+            return resource
+
+    def get_image(self, path: str) -> Image:
+        """Returns the image of the file, the same object is returned to every caller so it must not be modified"""
+        return self.__lookup(("image", path), lambda: Image(path))
+
+    def get_icon(self, path: str) -> Icon:
+        """Returns the icon of the file"""
+        return self.__lookup(("icon", path), lambda: Icon(path))
+
+    def get_bitmap(self, path: str, size: tuple = None) -> "wx.Bitmap":
+        """Returns the bitmap of the file, scaled to the size (width, height) if one is indicated"""
+        if size is None:
+            return self.__lookup(("bitmap", path, None), lambda: wx.Bitmap(path))
+        return self.__lookup(("bitmap", path, tuple(size)), lambda: self.__load_scaled(path, size))
+
+    def __load_scaled(self, path: str, size: tuple) -> "wx.Bitmap":
+        """Reads the scaled bitmap from the disk cache, or scales the image and stores it there"""
+        width, height = size
+        cached = None
+        if self.__directory is not None:
+            stat = os.stat(path)
+            name = os.path.splitext(os.path.basename(path))[0]
+            cached = os.path.join(
+                self.__directory, f"{name}-{width}x{height}-{stat.st_size}-{stat.st_mtime_ns}.png"
+            )
+            if os.path.isfile(cached):
+                return wx.Bitmap(cached, wx.BITMAP_TYPE_PNG)
+        image = self.get_image(path).Scale(width, height, wx.IMAGE_QUALITY_HIGH)
+        if cached is not None:
+            try:
+                os.makedirs(self.__directory, exist_ok=True)
+                image.SaveFile(cached, wx.BITMAP_TYPE_PNG)
+            except Exception as ex:
+                logger.log(ex)
+        return wx.Bitmap(image)
+
+    def get_statistics(self) -> dict:
+        """Returns the number of resources found in the cache and the number loaded"""
+        with self.__lock:
+            return {"hits": self.__hits, "misses": self.__misses, "load-time": self.__load_time}
+
+
 # noinspection PyTypeChecker
 class ImageLoader(AbstractLoader):
     """This class is used to load images which are found in the resource directory"""
@@ -104,22 +402,18 @@ class ImageLoader(AbstractLoader):
 
     def get(self, key=None) -> Image:
         """Returns the image of the specified path"""
-        try:
-            with open(self.__path):
-                logger.info(self.__path)
-                return Image(self.__path)
-        except FileNotFoundError as ex:
-            logger.error(f"Image file '{self._image_name}' not found", ex)
-            return None
+        if os.path.isfile(self.__path):
+            logger.info(self.__path)
+            return ResourceCache.get_instance().get_image(self.__path)
+        logger.error("Image file '%s' not found", self._image_name)
+        return None
 
     def get_path(self) -> str:
         """Returns the path of the image"""
-        try:
-            with open(self.__path):
-                return self.__path
-        except FileNotFoundError as ex:
-            logger.error(f"Image file '{self._image_name}' not found", ex)
-            return None
+        if os.path.isfile(self.__path):
+            return self.__path
+        logger.error("Image file '%s' not found", self._image_name)
+        return None
 
 
 # noinspection PyTypeChecker
@@ -138,13 +432,11 @@ class IconLoader(AbstractLoader):
 
     def get(self, key=None) -> Icon:
         """Returns the icon of the specified path"""
-        try:
-            with open(self.__path):
-                logger.info(self.__path)
-                return Icon(self.__path)
-        except FileNotFoundError as ex:
-            logger.error(f"Icon file '{self._icon_name}' not found", ex)
-            return None
+        if os.path.isfile(self.__path):
+            logger.info(self.__path)
+            return ResourceCache.get_instance().get_icon(self.__path)
+        logger.error("Icon file '%s' not found", self._icon_name)
+        return None
 
     def get_path(self) -> str:
         return self.__path
@@ -169,15 +461,13 @@ class BitMapLoader(AbstractLoader):
         else:
             self.__path = self.__resources + "/" + self._bitmap_name
 
-    def get(self, key=None) -> wx.Bitmap:
+    def get(self, key=None) -> "wx.Bitmap":
         """Returns the image icon of the specified path"""
-        try:
-            with open(self.get_path()):
-                logger.info(self.get_path())
-                return wx.Bitmap(self.get_path())
-        except FileNotFoundError as ex:
-            logger.error(f"Icon file '{self._bitmap_name}' not found", ex)
-            return None
+        if os.path.isfile(self.get_path()):
+            logger.info(self.get_path())
+            return ResourceCache.get_instance().get_bitmap(self.get_path())
+        logger.error("Icon file '%s' not found", self._bitmap_name)
+        return None
 
     def get_path(self) -> str:
         return self.__path
@@ -1,14 +1,95 @@
+"""
+This module records the messages of the application. The records are put in a queue and written by a background
+thread, so the callers never wait for the disk. The messages are formatted only if their level is enabled:
+
+    logger.info("Loaded %s in %.3f seconds", name, seconds)
+
+Until configure is called the messages are discarded.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+_logger = logging.getLogger("transclip")
+_logger.addHandler(logging.NullHandler())
+_logger.propagate = False
+_listener = None
+
+FORMAT = "%(asctime)s %(levelname)-7s [%(threadName)s] %(message)s"
+
+
+def configure(
+    path: str = None,
+    level: str = "INFO",
+    max_bytes: int = 1024 * 1024,
+    backups: int = 3,
+    console: bool = False,
+) -> None:
+    """Starts writing the records of the level or higher to a file rotated when it reaches max_bytes, and to the
+    standard error if console is enabled. Calling it again replaces the previous configuration"""
+    global _listener
+    handlers = []
+    if path:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handlers.append(handler)
+    if console:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(FORMAT))
+    shutdown()
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+    _logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    if len(handlers) == 0:
+        _logger.addHandler(logging.NullHandler())
+        return
+    records = queue.SimpleQueue()
+    _logger.addHandler(logging.handlers.QueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown() -> None:
+    """Writes the records still in the queue and stops the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown)
+
+
+def is_enabled(level: int) -> bool:
+    """Check if the records of the level are written, it allows skipping the work of preparing a message"""
+    return _logger.isEnabledFor(level)
+
+
+def debug(msg, *args, **kwargs):
+    if _logger.isEnabledFor(logging.DEBUG):
+        _logger.debug(msg, *args, **kwargs)
+
+
 def info(msg, *args, **kwargs):
-    pass
+    if _logger.isEnabledFor(logging.INFO):
+        _logger.info(msg, *args, **kwargs)
 
 
 def warn(msg, *args, **kwargs):
-    pass
+    if _logger.isEnabledFor(logging.WARNING):
+        _logger.warning(msg, *args, **kwargs)
 
 
 def error(msg, *args, **kwargs):
-    pass
+    if _logger.isEnabledFor(logging.ERROR):
+        _logger.error(msg, *args, **kwargs)
 
 
 def log(exeption):
-    pass
+    """Records an exception along with its traceback"""
+    if _logger.isEnabledFor(logging.ERROR):
+        _logger.error("%s: %s", type(exeption).__name__, exeption, exc_info=exeption)
@@ -0,0 +1,209 @@
+"""
+This module measures how long each stage of the application takes. The durations are kept in histograms with fixed
+buckets, so recording a value costs the same no matter how many were recorded before:
+
+    with metrics.span("translate"):
+        translation = translator.translate(text)
+
+The histograms can be dumped at any moment, on Unix systems also by sending SIGUSR1 to the process. Along with them
+there are counters of events and collectors, functions that return the current statistics of a component when the
+metrics are exported.
+"""
+import bisect
+import signal
+import sys
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+import logger
+
+# Upper limits of the buckets in seconds, from 50 microseconds to 60 seconds
+BUCKETS = tuple(float(b * 10**e) for e in range(-5, 2) for b in (1, 2.5, 5))[2:] + (60.0,)
+
+
+class Histogram:
+    """Counts the values that fall in each bucket along with their sum, minimum and maximum"""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        """Starts an empty histogram with the indicated upper limits"""
+        super(Histogram, self).__init__()
+        self.__buckets = buckets
+        self.__counts = [0] * (len(buckets) + 1)
+        self.__count = 0
+        self.__sum = 0.0
+        self.__min = None
+        self.__max = None
+        self.__lock = Lock()
+
+    def observe(self, value: float) -> None:
+        """Records a value"""
+        index = bisect.bisect_left(self.__buckets, value)
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__count += 1
+            self.__sum += value
+            if self.__min is None or value < self.__min:
+                self.__min = value
+            if self.__max is None or value > self.__max:
+                self.__max = value
+
+    def get_buckets(self) -> tuple:
+        """Returns the upper limits of the buckets"""
+        return self.__buckets
+
+    def snapshot(self) -> dict:
+        """Returns a copy of the counters: the count of every bucket (the last one has no upper limit), the number of
+        values, their sum, the minimum and the maximum"""
+        with self.__lock:
+            return {
+                "buckets": list(self.__counts),
+                "count": self.__count,
+                "sum": self.__sum,
+                "min": self.__min,
+                "max": self.__max,
+            }
+
+    def quantile(self, q: float) -> float:
+        """Estimates the value below which the fraction q of the values fall, interpolating inside the bucket"""
+        data = self.snapshot()
+        if data["count"] == 0:
+            return 0.0
+        rank = q * data["count"]
+        seen = 0
+        for index, count in enumerate(data["buckets"]):
+            if count > 0 and seen + count >= rank:
+                lower = self.__buckets[index - 1] if index > 0 else 0.0
+                upper = self.__buckets[index] if index < len(self.__buckets) else data["max"]
+                lower = max(lower, data["min"])
+                upper = min(upper, data["max"])
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return data["max"]
+
+
+_histograms = {}
+_lock = Lock()
+
+
+def get_histogram(name: str) -> Histogram:
+    """Returns the histogram of the name, it is created the first time"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+
+def get_histograms() -> dict:
+    """Returns the histograms indexed by name"""
+    with _lock:
+        return dict(_histograms)
+
+
+def observe(name: str, value: float) -> None:
+    """Records a duration in seconds in the histogram of the name"""
+    get_histogram(name).observe(value)
+
+
+@contextmanager
+def span(name: str):
+    """Records how long the block takes in the histogram of the name, also when it raises an exception"""
+    histogram = get_histogram(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+_counters = {}
+_collectors = []
+
+
+def increment(name: str, amount: int = 1, **labels) -> None:
+    """Adds the amount to the counter of the name and labels"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def get_counters() -> dict:
+    """Returns the counters indexed by name and tuple of label pairs"""
+    with _lock:
+        return dict(_counters)
+
+
+def register_collector(collector) -> None:
+    """Registers a function that returns a dictionary with the current statistics of a component"""
+    with _lock:
+        _collectors.append(collector)
+
+
+def unregister_collector(collector) -> None:
+    """Removes a function registered with register_collector"""
+    with _lock:
+        if collector in _collectors:
+            _collectors.remove(collector)
+
+
+def collect() -> dict:
+    """Returns the numeric statistics of every collector, a collector that fails is skipped"""
+    with _lock:
+        collectors = list(_collectors)
+    values = {}
+    for collector in collectors:
+        try:
+            statistics = collector()
+        except Exception as ex:
+            logger.log(ex)
+            continue
+        for key, value in statistics.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[key] = value
+    return values
+
+
+def reset() -> None:
+    """Discards every histogram and counter"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def summary() -> dict:
+    """Returns the count, the mean and the main quantiles in seconds of every histogram"""
+    result = {}
+    for name, histogram in sorted(get_histograms().items()):
+        data = histogram.snapshot()
+        result[name] = {
+            "count": data["count"],
+            "mean": data["sum"] / data["count"] if data["count"] > 0 else 0.0,
+            "p50": histogram.quantile(0.5),
+            "p90": histogram.quantile(0.9),
+            "p99": histogram.quantile(0.99),
+            "max": data["max"] or 0.0,
+        }
+    return result
+
+
+def dump(stream=None) -> None:
+    """Writes a table with the latencies of every stage in milliseconds, by default to the standard error"""
+    stream = stream or sys.stderr
+    stream.write(f"{'stage':<20}{'count':>9}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}\n")
+    for name, values in summary().items():
+        stream.write(
+            f"{name:<20}{values['count']:>9}"
+            + "".join(f"{values[key] * 1000:>10.3f}" for key in ("mean", "p50", "p90", "p99", "max"))
+            + "\n"
+        )
+    stream.flush()
+
+
+def install_dump_signal() -> bool:
+    """Dumps the histograms every time the process receives SIGUSR1, returns False if the system does not have
+    it"""
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+    signal.signal(signal.SIGUSR1, lambda number, frame: dump())
+    return True
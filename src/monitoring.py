@@ -1,68 +1,321 @@
 """
 This module provides what is necessary to monitor the clipboard and process the content.
 """
-import wx
+import time
+
 import logger
-from clipboard import copy, paste
-from time import sleep
-from threading import Thread
-from impl import AbstractMonitor
+import metrics
+import ratelimit
+from collections import deque
+from clipboard import UnsupportedOperation
+from threading import Thread, Condition, Lock
+from impl import AbstractMonitor, AbstractChangeSource
 from formatters import PlainTextFormatter
+from sources import PollingChangeSource
+
+
+def fingerprint(text: str) -> tuple:
+    """Returns a cheap identifier of the text made of its length and its hash"""
+    return len(text), hash(text)
+
+
+class LatestQueue:
+    """Bounded queue that keeps the most recent items, when it is full the oldest item is discarded"""
+
+    def __init__(self, capacity: int = 1):
+        """Starts an empty queue with the indicated capacity"""
+        super(LatestQueue, self).__init__()
+        self.__items = deque(maxlen=capacity)
+        self.__condition = Condition()
+        self.__closed = False
+        self.__discarded = 0
+
+    def put(self, item) -> None:
+        """Adds an item, replacing the oldest one if the queue is full"""
+        with self.__condition:
+            if len(self.__items) == self.__items.maxlen:
+                self.__discarded += 1
+            self.__items.append(item)
+            self.__condition.notify()
+
+    def get(self, timeout: float = None):
+        """Removes and returns the oldest item, returns None if the timeout expires or the queue was closed"""
+        with self.__condition:
+            self.__condition.wait_for(lambda: len(self.__items) > 0 or self.__closed, timeout)
+            if len(self.__items) > 0:
+                return self.__items.popleft()
+            return None
+
+    def get_all(self, timeout: float = None) -> list:
+        """Removes and returns every item in order, the list is empty if the timeout expires or the queue was
+        closed"""
+        with self.__condition:
+            self.__condition.wait_for(lambda: len(self.__items) > 0 or self.__closed, timeout)
+            items = list(self.__items)
+            self.__items.clear()
+            return items
+
+    def close(self) -> None:
+        """Wakes up the threads waiting for an item"""
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+    def get_capacity(self) -> int:
+        """Returns the maximum number of items kept"""
+        return self.__items.maxlen
+
+    def get_discarded(self) -> int:
+        """Returns the number of items replaced before being consumed"""
+        with self.__condition:
+            return self.__discarded
+
+    def __len__(self) -> int:
+        with self.__condition:
+            return len(self.__items)
+
+
+class TranslationWorker(Thread, AbstractMonitor):
+    """Translates the contents produced by the clipboard monitor, the translations of the contents superseded by a
+    newer one are dropped. If the queue holds more than one item, the contents waiting together are translated as a
+    batch"""
+
+    def __init__(self, requester, translator, queue: LatestQueue, on_success, on_failure):
+        """Registers the translator, the queue from which the contents are taken and the functions called when a
+        translation ends"""
+        super(TranslationWorker, self).__init__(name="translation-worker")
+        self.__requester = requester
+        self.__translator = translator
+        self.__queue = queue
+        self.__on_success = on_success
+        self.__on_failure = on_failure
+        self.__dropped = 0
+        self.__translator.set_progress_listener(self.__show_progress)
+
+    def start_monitoring(self) -> None:
+        """Starts the thread that translates the contents"""
+        super().start_monitoring()
+        self.start()
+
+    def stop_monitoring(self) -> None:
+        """Stops the thread and waits for the translation in progress"""
+        super().stop_monitoring()
+        self.__queue.close()
+        if self.is_alive():
+            self.join()
+
+    def is_superseded(self) -> bool:
+        """Check if there is a newer content waiting to be translated, the batches are never superseded since the
+        contents waiting are different texts"""
+        if not self.is_running():
+            return True
+        return self.__queue.get_capacity() == 1 and len(self.__queue) > 0
+
+    def __show_progress(self, partial: str) -> None:
+        """Shows the partial translation unless it belongs to an old content"""
+        if not self.is_superseded():
+            self.__requester.set_content("target", partial)
+            # The pieces still waiting for the rate limit are shown while the text is translated
+            self.__requester.set_statistics(self.__translator.get_statistics())
+
+    def get_dropped(self) -> int:
+        """Returns the number of translations discarded because their content was superseded"""
+        return self.__dropped
+
+    def run(self):
+        """Takes the contents from the queue and translates them"""
+        while self.is_running():
+            contents = self.__queue.get_all(timeout=0.5)
+            if len(contents) == 0:
+                continue
+            try:
+                # The newest content goes before the requests waiting for the rate limit
+                with ratelimit.priority(ratelimit.INTERACTIVE), metrics.span("translate"):
+                    if len(contents) == 1:
+                        translated = self.__translator.translate(contents[0])
+                    else:
+                        translated = "\n\n".join(self.__translator.translate_batch(contents))
+            except Exception as ex:
+                logger.log(ex)
+                metrics.increment("translation_errors", type=type(ex).__name__)
+                self.__on_failure(contents[-1])
+                continue
+            if self.is_superseded():
+                self.__dropped += 1
+                continue
+            if len(contents) > 1:
+                self.__requester.set_content("source", "\n\n".join(contents))
+            self.__requester.set_content("target", translated)
+            self.__requester.set_statistics(self.__translator.get_statistics())
+            self.__requester.translation_completed("\n\n".join(contents), translated)
+            self.__on_success(contents[-1], translated)
 
 
 class ClipboardMonitor(Thread, AbstractMonitor):
     """This class is in charge of processing the clipboard content to later be translated into another language."""
 
-    def __init__(self, requester, translator, delay_time: float):
-        """This builder starts by requesting a content requester to submit the original and translated content"""
+    # Seconds before a content whose translation failed is sent again, doubled on every consecutive failure
+    RETRY_DELAY = 1.0
+    RETRY_DELAY_MAX = 60.0
+
+    def __init__(
+        self,
+        requester,
+        translator,
+        delay_time: float,
+        source: AbstractChangeSource = None,
+        batch_size: int = 1,
+        copy_translation: bool = False,
+    ):
+        """This builder starts by requesting a content requester to submit the original and translated content, the
+        source indicates how the changes of the clipboard are detected, by default it is read every delay time. With
+        a batch size greater than one, the contents copied while a translation is in progress are translated together
+        instead of keeping only the newest one. The formatted content is written back to the clipboard, or its
+        translation if copy_translation is enabled"""
         super(ClipboardMonitor, self).__init__()
         self.__requester = requester
         self.__translator = translator
         self.__delay_time = delay_time
         self.__formatter = PlainTextFormatter()
+        if source is None:
+            source = PollingChangeSource(delay_time)
+        self.__source = source
+        self.__copy_translation = copy_translation
+        # The worker updates the last contents when a translation ends while this thread reads them
+        self.__state_lock = Lock()
+        self.__last_content = ""
+        self.__last_characters = -1
+        self.__last_fingerprint = None
+        self.__written_fingerprint = None
+        self.__retry_at = None
+        self.__failures = 0
+        self.__skipped = 0
+        self.__queue = LatestQueue(max(1, batch_size))
+        self.__worker = TranslationWorker(
+            requester, translator, self.__queue, self.__translation_completed, self.__translation_failed
+        )
 
     def start_monitoring(self) -> None:
-        """Starts the thread to monitor the clipboard."""
+        """Starts the threads to monitor the clipboard and translate its content."""
         super().start_monitoring()
+        self.__worker.start_monitoring()
         self.start()
+        metrics.register_collector(self.get_statistics)
 
     def stop_monitoring(self) -> None:
-        """Stops the thread used to monitor the clipboard"""
+        """Stops the threads used to monitor the clipboard"""
         if self.is_running():
             logger.info("Stopping the run cycle")
             super().stop_monitoring()
+            self.__source.interrupt()
         if self.is_alive():
             logger.info("Ending the thread")
             self.join()
             logger.info("Thread completed successfully")
         else:
             logger.error("The thread had already finished previously")
+        self.__worker.stop_monitoring()
+        metrics.unregister_collector(self.get_statistics)
+
+    def invoke_translate(self, content: str) -> None:
+        """Shows the new content and sends it to the translation worker"""
+        self.__requester.set_content("source", content)
+        self.__requester.set_content("target", "Translating...")
+        self.__queue.put(content)
+
+    def __translation_completed(self, content: str, translation: str) -> None:
+        """Writes the formatted content or its translation back to the clipboard, the monitor will recognize it when
+        it reads it"""
+        written = translation if self.__copy_translation else content
+        with self.__state_lock:
+            self.__written_fingerprint = fingerprint(written)
+            self.__failures = 0
+        with metrics.span("copy"):
+            self.__source.write(written)
+
+    def __translation_failed(self, content: str) -> None:
+        """Allows the content to be sent again after a delay if it is still the last one read, the delay grows while
+        the translations keep failing"""
+        with self.__state_lock:
+            self.__failures += 1
+            if self.__last_content == content:
+                delay = min(ClipboardMonitor.RETRY_DELAY_MAX, ClipboardMonitor.RETRY_DELAY * 2 ** (self.__failures - 1))
+                self.__retry_at = time.monotonic() + delay
+
+    def get_source(self) -> AbstractChangeSource:
+        """Returns the source used to detect the changes of the clipboard"""
+        return self.__source
 
-    def invoke_translate(self, content: str, old: str):
-        wx.CallAfter(self.__requester.set_content, "source", content)
-        wx.CallAfter(self.__requester.set_content, "target", "Translating...")
+    def get_skipped(self) -> int:
+        """Returns the number of readings discarded without formatting because the content had not changed"""
+        return self.__skipped
+
+    def get_statistics(self) -> dict:
+        """Returns the statistics of the translator and the change source along with the contents waiting to be
+        translated and the ones discarded"""
+        statistics = dict(self.__translator.get_statistics())
+        statistics.update(self.__source.get_statistics())
+        statistics["queue-depth"] = len(self.__queue)
+        statistics["queue-discarded"] = self.__queue.get_discarded()
+        statistics["readings-skipped"] = self.__skipped
+        statistics["translations-dropped"] = self.__worker.get_dropped()
+        return statistics
+
+    def __open_source(self) -> None:
+        """Opens the change source, if the system does not support it, the clipboard is polled"""
         try:
-            translated = self.__translator.translate(content)
-            wx.CallAfter(self.__requester.set_content, "target", translated)
-            copy(content)
-            return content
-        except Exception as ex:
+            self.__source.open()
+        except UnsupportedOperation as ex:
+            logger.error("The change source is not supported, polling the clipboard")
             logger.log(ex)
-            return old
+            self.__source = PollingChangeSource(self.__delay_time)
+            self.__source.open()
 
     def run(self):
         """This method implements the code necessary to keep the clipboard monitoring"""
-        old_content = ""
-        while self.is_running():
-            clipboard_content: str = paste()
-            if (clipboard_content is not None) and (clipboard_content.__len__() > 0):
+        self.__open_source()
+        try:
+            changed = True
+            while self.is_running():
+                if changed:
+                    with metrics.span("paste"):
+                        content = self.__source.read()
+                    self.process(content)
+                changed = self.__source.wait()
+        finally:
+            self.__source.close()
+
+    def process(self, clipboard_content: str) -> None:
+        """Formats the content read from the clipboard and sends it to be translated if it is new"""
+        if (clipboard_content is not None) and (clipboard_content.__len__() > 0):
+            current = fingerprint(clipboard_content)
+            with self.__state_lock:
+                unchanged = current == self.__last_fingerprint
+                # The content whose translation failed is read again once its delay has passed
+                retry = unchanged and self.__retry_at is not None and time.monotonic() >= self.__retry_at
+                self.__last_fingerprint = current
+                # The content was written by the monitor itself, it is not a change made by the user
+                written = current == self.__written_fingerprint
+                if not unchanged:
+                    # The write is recognized once, the same text read after it or after another content is a copy
+                    self.__written_fingerprint = None
+                if retry or not unchanged:
+                    self.__retry_at = None
+            if (unchanged and not retry) or written:
+                self.__skipped += 1
+                return
+            # A retry is not a change, so the polling keeps backing off while the engine fails
+            if not retry:
+                self.__source.changed()
+                metrics.increment("clipboard_changes")
+            with metrics.span("format"):
                 clipboard_content = self.__formatter.format(clipboard_content)
-                wx.CallAfter(self.__requester.set_number_characters, len(clipboard_content))
-                if clipboard_content != old_content:
-                    old_content = self.invoke_translate(clipboard_content, old_content)
-                else:
-                    if old_content == "":
-                        old_content = self.invoke_translate(
-                            clipboard_content, old_content
-                        )
-            sleep(self.__delay_time)
+            if len(clipboard_content) != self.__last_characters:
+                self.__last_characters = len(clipboard_content)
+                self.__requester.set_number_characters(self.__last_characters)
+            with self.__state_lock:
+                new = retry or clipboard_content != self.__last_content
+                if new:
+                    self.__last_content = clipboard_content
+            if new:
+                self.invoke_translate(clipboard_content)
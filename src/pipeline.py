@@ -0,0 +1,165 @@
+"""
+This module assembles the translators used by the monitors from the configuration file.
+"""
+import os
+
+import logger
+from cache import TranslationMemory
+from impl import AbstractTranslator
+
+
+def configure_logging(config) -> None:
+    """Starts writing the log file indicated by the configuration, by default next to the configuration file"""
+    default_path = os.path.join(os.path.dirname(config.get_path()), "transclip.log")
+    logger.configure(
+        str(config.get_option("logging", "file", "")) or default_path,
+        str(config.get_option("logging", "level", "INFO")),
+        int(config.get_option("logging", "max-bytes", 1048576)),
+        int(config.get_option("logging", "backups", 3)),
+        bool(config.get_option("logging", "console", False)),
+    )
+
+
+def start_metrics_export(config) -> list:
+    """Starts exporting the metrics if the configuration enables it, returns the exporters running"""
+    if not bool(config.get_option("metrics", "enabled", False)):
+        return []
+    import exporter
+
+    # The port 0 of the configuration disables the endpoint
+    port = int(config.get_option("metrics", "port", 9464))
+    try:
+        return exporter.start(
+            str(config.get_option("metrics", "address", "127.0.0.1")),
+            port if port > 0 else None,
+            str(config.get_option("metrics", "textfile", "")),
+            float(config.get_option("metrics", "interval", 15.0)),
+        )
+    except OSError as ex:
+        logger.error("The metrics could not be exported")
+        logger.log(ex)
+        return []
+
+
+def stop_metrics_export() -> None:
+    """Stops the exporters started by start_metrics_export, the file is written one last time"""
+    import exporter
+
+    exporter.stop()
+
+
+def create_translation_memory(config) -> TranslationMemory:
+    """Creates the translation memory stored next to the configuration file"""
+    path = os.path.join(os.path.dirname(config.get_path()), "translations.sqlite3")
+    return TranslationMemory(
+        path,
+        int(config.get_option("cache", "memory-size", 1024)),
+        int(config.get_option("cache", "disk-size", 100000)),
+        float(config.get_option("cache", "ttl", 2592000)),
+    )
+
+
+def build_translator(config, engine: str = None) -> AbstractTranslator:
+    """Creates the translator indicated by the configuration along with the layers that wrap it, the engine of the
+    configuration can be replaced by another one"""
+    from translation import create_engine, CachedTranslator, SingleFlightTranslator
+    from segmentation import SegmentedTranslator, ChunkedTranslator
+
+    try:
+        source: str = config.get("language")["source"]
+        target: str = config.get("language")["target"]
+    except Exception as ex:
+        source: str = "en"
+        target: str = "es"
+        logger.log(ex)
+    if engine is None:
+        engine = str(config.get_option("language", "engine", "google"))
+    translator: AbstractTranslator = create_engine(engine, source, target, config)
+    if engine == "remote":
+        # The server already keeps the translation memory and splits the long texts
+        return translator
+    limiter = build_rate_limit(config) if bool(config.get_option("limits", "enabled", True)) else None
+    if bool(config.get_option("resilience", "enabled", True)):
+        # The retries and the duplicated requests also take their tokens
+        translator = build_resilience(config, translator, limiter)
+    elif limiter is not None:
+        from ratelimit import RateLimitedTranslator
+
+        translator = RateLimitedTranslator(translator, limiter)
+    # Concurrent requests of the same text share a single call to the engine
+    translator = SingleFlightTranslator(translator)
+    if bool(config.get_option("cache", "enabled", True)):
+        translator = CachedTranslator(translator, create_translation_memory(config))
+    segmentation = str(config.get_option("language", "segmentation", "paragraph"))
+    if segmentation in ("paragraph", "sentence"):
+        translator = SegmentedTranslator(translator, segmentation)
+    return ChunkedTranslator(
+        translator,
+        int(config.get_option("language", "chunk-size", 4500)),
+        int(config.get_option("language", "workers", 4)),
+    )
+
+
+def build_resilience(config, translator: AbstractTranslator, limiter=None) -> AbstractTranslator:
+    """Wraps the engine with the time limits, retries, circuit breaker and hedging indicated by the configuration,
+    every request sent to the engine takes a token from the limiter if one is given"""
+    from resilience import ResilientTranslator, CircuitBreaker
+
+    return ResilientTranslator(
+        translator,
+        float(config.get_option("resilience", "timeout", 10.0)),
+        int(config.get_option("resilience", "retries", 2)),
+        float(config.get_option("resilience", "backoff", 0.25)),
+        float(config.get_option("resilience", "backoff-max", 4.0)),
+        CircuitBreaker(
+            int(config.get_option("resilience", "failure-threshold", 5)),
+            float(config.get_option("resilience", "reset-timeout", 30.0)),
+        ),
+        bool(config.get_option("resilience", "hedge", False)),
+        float(config.get_option("resilience", "hedge-percentile", 95)),
+        int(config.get_option("resilience", "hedge-min-samples", 20)),
+        limiter=limiter,
+    )
+
+
+def build_rate_limit(config):
+    """Creates the priority scheduler with the rate limit indicated by the configuration"""
+    from ratelimit import PriorityScheduler, TokenBucket
+
+    return PriorityScheduler(
+        TokenBucket(
+            float(config.get_option("limits", "rate", 5.0)),
+            int(config.get_option("limits", "burst", 10)),
+        )
+    )
+
+
+def build_monitor(config, requester, translator: AbstractTranslator, source=None, copy_translation: bool = False):
+    """Creates the clipboard monitor indicated by the configuration, the change source is created from the
+    configuration unless one is given"""
+    from monitoring import ClipboardMonitor
+    from sources import create_change_source, AdaptiveScheduler
+
+    try:
+        delay_time: float = float(config.get("core")["delay"])
+        logger.info("Delay time established in %s seconds", delay_time)
+    except Exception as ex:
+        logger.log(ex)
+        delay_time: float = 0.5
+    if source is None:
+        source = create_change_source(
+            str(config.get_option("core", "change-source", "auto")),
+            AdaptiveScheduler(
+                float(config.get_option("core", "poll-min", 0.1)),
+                float(config.get_option("core", "poll-max", max(2.0, delay_time))),
+                float(config.get_option("core", "poll-backoff", 1.5)),
+            ),
+        )
+    return ClipboardMonitor(
+        requester,
+        translator,
+        delay_time,
+        source,
+        int(config.get_option("core", "batch-size", 1)),
+        copy_translation,
+    )
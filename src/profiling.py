@@ -0,0 +1,57 @@
+"""
+This module measures the time spent in each phase of the program startup, the measurements are only taken if they
+were enabled.
+"""
+import sys
+import time
+from contextlib import contextmanager
+
+_origin = time.perf_counter()
+_enabled = False
+_phases = []
+
+
+def enable() -> None:
+    """Starts taking the measurements"""
+    global _enabled
+    _enabled = True
+
+
+def is_enabled() -> bool:
+    """Check if the measurements are being taken"""
+    return _enabled
+
+
+@contextmanager
+def phase(name: str):
+    """Measures the time spent in the block of code"""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, start - _origin, time.perf_counter() - start))
+
+
+def mark(name: str) -> None:
+    """Registers the moment in which an event happened"""
+    if _enabled:
+        _phases.append((name, time.perf_counter() - _origin, 0.0))
+
+
+def get_phases() -> list:
+    """Returns the list of tuples (name, start, duration) measured, the times are in seconds since the module was
+    imported"""
+    return list(_phases)
+
+
+def report(stream=sys.stderr) -> None:
+    """Writes the measurements as a table"""
+    if not _enabled:
+        return
+    stream.write(f"{'phase':<32}{'start (ms)':>12}{'duration (ms)':>16}\n")
+    for name, start, duration in _phases:
+        stream.write(f"{name:<32}{start * 1000:>12.1f}{duration * 1000:>16.1f}\n")
+    stream.flush()
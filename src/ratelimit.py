@@ -0,0 +1,149 @@
+"""
+This module keeps the requests sent to the translation engine under a rate the public endpoints accept: a token bucket
+limits the requests per second allowing short bursts, and the requests waiting for a token are sent by priority, so
+the latest clipboard content goes before the documents translated in the background.
+"""
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+import metrics
+from impl import AbstractTranslator
+from translation import TranslatorWrapper, translate_packed
+
+# Priorities of the requests, the lower goes first
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+# Priority of the requests made by the current thread or task along with the moment it was assigned
+_PRIORITY = contextvars.ContextVar("translation_priority", default=(NORMAL, 0))
+_STAMPS = itertools.count(1)
+
+
+@contextmanager
+def priority(level: int):
+    """Sends the requests made inside the block with the priority indicated, the threads of the translators copy it
+    from the thread that submits the work"""
+    token = _PRIORITY.set((level, next(_STAMPS)))
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def get_priority() -> int:
+    """Returns the priority of the requests made by the current thread"""
+    return _PRIORITY.get()[0]
+
+
+class TokenBucket:
+    """Holds up to burst tokens that are refilled at rate tokens per second, each request takes one. It is not
+    synchronized, the scheduler uses it while holding its lock"""
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic):
+        """Registers the requests per second and the number of requests that can be sent at once"""
+        super(TokenBucket, self).__init__()
+        self.__rate = max(0.001, rate)
+        self.__capacity = float(max(1, burst))
+        self.__tokens = self.__capacity
+        self.__clock = clock
+        self.__updated = clock()
+
+    def try_acquire(self) -> float:
+        """Takes a token if there is one and returns 0, otherwise returns the seconds until the next token"""
+        now = self.__clock()
+        self.__tokens = min(self.__capacity, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
+        if self.__tokens >= 1.0:
+            self.__tokens -= 1.0
+            return 0.0
+        return (1.0 - self.__tokens) / self.__rate
+
+    def get_rate(self) -> float:
+        """Returns the requests per second"""
+        return self.__rate
+
+
+class PriorityScheduler:
+    """Lets the requests through as the bucket has tokens, the requests waiting are ordered by priority. Between
+    interactive requests the ones of the newest content go first, the rest keep their arrival order"""
+
+    def __init__(self, bucket: TokenBucket):
+        """Registers the bucket that limits the rate"""
+        super(PriorityScheduler, self).__init__()
+        self.__bucket = bucket
+        self.__condition = Condition(Lock())
+        self.__waiting = []
+        self.__sequence = itertools.count()
+        self.__throttled = 0
+        self.__waited = 0.0
+
+    def acquire(self) -> None:
+        """Blocks until the request of the current thread can be sent"""
+        level, stamp = _PRIORITY.get()
+        entry = (level, -stamp if level == INTERACTIVE else stamp, next(self.__sequence))
+        start = time.perf_counter()
+        with self.__condition:
+            heapq.heappush(self.__waiting, entry)
+            throttled = False
+            try:
+                while True:
+                    if self.__waiting[0] is entry:
+                        delay = self.__bucket.try_acquire()
+                        if delay == 0.0:
+                            break
+                        self.__condition.wait(delay)
+                    else:
+                        self.__condition.wait()
+                    throttled = True
+            finally:
+                self.__waiting.remove(entry)
+                heapq.heapify(self.__waiting)
+                self.__condition.notify_all()
+            if throttled:
+                self.__throttled += 1
+                self.__waited += time.perf_counter() - start
+        if throttled:
+            metrics.observe("rate_limit_wait", time.perf_counter() - start)
+
+    def try_acquire(self) -> bool:
+        """Takes a token without waiting, only if no request is waiting for one. Returns if it was taken"""
+        with self.__condition:
+            return len(self.__waiting) == 0 and self.__bucket.try_acquire() == 0.0
+
+    def get_queued(self) -> int:
+        """Returns the number of requests waiting"""
+        with self.__condition:
+            return len(self.__waiting)
+
+    def get_statistics(self) -> dict:
+        """Returns the requests waiting, the requests delayed and the seconds they waited"""
+        with self.__condition:
+            return {"queued": len(self.__waiting), "rate-limited": self.__throttled, "rate-limit-wait": self.__waited}
+
+
+class RateLimitedTranslator(TranslatorWrapper):
+    """Sends the requests to the translator no faster than the scheduler allows, the priority of each request is the
+    one assigned with priority() in the thread that makes it"""
+
+    def __init__(self, translator: AbstractTranslator, scheduler: PriorityScheduler):
+        """Registers the translator and the scheduler shared by the requests"""
+        super(RateLimitedTranslator, self).__init__(translator)
+        self.__scheduler = scheduler
+
+    def translate(self, text: str) -> str:
+        self.__scheduler.acquire()
+        return self._translator.translate(text)
+
+    def translate_batch(self, texts: list) -> list:
+        # The texts are packed here instead of in the engine, so every request sent for the batch takes its token
+        return translate_packed(self.translate, texts)
+
+    def get_statistics(self) -> dict:
+        statistics = dict(self._translator.get_statistics())
+        statistics.update(self.__scheduler.get_statistics())
+        return statistics
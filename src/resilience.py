@@ -0,0 +1,242 @@
+"""
+This module protects the callers from a slow or failing translation engine: every request has a time limit, the
+requests that fail because of the network or an overloaded engine are retried after a random delay that grows with
+each attempt, a circuit breaker rejects the requests while the engine keeps failing, and a slow request can be
+duplicated so the first answer is used.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+
+import logger
+from httpclient import HttpException
+from impl import AbstractTranslator
+from translation import TranslatorWrapper, translate_packed
+
+
+class TranslationTimeout(Exception):
+    """This exception is thrown in case the engine does not answer within the time limit"""
+
+    def __init__(self, msg):
+        super(TranslationTimeout, self).__init__(msg)
+
+
+class CircuitOpenException(Exception):
+    """This exception is thrown in case a request is rejected because the engine is failing"""
+
+    def __init__(self, msg):
+        super(CircuitOpenException, self).__init__(msg)
+
+
+def is_transient(ex: BaseException) -> bool:
+    """Check if a failed request may succeed when it is sent again: the time limits, the network failures and the
+    statuses of an overloaded engine"""
+    status = getattr(ex, "status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(ex, (TranslationTimeout, asyncio.TimeoutError, OSError, HttpException))
+
+
+class CircuitBreaker:
+    """Counts the consecutive failures, after the threshold the circuit opens and rejects the requests until the reset
+    time passes, then a single trial request decides if it closes again"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        """Registers the number of consecutive failures that opens the circuit and the seconds it stays open"""
+        super(CircuitBreaker, self).__init__()
+        self.__threshold = max(1, threshold)
+        self.__reset_timeout = reset_timeout
+        self.__clock = clock
+        self.__state = CircuitBreaker.CLOSED
+        self.__failures = 0
+        self.__opened = 0.0
+        self.__trial = False
+        self.__lock = Lock()
+
+    def allow(self) -> bool:
+        """Check if a request can be sent, when the reset time has passed only one request is allowed"""
+        with self.__lock:
+            if self.__state == CircuitBreaker.OPEN:
+                if self.__clock() - self.__opened < self.__reset_timeout:
+                    return False
+                self.__state = CircuitBreaker.HALF_OPEN
+                self.__trial = False
+            if self.__state == CircuitBreaker.HALF_OPEN:
+                if self.__trial:
+                    return False
+                self.__trial = True
+            return True
+
+    def record_success(self) -> None:
+        """Closes the circuit"""
+        with self.__lock:
+            if self.__state != CircuitBreaker.CLOSED:
+                logger.info("The translation engine recovered, closing the circuit")
+            self.__state = CircuitBreaker.CLOSED
+            self.__failures = 0
+            self.__trial = False
+
+    def record_failure(self) -> None:
+        """Counts a failure, the circuit opens if the threshold is reached or the trial request failed"""
+        with self.__lock:
+            self.__failures += 1
+            if self.__state == CircuitBreaker.HALF_OPEN or self.__failures >= self.__threshold:
+                if self.__state != CircuitBreaker.OPEN:
+                    logger.warn("The translation engine failed %d times, opening the circuit", self.__failures)
+                self.__state = CircuitBreaker.OPEN
+                self.__opened = self.__clock()
+                self.__trial = False
+
+    def get_state(self) -> str:
+        """Returns 'closed', 'open' or 'half-open'"""
+        with self.__lock:
+            return self.__state
+
+
+class ResilientTranslator(TranslatorWrapper):
+    """Sends the requests to the translator with a time limit, retries and a circuit breaker. If hedging is enabled, a
+    request slower than the percentile of the recent latencies is sent again and the first answer is used"""
+
+    def __init__(
+        self,
+        translator: AbstractTranslator,
+        timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        backoff_max: float = 4.0,
+        breaker: CircuitBreaker = None,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        workers: int = 8,
+        limiter=None,
+    ):
+        """Registers the translator, the seconds each request may take, how many times a failed request is retried,
+        the base and the maximum delay between attempts, the circuit breaker, the hedging settings and the scheduler
+        of the rate limit, if any, from which every attempt and every duplicate takes a token"""
+        super(ResilientTranslator, self).__init__(translator)
+        self.__limiter = limiter
+        self.__timeout = timeout
+        self.__retries = max(0, retries)
+        self.__backoff = backoff
+        self.__backoff_max = backoff_max
+        self.__breaker = breaker if breaker is not None else CircuitBreaker()
+        self.__hedge = hedge
+        self.__hedge_percentile = hedge_percentile
+        self.__hedge_min_samples = hedge_min_samples
+        self.__latencies = deque(maxlen=200)
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resilient")
+        self.__lock = Lock()
+        self.__retried = 0
+        self.__timeouts = 0
+        self.__rejected = 0
+        self.__hedged = 0
+        self.__hedge_wins = 0
+
+    def translate(self, text: str) -> str:
+        return self.__call(lambda: self._translator.translate(text), self.__hedge)
+
+    def translate_batch(self, texts: list) -> list:
+        # The texts are packed here instead of in the engine, so every request sent for the batch has its own time
+        # limit and retries and takes its own token
+        return translate_packed(lambda text: self.__call(lambda: self._translator.translate(text), False), texts)
+
+    def __call(self, call, hedge: bool):
+        """Runs the call retrying it after the failures, raises the last error if every attempt fails"""
+        attempt = 0
+        while True:
+            if not self.__breaker.allow():
+                with self.__lock:
+                    self.__rejected += 1
+                raise CircuitOpenException("The translation engine is failing, the request was not sent")
+            try:
+                result = self.__attempt(call, hedge)
+            except Exception as ex:
+                if not is_transient(ex):
+                    # The engine answered, the same request would fail again
+                    self.__breaker.record_success()
+                    raise
+                self.__breaker.record_failure()
+                if attempt >= self.__retries:
+                    raise
+                logger.warn("Translation attempt %d failed: %s", attempt + 1, ex)
+                # Full jitter spreads the retries of the clients that failed at the same moment
+                time.sleep(random.uniform(0, min(self.__backoff_max, self.__backoff * 2**attempt)))
+                attempt += 1
+                with self.__lock:
+                    self.__retried += 1
+                continue
+            self.__breaker.record_success()
+            return result
+
+    def __hedge_delay(self):
+        """Returns the latency percentile after which a request is duplicated, or None if there are not enough
+        samples"""
+        with self.__lock:
+            if len(self.__latencies) < self.__hedge_min_samples:
+                return None
+            ordered = sorted(self.__latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.__hedge_percentile / 100))
+        return ordered[index]
+
+    def __attempt(self, call, hedge: bool):
+        """Runs the call in the pool waiting at most the time limit, the call is duplicated if it takes longer than
+        the hedging delay"""
+        # The time waiting for the rate limit does not count towards the time limit
+        if self.__limiter is not None:
+            self.__limiter.acquire()
+        start = time.perf_counter()
+        primary = self.__executor.submit(call)
+        pending = {primary}
+        delay = self.__hedge_delay() if hedge else None
+        if delay is not None and delay < self.__timeout:
+            done, _ = wait(pending, delay)
+            # The request is only duplicated if the rate limit allows it right away
+            if len(done) == 0 and (self.__limiter is None or self.__limiter.try_acquire()):
+                pending.add(self.__executor.submit(call))
+                with self.__lock:
+                    self.__hedged += 1
+        error = None
+        while len(pending) > 0:
+            remaining = self.__timeout - (time.perf_counter() - start)
+            done, pending = wait(pending, max(0.0, remaining), FIRST_COMPLETED)
+            if len(done) == 0:
+                with self.__lock:
+                    self.__timeouts += 1
+                raise TranslationTimeout(f"The translation took more than {self.__timeout} seconds")
+            for future in done:
+                if future.exception() is None:
+                    with self.__lock:
+                        self.__latencies.append(time.perf_counter() - start)
+                        if future is not primary:
+                            self.__hedge_wins += 1
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def get_statistics(self) -> dict:
+        statistics = dict(self._translator.get_statistics())
+        with self.__lock:
+            statistics["retries"] = self.__retried
+            statistics["timeouts"] = self.__timeouts
+            statistics["circuit-rejections"] = self.__rejected
+            statistics["hedged"] = self.__hedged
+            statistics["hedge-wins"] = self.__hedge_wins
+        statistics["circuit-state"] = self.__breaker.get_state()
+        if self.__limiter is not None:
+            statistics.update(self.__limiter.get_statistics())
+        return statistics
+
+    def close(self) -> None:
+        """Stops the threads used to send the requests"""
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
@@ -0,0 +1,212 @@
+"""
+This module splits the texts into paragraphs or sentences so that each segment is translated on its own, when a text
+is edited only the modified segments are translated again. The texts too long for a single request are split into
+chunks translated concurrently.
+"""
+import contextvars
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+from impl import AbstractTranslator
+from translation import TranslatorWrapper
+
+# Blank lines between paragraphs
+_PARAGRAPH_SEPARATOR = re.compile(r"(\n[ \t]*\n\s*)")
+# Spaces after the punctuation that ends a sentence
+_SENTENCE_SEPARATOR = re.compile(r"(?<=[.!?])(\s+)")
+
+
+def split_segments(text: str, mode: str = "paragraph") -> list:
+    """Splits the text into a list of pairs (piece, translatable), the pieces that are not translatable are the
+    separators between segments, joining every piece results in the original text"""
+    pieces = []
+    parts = _PARAGRAPH_SEPARATOR.split(text)
+    for index, part in enumerate(parts):
+        if index % 2 == 1:
+            pieces.append((part, False))
+        elif mode == "sentence":
+            sentences = _SENTENCE_SEPARATOR.split(part)
+            for position, sentence in enumerate(sentences):
+                pieces.append((sentence, position % 2 == 0))
+        else:
+            pieces.append((part, True))
+    return [piece for piece in pieces if piece[0] != ""]
+
+
+def split_chunks(text: str, limit: int) -> list:
+    """Splits the text into pieces of at most limit characters, cutting between paragraphs when possible, then
+    between sentences and then between words, joining every piece results in the original text"""
+    units = []
+    for paragraph, _ in split_segments(text, "paragraph"):
+        if len(paragraph) <= limit:
+            units.append(paragraph)
+            continue
+        for sentence, _ in split_segments(paragraph, "sentence"):
+            if len(sentence) <= limit:
+                units.append(sentence)
+                continue
+            for word in re.split(r"(?<=\s)", sentence):
+                while len(word) > limit:
+                    units.append(word[:limit])
+                    word = word[limit:]
+                units.append(word)
+    chunks = []
+    current = ""
+    for unit in units:
+        if len(current) + len(unit) > limit and current != "":
+            chunks.append(current)
+            current = ""
+        current += unit
+    if current != "":
+        chunks.append(current)
+    return chunks
+
+
+def _surround(piece: str, core: str, translation: str) -> str:
+    """Replaces the core of the piece by its translation, keeping the spaces around it"""
+    start = piece.index(core)
+    return piece[:start] + translation + piece[start + len(core):]
+
+
+def translate_surrounded(translator: AbstractTranslator, piece: str) -> str:
+    """Translates the piece without its surrounding spaces and puts them back around the translation"""
+    core = piece.strip()
+    if core == "":
+        return piece
+    return _surround(piece, core, translator.translate(core))
+
+
+class SegmentedTranslator(TranslatorWrapper):
+    """Translates each segment of the text separately, the segments of the recent texts are reused so an edited text
+    only sends the modified segments to the translator"""
+
+    def __init__(self, translator: AbstractTranslator, mode: str = "paragraph", capacity: int = 4096):
+        """Registers the translator, how the texts are split: 'paragraph' or 'sentence', and how many segments are
+        remembered"""
+        super(SegmentedTranslator, self).__init__(translator)
+        self.__mode = mode
+        self.__capacity = capacity
+        self.__recent = OrderedDict()
+        self.__lock = Lock()
+        self.__segments = 0
+        self.__translated = 0
+
+    def translate(self, text: str) -> str:
+        return self.translate_batch([text])[0]
+
+    def translate_batch(self, texts: list) -> list:
+        """Splits the texts into segments, the segments not remembered are sent to the translator together so a new
+        text costs a single request instead of one per segment"""
+        layouts = []
+        known = {}
+        missing = {}
+        with self.__lock:
+            for text in texts:
+                pieces = []
+                for piece, translatable in split_segments(text, self.__mode):
+                    core = piece.strip()
+                    if not translatable or core == "":
+                        pieces.append((piece, None))
+                        continue
+                    self.__segments += 1
+                    translation = self.__recent.get(core)
+                    if translation is not None:
+                        self.__recent.move_to_end(core)
+                        known[core] = translation
+                    elif core not in missing:
+                        missing[core] = None
+                    pieces.append((piece, core))
+                layouts.append(pieces)
+        if len(missing) > 0:
+            cores = list(missing)
+            if len(cores) == 1:
+                translations = [self._translator.translate(cores[0])]
+            else:
+                translations = self._translator.translate_batch(cores)
+            with self.__lock:
+                self.__translated += len(cores)
+                for core, translation in zip(cores, translations):
+                    known[core] = translation
+                    self.__recent[core] = translation
+                    self.__recent.move_to_end(core)
+                while len(self.__recent) > self.__capacity:
+                    self.__recent.popitem(last=False)
+        return [
+            "".join(piece if core is None else _surround(piece, core, known[core]) for piece, core in pieces)
+            for pieces in layouts
+        ]
+
+    def get_statistics(self) -> dict:
+        statistics = dict(self._translator.get_statistics())
+        with self.__lock:
+            statistics["segments"] = self.__segments
+            statistics["segments-translated"] = self.__translated
+        return statistics
+
+
+class ChunkedTranslator(TranslatorWrapper):
+    """Splits the texts longer than the limit accepted by the translator and translates the pieces concurrently, the
+    progress listener receives the translation as the pieces are completed in order"""
+
+    def __init__(self, translator: AbstractTranslator, limit: int = 4500, workers: int = 4):
+        """Registers the translator, the maximum size of each request and the number of concurrent requests"""
+        super(ChunkedTranslator, self).__init__(translator)
+        self.__limit = limit
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translation")
+        self.__listener = None
+
+    def set_progress_listener(self, listener) -> None:
+        self.__listener = listener
+        self._translator.set_progress_listener(listener)
+
+    def translate(self, text: str) -> str:
+        if len(text) <= self.__limit:
+            return self._translator.translate(text)
+        chunks = split_chunks(text, self.__limit)
+        results = [None] * len(chunks)
+        futures = {}
+        for index, chunk in enumerate(chunks):
+            if chunk.strip() == "":
+                results[index] = chunk
+            else:
+                # The pieces keep the priority of the thread that asked for the translation
+                context = contextvars.copy_context()
+                futures[self.__executor.submit(context.run, translate_surrounded, self._translator, chunk)] = index
+        completed = 0
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                completed = self.__notify(results, completed)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return "".join(results)
+
+    def translate_batch(self, texts: list) -> list:
+        """Sends the short texts to the translator as a batch, the long ones are translated by chunks"""
+        results = list(texts)
+        short = [index for index, text in enumerate(texts) if len(text) <= self.__limit]
+        for index, translation in zip(short, self._translator.translate_batch([texts[i] for i in short])):
+            results[index] = translation
+        for index, text in enumerate(texts):
+            if len(text) > self.__limit:
+                results[index] = self.translate(text)
+        return results
+
+    def __notify(self, results: list, completed: int) -> int:
+        """Sends the translated pieces that have no pending piece before them to the listener, returns the number of
+        pieces sent"""
+        ready = completed
+        while ready < len(results) and results[ready] is not None:
+            ready += 1
+        if ready > completed and ready < len(results) and self.__listener is not None:
+            self.__listener("".join(results[:ready]))
+        return ready
+
+    def close(self) -> None:
+        """Stops the threads used to translate"""
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
@@ -0,0 +1,374 @@
+"""
+This module provides a local translation server, several clients share through a Unix domain socket the translator of
+a single process along with its translation memory and its connections.
+
+Every message is a frame made of its length as a 4 byte big endian integer followed by a UTF-8 JSON object. The
+requests have an "op" field: "translate" with a "text", "translate-batch" with a list of "texts", "detect" with a
+"text", "format" with a "text", "languages" or "statistics", along with the "priority" of the client for the rate
+limit. The responses carry the "result" or an "error".
+"""
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+from threading import Lock
+
+import logger
+from formatters import PlainTextFormatter
+from impl import AbstractTranslator
+from ratelimit import priority, get_priority, NORMAL
+
+# Length prefix of each frame
+_HEADER = struct.Struct(">I")
+# Frames larger than this are rejected
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+# The module can be imported where there are no Unix domain sockets, the server and the clients then refuse to start
+_StreamServer = getattr(socketserver, "UnixStreamServer", socketserver.TCPServer)
+
+
+class ProtocolException(Exception):
+    """This exception is thrown in case a frame cannot be read or the server answers with an error"""
+
+    def __init__(self, msg):
+        super(ProtocolException, self).__init__(msg)
+
+
+def _check_unix_sockets() -> None:
+    """Raises OSError if the system does not provide Unix domain sockets"""
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("The translation server needs Unix domain sockets, which are not available on this system")
+
+
+def _current_uid():
+    """Returns the user running the process, or None if the system has no user ids"""
+    return os.getuid() if hasattr(os, "getuid") else None
+
+
+def _private_directory() -> str:
+    """Returns a folder only the current user can access, the runtime folder of the session if there is one or a
+    folder of the user in the temporary folder. Raises PermissionError if the folder belongs to another user"""
+    runtime = os.environ.get("XDG_RUNTIME_DIR", "")
+    if runtime != "" and os.path.isdir(runtime):
+        return runtime
+    uid = _current_uid()
+    if uid is None:
+        # Without user ids the temporary folder already belongs to the user
+        return tempfile.gettempdir()
+    directory = os.path.join(tempfile.gettempdir(), f"transclip-{uid}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    # Another user could have created the folder first
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != uid or stat.S_IMODE(status.st_mode) & 0o077:
+        raise PermissionError(f"'{directory}' must be a folder only accessible by the current user")
+    return directory
+
+
+def default_socket_path() -> str:
+    """Returns the socket used when the configuration does not indicate one, it is private to the current user"""
+    return os.path.join(_private_directory(), "transclip.sock")
+
+
+def get_socket_path(config) -> str:
+    """Returns the socket indicated by the configuration"""
+    return str(config.get_option("server", "socket", "")) or default_socket_path()
+
+
+def get_peer_uid(connection: socket.socket):
+    """Returns the user of the process at the other end of the connection, or None if the system does not tell it"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = struct.Struct("3i")
+    _, uid, _ = credentials.unpack(connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, credentials.size))
+    return uid
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytes:
+    """Reads the indicated number of bytes, returns an empty string if the connection is closed before the first
+    one"""
+    data = bytearray()
+    while len(data) < size:
+        received = connection.recv(size - len(data))
+        if not received:
+            if len(data) == 0:
+                return b""
+            raise ProtocolException("The connection was closed in the middle of a frame")
+        data += received
+    return bytes(data)
+
+
+def send_frame(connection: socket.socket, message: dict) -> None:
+    """Writes the message as a frame"""
+    data = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    connection.sendall(_HEADER.pack(len(data)) + data)
+
+
+def receive_frame(connection: socket.socket):
+    """Reads a frame and returns its message, or None if the connection was closed"""
+    header = _receive_exactly(connection, _HEADER.size)
+    if not header:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolException(f"Frame of {size} bytes exceeds the limit")
+    data = _receive_exactly(connection, size)
+    if len(data) < size:
+        raise ProtocolException("The connection was closed in the middle of a frame")
+    return json.loads(data.decode("utf-8"))
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Answers the requests of a connection until the client closes it"""
+
+    def handle(self):
+        while True:
+            try:
+                request = receive_frame(self.request)
+            except (ProtocolException, ValueError, OSError) as ex:
+                logger.log(ex)
+                return
+            if request is None:
+                return
+            try:
+                response = {"result": self.server.execute(request)}
+            except Exception as ex:
+                logger.log(ex)
+                response = {"error": f"{type(ex).__name__}: {ex}"}
+            if "id" in request:
+                response["id"] = request["id"]
+            try:
+                send_frame(self.request, response)
+            except OSError:
+                return
+
+
+class TranslationServer(socketserver.ThreadingMixIn, _StreamServer):
+    """Serves the translator through a Unix domain socket, each connection is handled by its own thread"""
+
+    daemon_threads = True
+    # Pending connections accepted by the socket, many clients may connect at the same time
+    request_queue_size = 128
+
+    def __init__(self, translator: AbstractTranslator, path: str, shared: bool = False):
+        """Registers the translator and opens the socket, a shared socket can be used by every user of the host"""
+        _check_unix_sockets()
+        if os.path.lexists(path):
+            TranslationServer.__remove_stale_socket(path)
+        super(TranslationServer, self).__init__(path, _RequestHandler)
+        os.chmod(path, 0o666 if shared else 0o600)
+        self.__translator = translator
+        self.__path = path
+        self.__lock = Lock()
+        self.__requests = 0
+
+    @staticmethod
+    def __remove_stale_socket(path: str) -> None:
+        """Deletes the socket left by a server that is no longer running, raises OSError if one is running, the path
+        is not a socket or the socket can't be probed"""
+        # Connecting to a regular file is also refused, a mistyped path must not delete the file
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            raise FileExistsError(f"'{path}' exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.remove(path)
+            return
+        finally:
+            probe.close()
+        raise OSError(f"There is already a server listening on '{path}'")
+
+    def execute(self, request: dict):
+        """Runs the operation of a request and returns its result"""
+        with self.__lock:
+            self.__requests += 1
+        operation = request.get("op")
+        with priority(int(request.get("priority", NORMAL))):
+            return self.__run(operation, request)
+
+    def __run(self, operation: str, request: dict):
+        """Runs an operation with the arguments of the request"""
+        if operation == "translate":
+            return self.__translator.translate(request["text"])
+        if operation == "translate-batch":
+            return self.__translator.translate_batch(list(request["texts"]))
+        if operation == "detect":
+            return self.__translator.detect(request["text"])
+        if operation == "format":
+            return PlainTextFormatter().format(request["text"])
+        if operation == "languages":
+            return [self.__translator.get_source(), self.__translator.get_target()]
+        if operation == "statistics":
+            return self.get_statistics()
+        raise ProtocolException(f"Unknown operation '{operation}'")
+
+    def get_statistics(self) -> dict:
+        """Returns the counters of the translator along with the number of requests served"""
+        statistics = dict(self.__translator.get_statistics())
+        with self.__lock:
+            statistics["server-requests"] = self.__requests
+        return statistics
+
+    def server_close(self):
+        super(TranslationServer, self).server_close()
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+
+class RemoteTranslator(AbstractTranslator):
+    """Sends the texts to a translation server, the connections are kept open and reused by the following
+    requests"""
+
+    def __init__(self, path: str, timeout: float = 30.0, owner: int = None):
+        """Registers the socket of the server, the time limit of each request and the user that must be running the
+        server, by default the current one. The languages are the ones of the server"""
+        super(RemoteTranslator, self).__init__()
+        _check_unix_sockets()
+        self.__path = path
+        self.__timeout = timeout
+        self.__owner = _current_uid() if owner is None or owner < 0 else owner
+        self.__idle = []
+        self.__lock = Lock()
+        self.__languages = None
+
+    def __connect(self) -> socket.socket:
+        """Opens a new connection to the server"""
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.__timeout)
+        try:
+            connection.connect(self.__path)
+            # The texts are only sent to a server of the expected user, anyone could listen on a shared folder
+            uid = get_peer_uid(connection)
+            if uid is not None and self.__owner is not None and uid != self.__owner:
+                raise PermissionError(f"The server on '{self.__path}' is run by the user {uid}, not {self.__owner}")
+        except OSError:
+            connection.close()
+            raise
+        return connection
+
+    def call(self, operation: str, **arguments):
+        """Sends a request and returns its result, a reused connection closed by the server is replaced by a new
+        one. The request is only sent again if the server could not have received it"""
+        request = dict(arguments, op=operation, priority=get_priority())
+        while True:
+            with self.__lock:
+                reused = len(self.__idle) > 0
+                connection = self.__idle.pop() if reused else None
+            if connection is None:
+                connection = self.__connect()
+            try:
+                send_frame(connection, request)
+            except OSError:
+                connection.close()
+                if reused:
+                    continue
+                raise
+            try:
+                response = receive_frame(connection)
+            except ConnectionResetError:
+                connection.close()
+                # The server closed the idle connection with the request unread
+                if reused:
+                    continue
+                raise
+            except (OSError, ProtocolException, ValueError):
+                # The server may be translating the text, a timeout is not retried
+                connection.close()
+                raise
+            if response is None:
+                connection.close()
+                # The server closed the idle connection before reading the request
+                if reused:
+                    continue
+                raise ProtocolException("The connection was closed by the server")
+            with self.__lock:
+                self.__idle.append(connection)
+            if "error" in response:
+                raise ProtocolException(response["error"])
+            return response.get("result")
+
+    def translate(self, text: str) -> str:
+        return self.call("translate", text=text)
+
+    def translate_batch(self, texts: list) -> list:
+        return self.call("translate-batch", texts=texts)
+
+    def detect(self, text: str):
+        return self.call("detect", text=text)
+
+    def __get_languages(self) -> list:
+        """Asks the server for its languages the first time they are needed"""
+        if self.__languages is None:
+            self.__languages = self.call("languages")
+        return self.__languages
+
+    def get_source(self) -> str:
+        return self.__get_languages()[0]
+
+    def get_target(self) -> str:
+        return self.__get_languages()[1]
+
+    def get_statistics(self) -> dict:
+        try:
+            return self.call("statistics")
+        except (OSError, ProtocolException) as ex:
+            logger.log(ex)
+            return {}
+
+    def close(self) -> None:
+        """Closes the idle connections"""
+        with self.__lock:
+            for connection in self.__idle:
+                connection.close()
+            self.__idle.clear()
+
+
+def main(options) -> int:
+    """Runs the translation server until it is interrupted, returns the exit code"""
+    import signal
+    from threading import Thread
+
+    from loaders import ConfigurationLoader
+    import metrics
+    from pipeline import build_translator, configure_logging, start_metrics_export, stop_metrics_export
+
+    config = ConfigurationLoader(options.config) if getattr(options, "config", None) else ConfigurationLoader()
+    configure_logging(config)
+    engine = str(config.get_option("server", "engine", "google"))
+    if engine == "remote":
+        print("The server can't use the remote engine", file=sys.stderr)
+        return 1
+    translator = build_translator(config, engine)
+    try:
+        path = options.socket or get_socket_path(config)
+        server = TranslationServer(translator, path, bool(config.get_option("server", "shared", False)))
+    except OSError as ex:
+        logger.error("The translation server could not be started")
+        logger.log(ex)
+        print(ex, file=sys.stderr)
+        return 1
+
+    def stop(number, frame):
+        # shutdown must be called from a thread other than the one serving
+        Thread(target=server.shutdown).start()
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, stop)
+    metrics.register_collector(server.get_statistics)
+    start_metrics_export(config)
+    logger.info("Translation server listening on %s", path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        translator.close()
+        stop_metrics_export()
+    return 0
@@ -0,0 +1,337 @@
+"""
+This module provides the change sources used by the monitors to find out when the clipboard content changes.
+"""
+import ctypes
+import ctypes.util
+import os
+import platform
+import select
+from threading import Event, Lock
+
+import logger
+from clipboard import copy, paste, UnsupportedOperation, FakeClipboard
+from impl import AbstractChangeSource
+
+
+class AdaptiveScheduler:
+    """Calculates the interval between two readings of the clipboard, it starts with the minimum interval after a
+    change and multiplies it by the backoff factor on every idle reading until it reaches the maximum"""
+
+    def __init__(self, minimum: float, maximum: float, factor: float = 1.5):
+        """Registers the limits of the interval in seconds and the factor applied while the clipboard is idle"""
+        super(AdaptiveScheduler, self).__init__()
+        self.__minimum = minimum
+        self.__maximum = max(minimum, maximum)
+        self.__factor = max(1.0, factor)
+        self.__current = minimum
+        self.__lock = Lock()
+        self.__polls = 0
+        self.__total = 0.0
+
+    def next_interval(self) -> float:
+        """Returns the interval to wait before the next reading and increases the following one"""
+        with self.__lock:
+            interval = self.__current
+            self.__current = min(self.__maximum, self.__current * self.__factor)
+            self.__polls += 1
+            self.__total += interval
+            return interval
+
+    def reset(self) -> None:
+        """Returns to the minimum interval, it is called when the content changes"""
+        with self.__lock:
+            self.__current = self.__minimum
+
+    def get_statistics(self) -> dict:
+        """Returns the current interval, the mean interval and the number of readings scheduled"""
+        with self.__lock:
+            return {
+                "poll-interval": self.__current,
+                "poll-interval-mean": self.__total / self.__polls if self.__polls > 0 else self.__current,
+                "polls": self.__polls,
+            }
+
+
+class PollingChangeSource(AbstractChangeSource):
+    """Reads the clipboard every time the delay expires, it works on every system supported by pyperclip"""
+
+    def __init__(self, delay_time: float, reader=paste, writer=copy, scheduler: AdaptiveScheduler = None):
+        """Registers the interval between readings and the functions used to access the clipboard, if there is a
+        scheduler it decides the interval instead of the fixed delay"""
+        super(PollingChangeSource, self).__init__()
+        if scheduler is None:
+            scheduler = AdaptiveScheduler(delay_time, delay_time, 1.0)
+        self.__scheduler = scheduler
+        self.__reader = reader
+        self.__writer = writer
+        self.__interrupted = Event()
+
+    def open(self) -> None:
+        self.__interrupted.clear()
+
+    def wait(self) -> bool:
+        """Sleeps for the interval given by the scheduler, the content is always considered modified"""
+        return not self.__interrupted.wait(self.__scheduler.next_interval())
+
+    def changed(self) -> None:
+        self.__scheduler.reset()
+
+    def interrupt(self) -> None:
+        self.__interrupted.set()
+
+    def get_statistics(self) -> dict:
+        return self.__scheduler.get_statistics()
+
+    def read(self) -> str:
+        return self.__reader()
+
+    def write(self, content: str) -> None:
+        self.__writer(content)
+
+
+class SequenceChangeSource(AbstractChangeSource):
+    """Polls a sequence number provided by the system and only reads the clipboard when that number changes, the
+    sequence query is much cheaper than reading the content"""
+
+    def __init__(self, delay_time: float, sequence, reader=paste, writer=copy, scheduler: AdaptiveScheduler = None):
+        """Registers the interval between queries, the function that returns the sequence number and the functions
+        used to access the clipboard, if there is a scheduler it decides the interval instead of the fixed delay"""
+        super(SequenceChangeSource, self).__init__()
+        if scheduler is None:
+            scheduler = AdaptiveScheduler(delay_time, delay_time, 1.0)
+        self.__scheduler = scheduler
+        self.__sequence = sequence
+        self.__reader = reader
+        self.__writer = writer
+        self.__last_sequence = None
+        self.__interrupted = Event()
+
+    def open(self) -> None:
+        self.__interrupted.clear()
+        self.__last_sequence = self.__sequence()
+
+    def wait(self) -> bool:
+        while not self.__interrupted.wait(self.__scheduler.next_interval()):
+            current = self.__sequence()
+            if current != self.__last_sequence:
+                self.__last_sequence = current
+                return True
+        return False
+
+    def changed(self) -> None:
+        self.__scheduler.reset()
+
+    def interrupt(self) -> None:
+        self.__interrupted.set()
+
+    def get_statistics(self) -> dict:
+        return self.__scheduler.get_statistics()
+
+    def read(self) -> str:
+        return self.__reader()
+
+    def write(self, content: str) -> None:
+        self.__writer(content)
+
+
+# noinspection PyPep8Naming
+class _XFixesSelectionNotify(ctypes.Structure):
+    """Leading fields of the XFixesSelectionNotifyEvent structure"""
+
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("window", ctypes.c_ulong),
+        ("subtype", ctypes.c_int),
+        ("owner", ctypes.c_ulong),
+        ("selection", ctypes.c_ulong),
+    ]
+
+
+class XFixesChangeSource(AbstractChangeSource):
+    """Listens for the ownership changes of the X11 selection through the XFixes extension, the thread sleeps until the
+    X server reports that another client took the clipboard"""
+
+    # XFixesSetSelectionOwnerNotifyMask
+    OWNER_NOTIFY_MASK = 1
+
+    def __init__(self, selection: str = "CLIPBOARD", reader=paste, writer=copy):
+        """Loads the X11 libraries, raises UnsupportedOperation if they are not available"""
+        super(XFixesChangeSource, self).__init__()
+        if not XFixesChangeSource.is_supported():
+            raise UnsupportedOperation("The XFixes extension is not available")
+        self.__selection = selection.encode()
+        self.__reader = reader
+        self.__writer = writer
+        self.__display = None
+        self.__wakeup = None
+        self.__xlib = ctypes.CDLL(ctypes.util.find_library("X11"))
+        self.__xfixes = ctypes.CDLL(ctypes.util.find_library("Xfixes"))
+        self.__event_base = ctypes.c_int()
+        self.__declare_functions()
+
+    @staticmethod
+    def is_supported() -> bool:
+        """Check if there is an X11 display and the libraries needed to listen to it"""
+        return (
+            platform.system() == "Linux"
+            and os.environ.get("DISPLAY", "") != ""
+            and ctypes.util.find_library("X11") is not None
+            and ctypes.util.find_library("Xfixes") is not None
+        )
+
+    def __declare_functions(self):
+        """Indicates to ctypes the signatures of the functions used"""
+        xlib, xfixes = self.__xlib, self.__xfixes
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        xlib.XInternAtom.restype = ctypes.c_ulong
+        xlib.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        xlib.XPending.argtypes = [ctypes.c_void_p]
+        xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        xlib.XFlush.argtypes = [ctypes.c_void_p]
+        xfixes.XFixesQueryExtension.argtypes = [
+            ctypes.c_void_p,
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_int),
+        ]
+        xfixes.XFixesSelectSelectionInput.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_ulong,
+            ctypes.c_ulong,
+            ctypes.c_ulong,
+        ]
+
+    def open(self) -> None:
+        """Connects to the X server and subscribes to the selection owner notifications"""
+        self.__display = self.__xlib.XOpenDisplay(None)
+        if not self.__display:
+            raise UnsupportedOperation("Can't open the X11 display")
+        error_base = ctypes.c_int()
+        if not self.__xfixes.XFixesQueryExtension(
+            self.__display, ctypes.byref(self.__event_base), ctypes.byref(error_base)
+        ):
+            self.close()
+            raise UnsupportedOperation("The X server does not support XFixes")
+        root = self.__xlib.XDefaultRootWindow(self.__display)
+        atom = self.__xlib.XInternAtom(self.__display, self.__selection, 0)
+        self.__xfixes.XFixesSelectSelectionInput(
+            self.__display, root, atom, XFixesChangeSource.OWNER_NOTIFY_MASK
+        )
+        self.__xlib.XFlush(self.__display)
+        self.__wakeup = os.pipe()
+
+    def __drain_events(self) -> bool:
+        """Consumes the queued events, returns True if any of them is a selection notification"""
+        changed = False
+        # XEvent is a union padded to 24 longs
+        event = (ctypes.c_long * 24)()
+        while self.__xlib.XPending(self.__display) > 0:
+            self.__xlib.XNextEvent(self.__display, event)
+            notify = ctypes.cast(event, ctypes.POINTER(_XFixesSelectionNotify)).contents
+            if notify.type == self.__event_base.value:
+                changed = True
+        return changed
+
+    def wait(self) -> bool:
+        connection = self.__xlib.XConnectionNumber(self.__display)
+        while True:
+            if self.__drain_events():
+                return True
+            readable, _, _ = select.select([connection, self.__wakeup[0]], [], [], 1.0)
+            if self.__wakeup[0] in readable:
+                os.read(self.__wakeup[0], 1)
+                return False
+            if len(readable) == 0:
+                # Gives the monitor the chance to check its status
+                return False
+
+    def interrupt(self) -> None:
+        if self.__wakeup is not None:
+            os.write(self.__wakeup[1], b"\0")
+
+    def read(self) -> str:
+        return self.__reader()
+
+    def write(self, content: str) -> None:
+        self.__writer(content)
+
+    def close(self) -> None:
+        if self.__display:
+            self.__xlib.XCloseDisplay(self.__display)
+            self.__display = None
+        if self.__wakeup is not None:
+            os.close(self.__wakeup[0])
+            os.close(self.__wakeup[1])
+            self.__wakeup = None
+
+
+class FakeChangeSource(AbstractChangeSource):
+    """Listens to a FakeClipboard, the thread wakes up as soon as the content is written"""
+
+    def __init__(self, clipboard: FakeClipboard, timeout: float = 0.1):
+        """Registers the fake clipboard and the interval used to check if the source was interrupted"""
+        super(FakeChangeSource, self).__init__()
+        self.__clipboard = clipboard
+        self.__timeout = timeout
+        self.__last_sequence = None
+        self.__interrupted = Event()
+
+    def open(self) -> None:
+        self.__interrupted.clear()
+        self.__last_sequence = self.__clipboard.sequence()
+
+    def wait(self) -> bool:
+        while not self.__interrupted.is_set():
+            current = self.__clipboard.wait_for_change(self.__last_sequence, self.__timeout)
+            if current != self.__last_sequence:
+                self.__last_sequence = current
+                return True
+        return False
+
+    def interrupt(self) -> None:
+        self.__interrupted.set()
+
+    def read(self) -> str:
+        return self.__clipboard.paste()
+
+    def write(self, content: str) -> None:
+        self.__clipboard.copy(content)
+
+
+def _system_sequence():
+    """Returns the function that queries the clipboard sequence number of the system or None if there is not one"""
+    os_name = platform.system()
+    if os_name == "Windows":
+        return ctypes.windll.user32.GetClipboardSequenceNumber
+    elif os_name == "Darwin":
+        try:
+            from AppKit import NSPasteboard
+
+            return NSPasteboard.generalPasteboard().changeCount
+        except ImportError:
+            return None
+    return None
+
+
+def create_change_source(name: str, scheduler: AdaptiveScheduler) -> AbstractChangeSource:
+    """Creates the change source indicated by the name: 'polling', 'sequence', 'xfixes' or 'auto' to use the cheapest
+    one available on the system, the sources that poll the system use the scheduler to decide the interval"""
+    if name == "polling":
+        return PollingChangeSource(0, scheduler=scheduler)
+    if name in ("auto", "xfixes") and XFixesChangeSource.is_supported():
+        return XFixesChangeSource()
+    if name in ("auto", "sequence"):
+        sequence = _system_sequence()
+        if sequence is not None:
+            return SequenceChangeSource(0, sequence, scheduler=scheduler)
+    if name not in ("auto", "xfixes", "sequence"):
+        logger.warn("Unknown change source '%s'", name)
+    logger.info("Falling back to the polling change source")
+    return PollingChangeSource(0, scheduler=scheduler)
@@ -4,11 +4,12 @@ from threading import Thread
 import wx
 
 import logger
+import profiling
 from __version__ import __title__, __version__
 from impl import Requester
 from loaders import IconLoader, ConfigurationLoader, BitMapLoader
-from monitoring import ClipboardMonitor
-from clipboard import clear
+from clipboard import clear, UnsupportedOperation
+from dispatch import UpdateDispatcher
 from util import img_load_scaled_bitmap, check_button_bitmap
 from widgets import TextContainer, InformationBar, AboutDialog
 
@@ -107,6 +108,7 @@ class AppWindow(wx.Frame, Requester):
         self.__panel = wx.Panel(self)
         self.__widget_layout = wx.BoxSizer(wx.VERTICAL)
         self.__clipboard_monitor = None
+        self.__dispatcher = UpdateDispatcher(wx.CallAfter, wx.CallLater)
         try:
             self.__enabled_source_preview = bool(
                 ConfigurationLoader().get("core")["source-preview"]
@@ -134,8 +136,14 @@ class AppWindow(wx.Frame, Requester):
                 logger.log(ex)
 
     def initialize_window_features(self) -> None:
-        """Configure the window characteristics"""
+        """Configure the window characteristics, the menu bar and the icon are added by the
+        initialize_deferred_features method once the window is visible"""
         logger.info("Initializing window features")
+
+    def initialize_deferred_features(self) -> None:
+        """Adds the menu bar and the icon of the window, loading their bitmaps is postponed so the window appears
+        sooner"""
+        logger.info("Initializing deferred window features")
         self.SetMenuBar(WindowMenuBar(self))
         self.load_window_icon()
 
@@ -173,11 +181,14 @@ class AppWindow(wx.Frame, Requester):
         """Start the text containers"""
         logger.info("Initializing text containers")
 
+        # Once the user edits or clears a container, the same content posted again must be shown
         if self.__enabled_source_preview:
-            self.source_container = TextContainer(self.__panel)
+            self.source_container = TextContainer(
+                self.__panel, lambda: self.__dispatcher.forget(("content", "source"))
+            )
             self.__widget_layout.Add(self.source_container, 1, wx.CENTER | wx.EXPAND)
 
-        self.target_container = TextContainer(self.__panel)
+        self.target_container = TextContainer(self.__panel, lambda: self.__dispatcher.forget(("content", "target")))
         self.__widget_layout.Add(self.target_container, 1, wx.CENTER | wx.EXPAND)
 
     def _init_notification_bar(self):
@@ -187,44 +198,47 @@ class AppWindow(wx.Frame, Requester):
         self.__widget_layout.Add(self.notification_bar, 0, wx.CENTER)
 
     def set_content(self, target: str, content: str):
-        """Modify the text of the textual containers"""
+        """Modify the text of the textual containers, it can be called from any thread"""
+        self.__dispatcher.post(("content", target), self.__apply_content, target, content)
+
+    def __apply_content(self, target: str, content: str):
         if target == "source" and self.__enabled_source_preview:
-            self.source_container.get_text_container().SetValue(content)
+            self.source_container.set_text(content)
         elif target == "target":
-            self.target_container.get_text_container().SetValue(content)
+            self.target_container.set_text(content)
 
     def set_number_characters(self, n_char: int):
-        wx.CallAfter(self.notification_bar.set_number_characters, n_char)
+        self.__dispatcher.post("characters", self.notification_bar.set_number_characters, n_char)
+
+    def set_statistics(self, statistics: dict):
+        self.__dispatcher.post("statistics", self.notification_bar.set_statistics, statistics)
+
+    def set_state(self, state: str):
+        """Modify the connection state shown in the notification bar, it can be called from any thread"""
+        self.__dispatcher.post("state", self.notification_bar.set_state, state)
+
+    def get_dispatcher(self) -> UpdateDispatcher:
+        """Returns the channel used to update the interface"""
+        return self.__dispatcher
 
     def connect_to_server(self):
         try:
             wx.CallAfter(self.start_button.Enable, False)
             config = ConfigurationLoader()
-            from translation import PlainTextTranslator
-
-            try:
-                source: str = config.get("language")["source"]
-                target: str = config.get("language")["target"]
-            except Exception as ex:
-                source: str = "en"
-                target: str = "es"
-                logger.log(ex)
-            try:
-                delay_time: float = float(config.get("core")["delay"])
-                logger.info(f"Delay time established in {delay_time} seconds")
-            except Exception as ex:
-                logger.log(ex)
-                delay_time: float = 0.5
-            self.__clipboard_monitor = ClipboardMonitor(
-                self, PlainTextTranslator(source, target), delay_time
-            )
-            wx.CallAfter(self.notification_bar.set_source, source)
-            wx.CallAfter(self.notification_bar.set_target, target)
+            from pipeline import build_translator, build_monitor, start_metrics_export
+
+            translator = build_translator(config)
+            source: str = translator.get_source()
+            target: str = translator.get_target()
+            self.__clipboard_monitor = build_monitor(config, self, translator)
+            self.__dispatcher.post("source", self.notification_bar.set_source, source)
+            self.__dispatcher.post("target", self.notification_bar.set_target, target)
             self.__clipboard_monitor.start_monitoring()
-            wx.CallAfter(self.notification_bar.set_state, "Connected")
+            start_metrics_export(config)
+            self.set_state("Connected")
             wx.CallAfter(self.stop_button.Enable, True)
         except Exception as ex:
-            wx.CallAfter(self.notification_bar.set_state, "Bad network")
+            self.set_state("Bad network")
             wx.MessageDialog(
                 self,
                 message="Can't connect to the network",
@@ -237,7 +251,7 @@ class AppWindow(wx.Frame, Requester):
             logger.log(ex)
 
     def __start_button_action(self, event: wx.CommandEvent):
-        self.notification_bar.set_state("Connecting...")
+        self.set_state("Connecting...")
         connection = Thread(target=self.connect_to_server)
         connection.start()
 
@@ -247,11 +261,11 @@ class AppWindow(wx.Frame, Requester):
             logger.info("Checking the monitor")
             if self.__clipboard_monitor is not None:
                 logger.info("Notifying the disconnection")
-                wx.CallAfter(self.notification_bar.set_state, "Disconnecting...")
+                self.set_state("Disconnecting...")
                 logger.info("Stopping the monitor")
                 self.__clipboard_monitor.stop_monitoring()
                 logger.info("Notifying the stop of the monitor")
-                wx.CallAfter(self.notification_bar.set_state, "Disconnected")
+                self.set_state("Disconnected")
                 logger.info("Disconnection completed")
             wx.CallAfter(self.start_button.Enable, True)
             wx.CallAfter(self.stop_button.Enable, False)
@@ -262,7 +276,7 @@ class AppWindow(wx.Frame, Requester):
         except Exception as ex:
             logger.error("An exception was reported when stopping the monitor")
             logger.log(ex)
-            wx.CallAfter(self.notification_bar.set_state, "Thread error")
+            self.set_state("Thread error")
 
     def __stop_button_action(self, event: wx.CommandEvent = None):
         # disconnect = Thread(target=self.disconnect_from_server)
@@ -330,3 +344,56 @@ class AppWindow(wx.Frame, Requester):
             self.Destroy()
         else:
             event.StopPropagation()
+
+
+# noinspection PyAttributeOutsideInit
+class App(wx.App):
+    """This class starts the application"""
+
+    def __init__(self):
+        """Call the constructor of Object"""
+        self.exit_code = 0
+        super(App, self).__init__()
+
+    def OnInit(self) -> bool:
+        """This method is used to start the application"""
+        try:
+            logger.info("Initializing application")
+            with profiling.phase("create window"):
+                self.frame = AppWindow()
+            with profiling.phase("show window"):
+                self.frame.Show()
+                self.SetTopWindow(self.frame)
+            # The remaining work is done once the first frame has been shown
+            wx.CallAfter(self.on_first_frame)
+            return True
+        except Exception as ex:
+            logger.log(ex)
+            return False
+
+    def OnExit(self) -> int:
+        """Stops exporting the metrics before the application ends"""
+        from pipeline import stop_metrics_export
+
+        stop_metrics_export()
+        return super().OnExit()
+
+    def on_first_frame(self):
+        """Performs the tasks deferred until the window is visible"""
+        profiling.mark("first frame")
+        with profiling.phase("deferred window features"):
+            self.frame.initialize_deferred_features()
+        Thread(target=self.clear_clipboard, name="clipboard-clear").start()
+
+    def clear_clipboard(self):
+        """Cleans the clipboard, the program ends if the system does not support it"""
+        try:
+            logger.info("Cleaning the clipboard...")
+            with profiling.phase("clear clipboard"):
+                clear()
+        except UnsupportedOperation as ex:
+            logger.error("A error has occurred while cleaning the clipboard")
+            logger.log(ex)
+            self.exit_code = 1
+            wx.CallAfter(self.ExitMainLoop)
+        wx.CallAfter(profiling.report)
@@ -2,7 +2,14 @@
 This module provides all the necessary functionality to work with translation.
 """
 
-from deep_translator import GoogleTranslator
+import html
+import os
+import re
+from threading import Event, Lock
+from urllib.parse import urlencode
+
+from httpclient import ConnectionPool, EventLoopThread
+from impl import AbstractTranslator
 
 
 class TranslationException(Exception):
@@ -10,23 +17,375 @@ class TranslationException(Exception):
 
     def __init__(self, *args, **kwargs):
         """This constructor is in charge of passing the necessary arguments to the base class"""
-        super(TranslationException, self).__init__(args, kwargs)
+        super(TranslationException, self).__init__(*args, *kwargs.values())
+
+
+class HttpStatusException(TranslationException):
+    """This exception will be raised in case the engine answers with an unexpected HTTP status"""
+
+    def __init__(self, status: int):
+        """Registers the status of the response"""
+        super(HttpStatusException, self).__init__(f"Unexpected status {status}")
+        self.status = status
+
+
+# Markers placed between the texts of a batch, the first one that does not appear in any text is used
+_BATCH_MARKERS = ("[[§]]", "[[¶]]", "[[#]]", "[[@]]")
+
+
+def translate_packed(translate, texts: list, limit: int = 4500) -> list:
+    """Translates a list of texts joining them in as few requests as the limit of characters allows, the texts are
+    separated by a marker that the translator keeps, if the translator alters it the texts are sent one by one"""
+    results = list(texts)
+    pending = [index for index, text in enumerate(texts) if text.strip() != ""]
+    marker = next((m for m in _BATCH_MARKERS if not any(m in texts[index] for index in pending)), None)
+    if marker is None or len(pending) < 2:
+        for index in pending:
+            results[index] = translate(texts[index])
+        return results
+    separator = f"\n{marker}\n"
+    splitter = re.compile(r"\s*" + re.escape(marker) + r"\s*")
+    groups = []
+    group = []
+    size = 0
+    for index in pending:
+        length = len(texts[index]) + len(separator)
+        if len(group) > 0 and size + length > limit:
+            groups.append(group)
+            group = []
+            size = 0
+        group.append(index)
+        size += length
+    groups.append(group)
+    for group in groups:
+        if len(group) == 1:
+            results[group[0]] = translate(texts[group[0]])
+            continue
+        parts = splitter.split(translate(separator.join(texts[index].strip() for index in group)).strip())
+        if len(parts) == len(group):
+            for index, part in zip(group, parts):
+                results[index] = part
+        else:
+            for index in group:
+                results[index] = translate(texts[index])
+    return results
+
 
+# Endpoint of Google Translate used by the engines, it answers with a web page
+GOOGLE_URL = "https://translate.google.com/m"
+GOOGLE_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "text/html"}
+# The translation is inside the first element with this class
+_GOOGLE_RESULT = re.compile(r'<div[^>]*class="(?:result-container|t0)"[^>]*>(.*?)</div>', re.DOTALL)
 
-class PlainTextTranslator:
+
+# Language codes accepted by the endpoint, like 'en', 'zh-CN' or 'auto' for the source
+_LANGUAGE_CODE = re.compile(r"[a-z]{2,3}(-[A-Za-z]{2,4})?")
+
+
+def check_languages(source: str, target: str) -> None:
+    """Raises TranslationException if a language is not a code the endpoint accepts or both are the same"""
+    if source != "auto" and _LANGUAGE_CODE.fullmatch(str(source)) is None:
+        raise TranslationException(f"Unsupported source language '{source}'")
+    if _LANGUAGE_CODE.fullmatch(str(target)) is None:
+        raise TranslationException(f"Unsupported target language '{target}'")
+    if source == target:
+        raise TranslationException(f"The source and the target language are both '{source}'")
+
+
+def parse_google_result(page: str) -> str:
+    """Returns the translation contained in a page of Google Translate"""
+    match = _GOOGLE_RESULT.search(page)
+    if match is None:
+        raise TranslationException("The response does not contain a translation")
+    return html.unescape(match.group(1))
+
+
+class PlainTextTranslator(AbstractTranslator):
     """This class is used to translate plain text from one language to another."""
 
-    def __init__(self, source: str, target: str):
-        """Start the basic settings of the translator"""
+    def __init__(self, source: str, target: str, timeout: float = 10.0):
+        """Start the basic settings of the translator, the connection and each read of a request may take up to
+        timeout seconds"""
         super(PlainTextTranslator, self).__init__()
-        if source == target:
-            self.__translator = None
-            raise TranslationException()
-        else:
-            self.__translator = GoogleTranslator(source=source, target=target)
+        check_languages(source, target)
+        self.__source = source
+        self.__target = target
+        self.__timeout = timeout
+        import requests
+
+        self.__get = requests.get
 
     def translate(self, text):
-        if self.__translator is not None:
-            return self.__translator.translate(text)
+        if text.strip() == "":
+            return text
+        response = self.__get(
+            GOOGLE_URL,
+            params={"sl": self.__source, "tl": self.__target, "q": text},
+            headers=GOOGLE_HEADERS,
+            timeout=self.__timeout,
+        )
+        try:
+            if response.status_code != 200:
+                raise HttpStatusException(response.status_code)
+            return parse_google_result(response.text)
+        finally:
+            response.close()
+
+    def translate_batch(self, texts: list) -> list:
+        """Translates the texts packing them in as few requests as possible"""
+        return translate_packed(self.translate, texts)
+
+    def get_source(self) -> str:
+        return self.__source
+
+    def get_target(self) -> str:
+        return self.__target
+
+
+class PooledGoogleTranslator(AbstractTranslator):
+    """Translates through the same Google endpoint as PlainTextTranslator, the requests are sent from an asyncio
+    event loop through a pool of connections kept alive between translations"""
+
+    def __init__(self, source: str, target: str, limit_per_host: int = 4, timeout: float = 10.0):
+        """Start the basic settings of the translator and the pool of connections"""
+        super(PooledGoogleTranslator, self).__init__()
+        check_languages(source, target)
+        self.__source = source
+        self.__target = target
+        self.__pool = ConnectionPool(limit_per_host, timeout)
+        self.__loop = EventLoopThread.get_instance()
+
+    async def translate_async(self, text: str) -> str:
+        """Coroutine that translates the text, it must run in the event loop of the translator"""
+        if text.strip() == "":
+            return text
+        query = urlencode({"sl": self.__source, "tl": self.__target, "q": text})
+        response = await self.__pool.request("GET", f"{GOOGLE_URL}?{query}", GOOGLE_HEADERS)
+        if response.status != 200:
+            raise HttpStatusException(response.status)
+        return parse_google_result(response.text())
+
+    def translate(self, text):
+        """Translates the text blocking the current thread, it must not be called from the event loop"""
+        return self.__loop.run_coroutine(self.translate_async(text))
+
+    def translate_batch(self, texts: list) -> list:
+        """Translates the texts packing them in as few requests as possible"""
+        return translate_packed(self.translate, texts)
+
+    def get_source(self) -> str:
+        return self.__source
+
+    def get_target(self) -> str:
+        return self.__target
+
+    def get_statistics(self) -> dict:
+        return self.__pool.get_statistics()
+
+    def close(self) -> None:
+        """Closes the connections kept open and releases the event loop"""
+        if self.__loop is None:
+            return
+        try:
+            self.__loop.run_coroutine(self.__pool.close())
+        finally:
+            self.__loop.release()
+            self.__loop = None
+
+
+# Functions that create the translation engines, indexed by the name used in the configuration file
+_ENGINES = {}
+
+
+def register_engine(name: str, factory) -> None:
+    """Registers a function that receives the source language, the target language and the configuration, and
+    returns a translator"""
+    _ENGINES[name] = factory
+
+
+def get_engines() -> list:
+    """Returns the names of the registered engines"""
+    return sorted(_ENGINES.keys())
+
+
+def create_engine(name: str, source: str, target: str, config) -> AbstractTranslator:
+    """Creates the translator of the indicated engine"""
+    if name not in _ENGINES:
+        raise TranslationException(f"Unknown translation engine '{name}'")
+    return _ENGINES[name](source, target, config)
+
+
+def _create_dictionary_translator(source: str, target: str, config) -> AbstractTranslator:
+    from dictionary import DictionaryTranslator
+
+    default_path = os.path.join(os.path.dirname(config.get_path()), "dictionary.json")
+    return DictionaryTranslator(source, target, config.get_option("language", "dictionary", default_path))
+
+
+def _create_remote_translator(source: str, target: str, config) -> AbstractTranslator:
+    from server import RemoteTranslator, get_socket_path
+
+    return RemoteTranslator(
+        get_socket_path(config),
+        float(config.get_option("server", "timeout", 30.0)),
+        int(config.get_option("server", "owner", -1)),
+    )
+
+
+register_engine(
+    "google",
+    lambda source, target, config: PlainTextTranslator(
+        source, target, float(config.get_option("language", "timeout", 10.0))
+    ),
+)
+register_engine(
+    "google-pooled",
+    lambda source, target, config: PooledGoogleTranslator(
+        source,
+        target,
+        int(config.get_option("language", "connections", 4)),
+        float(config.get_option("language", "timeout", 10.0)),
+    ),
+)
+register_engine("dictionary", _create_dictionary_translator)
+register_engine("remote", _create_remote_translator)
+
+
+class TranslatorWrapper(AbstractTranslator):
+    """Base class of the translators that add a behavior to another translator, every method is delegated to it"""
+
+    def __init__(self, translator: AbstractTranslator):
+        """Registers the translator that does the work"""
+        super(TranslatorWrapper, self).__init__()
+        self._translator = translator
+
+    def translate(self, text: str) -> str:
+        return self._translator.translate(text)
+
+    def translate_batch(self, texts: list) -> list:
+        return self._translator.translate_batch(texts)
+
+    def detect(self, text: str):
+        return self._translator.detect(text)
+
+    def get_source(self) -> str:
+        return self._translator.get_source()
+
+    def get_target(self) -> str:
+        return self._translator.get_target()
+
+    def get_statistics(self) -> dict:
+        return self._translator.get_statistics()
+
+    def set_progress_listener(self, listener) -> None:
+        self._translator.set_progress_listener(listener)
+
+    def close(self) -> None:
+        self._translator.close()
+
+
+class CachedTranslator(TranslatorWrapper):
+    """Looks up the translations in a translation memory before asking the translator"""
+
+    def __init__(self, translator: AbstractTranslator, memory):
+        """Registers the translator and the translation memory in front of it"""
+        super(CachedTranslator, self).__init__(translator)
+        self.__memory = memory
+
+    def translate(self, text: str) -> str:
+        source, target = self.get_source(), self.get_target()
+        translation = self.__memory.get(source, target, text)
+        if translation is None:
+            translation = self._translator.translate(text)
+            if translation is not None:
+                self.__memory.put(source, target, text, translation)
+        return translation
+
+    def translate_batch(self, texts: list) -> list:
+        """Looks up every text and sends the missing ones to the translator in a single batch"""
+        source, target = self.get_source(), self.get_target()
+        results = [self.__memory.get(source, target, text) for text in texts]
+        missing = [index for index, translation in enumerate(results) if translation is None]
+        if len(missing) > 0:
+            translations = self._translator.translate_batch([texts[index] for index in missing])
+            for index, translation in zip(missing, translations):
+                results[index] = translation
+                if translation is not None:
+                    self.__memory.put(source, target, texts[index], translation)
+        return results
+
+    def get_statistics(self) -> dict:
+        statistics = dict(self._translator.get_statistics())
+        statistics.update(self.__memory.get_statistics())
+        lookups = statistics.get("cache-hits", 0) + statistics.get("cache-misses", 0)
+        if lookups > 0:
+            statistics["cache-hit-ratio"] = statistics.get("cache-hits", 0) / lookups
+        return statistics
+
+    def close(self) -> None:
+        """Closes the translation memory, writing what it has pending"""
+        self.__memory.close()
+        super().close()
+
+
+class _Flight:
+    """Call in progress shared by the requests of the same text"""
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightTranslator(TranslatorWrapper):
+    """Shares the call in progress between the concurrent requests of the same text, only the first request reaches
+    the translator and the others wait for its result or its error"""
+
+    def __init__(self, translator: AbstractTranslator):
+        """Registers the translator whose calls are shared"""
+        super(SingleFlightTranslator, self).__init__(translator)
+        self.__flights = {}
+        self.__lock = Lock()
+        self.__calls = 0
+        self.__deduplicated = 0
+
+    def __share(self, key: tuple, call):
+        """Runs the call unless there is one in progress with the same key, in that case waits for its outcome"""
+        with self.__lock:
+            flight = self.__flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self.__flights[key] = flight
+                self.__calls += 1
+            else:
+                self.__deduplicated += 1
+        if leader:
+            try:
+                flight.result = call()
+            except BaseException as ex:
+                flight.error = ex
+            finally:
+                with self.__lock:
+                    del self.__flights[key]
+                flight.done.set()
         else:
-            return "Translation failed"
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def translate(self, text: str) -> str:
+        key = (self.get_source(), self.get_target(), text)
+        return self.__share(key, lambda: self._translator.translate(text))
+
+    def translate_batch(self, texts: list) -> list:
+        key = (self.get_source(), self.get_target(), tuple(texts))
+        return list(self.__share(key, lambda: self._translator.translate_batch(texts)))
+
+    def get_statistics(self) -> dict:
+        statistics = dict(self._translator.get_statistics())
+        with self.__lock:
+            statistics["backend-calls"] = self.__calls
+            statistics["deduplicated"] = self.__deduplicated
+        return statistics
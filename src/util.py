@@ -1,5 +1,5 @@
 import wx
-from loaders import ImageLoader
+from loaders import ImageLoader, ResourceCache
 
 
 def scale_bitmap(bitmap: wx.Bitmap, width: int, height: int):
@@ -28,9 +28,10 @@ def img_to_bitmap(image: wx.Image):
 
 def img_load_scaled_bitmap(name: str, width: int, height: int):
     if name != "":
-        return img_to_bitmap(scale_image(ImageLoader(name).get(), width, height))
-    else:
-        return None
+        path = ImageLoader(name).get_path()
+        if path is not None:
+            return ResourceCache.get_instance().get_bitmap(path, (width, height))
+    return None
 
 
 def check_button_bitmap(button, bitmap):
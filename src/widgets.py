@@ -2,8 +2,9 @@
 This module provides custom widgets for certain functions
 """
 
+import platform
+
 import wx
-from wx.adv import AboutDialogInfo, AboutBox
 
 import logger
 from loaders import ConfigurationLoader, IconLoader
@@ -24,15 +25,46 @@ class ConfigWizard(wx.Dialog):
         pass
 
 
+def _common_prefix(first: str, second: str) -> int:
+    """Returns the length of the common prefix, the slices are compared by halves so the work is done in C"""
+    low, high = 0, min(len(first), len(second))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _changed_range(old: str, new: str) -> tuple:
+    """Returns the start of the change and its end in the old and in the new text"""
+    start = _common_prefix(old, new)
+    limit = min(len(old), len(new)) - start
+    suffix = _common_prefix(old[::-1][:limit], new[::-1][:limit])
+    return start, len(old) - suffix, len(new) - suffix
+
+
 # noinspection PyUnusedLocal
 class TextContainer(wx.BoxSizer):
-    """This widget is used to provide a text container next to the respective buttons that will allow manipulation"""
+    """This widget is used to provide a text container next to the respective buttons that will allow manipulation.
+    The programmatic updates only touch the modified range of the text, and the large documents are rendered
+    progressively starting with the visible beginning"""
 
-    def __init__(self, parent: wx.Panel):
-        """This constructor starts by storing the parent and then calling the methods that will start the respective
-        widgets"""
+    # Texts longer than this are rendered in pieces during the idle time
+    LARGE_DOCUMENT = 256 * 1024
+    RENDER_CHUNK = 64 * 1024
+
+    def __init__(self, parent: wx.Panel, on_modified=None):
+        """This constructor starts by storing the parent and the function called when the user edits or clears the
+        text, and then calling the methods that will start the respective widgets"""
         super(TextContainer, self).__init__(wx.VERTICAL)
         self.__parent = parent
+        self.__on_modified = on_modified
+        # Text shown by the control, None if the user modified it
+        self.__shown = ""
+        self.__updating = False
+        self.__generation = 0
         self.__init_widgets()
 
     def __init_widgets(self) -> None:
@@ -71,11 +103,69 @@ class TextContainer(wx.BoxSizer):
         """Returns the text container"""
         return self.__text_container
 
+    def set_text(self, text: str) -> None:
+        """Replaces the text of the container modifying only the range that changed"""
+        self.__generation += 1
+        shown = self.__shown
+        if shown is not None and text.startswith(shown):
+            self.__render(self.__generation, text, len(shown))
+            return
+        # On Windows the positions of the control do not match the indexes of the string
+        if shown is not None and len(text) <= TextContainer.LARGE_DOCUMENT and platform.system() != "Windows":
+            start, old_end, new_end = _changed_range(shown, text)
+            if (old_end - start) + (new_end - start) < len(text) // 2:
+                self.__updating = True
+                try:
+                    self.__text_container.Replace(start, old_end, text[start:new_end])
+                finally:
+                    self.__updating = False
+                self.__shown = text
+                self.__update_clear_button()
+                return
+        first = text[: TextContainer.RENDER_CHUNK] if len(text) > TextContainer.LARGE_DOCUMENT else text
+        self.__text_container.ChangeValue(first)
+        self.__shown = first
+        self.__render(self.__generation, text, len(first))
+
+    def append(self, text: str) -> None:
+        """Adds text at the end of the container, it is used to show the results that arrive in pieces"""
+        if self.__shown is None:
+            self.__shown = self.__text_container.GetValue()
+        self.set_text(self.__shown + text)
+
+    def __render(self, generation: int, text: str, offset: int) -> None:
+        """Appends the text from the offset, the large documents are appended a piece at a time so the interface
+        keeps responding, a newer update cancels the pieces left"""
+        if generation != self.__generation:
+            return
+        if offset < len(text):
+            if len(text) - offset > TextContainer.LARGE_DOCUMENT:
+                end = offset + TextContainer.RENDER_CHUNK
+            else:
+                end = len(text)
+            self.__updating = True
+            try:
+                self.__text_container.AppendText(text[offset:end])
+            finally:
+                self.__updating = False
+            self.__shown = text[:end]
+            if end < len(text):
+                wx.CallAfter(self.__render, generation, text, end)
+        self.__update_clear_button()
+
+    def __update_clear_button(self) -> None:
+        """Enables the clear button if the container has text"""
+        self.__clear_button.Enable(enable=self.__text_container.GetLastPosition() > 0)
+
     def _text_push_event(self, event: wx.CommandEvent):
-        if len(event.GetString()) > 0:
-            self.__clear_button.Enable(enable=True)
-        else:
-            self.__clear_button.Enable(enable=False)
+        if self.__updating:
+            return
+        # The user modified the text, so the next update replaces it completely
+        self.__shown = None
+        self.__generation += 1
+        self.__update_clear_button()
+        if self.__on_modified is not None:
+            self.__on_modified()
 
     def _clear_button_event(self, event: wx.CommandEvent):
         """Clean button action"""
@@ -122,6 +212,12 @@ class InformationBar(wx.BoxSizer):
         self.__number_characters = wx.StaticText(self.__parent, label="Characters: 0")
         labels_layout.Add(self.__number_characters, 0, wx.ALL, 5)
 
+        self.__cache_label = wx.StaticText(self.__parent, label="Cache: 0 hits, 0 misses")
+        labels_layout.Add(self.__cache_label, 0, wx.ALL, 5)
+
+        self.__queued_label = wx.StaticText(self.__parent, label="Queued: 0")
+        labels_layout.Add(self.__queued_label, 0, wx.ALL, 5)
+
         self.Add(labels_layout, 0, wx.ALL, 5)
 
     def set_state(self, state: str):
@@ -140,6 +236,16 @@ class InformationBar(wx.BoxSizer):
         if n_char >= 0:
             self.__number_characters.SetLabel(f"Characters: {n_char}")
 
+    def set_statistics(self, statistics: dict):
+        if statistics is None:
+            return
+        if "cache-hits" in statistics:
+            hits = statistics["cache-hits"]
+            misses = statistics.get("cache-misses", 0)
+            self.__cache_label.SetLabel(f"Cache: {hits} hits, {misses} misses")
+        if "queued" in statistics:
+            self.__queued_label.SetLabel(f"Queued: {statistics['queued']}")
+
 
 class ConfigurationDialog(wx.Dialog):
     """It will create a configuration dialog on which the program can be configured without having to do
@@ -156,6 +262,8 @@ class AboutDialog:
         """Load the respective information of the program"""
         super(AboutDialog, self).__init__()
         self.__parent = parent
+        from wx.adv import AboutDialogInfo
+
         self.info = AboutDialogInfo()
         self.info.SetIcon(IconLoader(name="favicon.png").get())
         self.info.SetName(__version__.__title__)
@@ -169,4 +277,6 @@ class AboutDialog:
 
     def show(self):
         """Displays the information in a dialog box"""
+        from wx.adv import AboutBox
+
         AboutBox(self.info, parent=self.__parent)
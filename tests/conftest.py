@@ -0,0 +1,6 @@
+import os
+import sys
+
+SOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SOURCES not in sys.path:
+    sys.path.insert(0, SOURCES)
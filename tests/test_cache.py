@@ -0,0 +1,121 @@
+import sqlite3
+
+import pytest
+
+import cache
+from cache import TranslationMemory, digest
+
+
+class _Clock:
+    """Replaces the time module of the cache so the entries can be aged"""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def _rows(path) -> dict:
+    connection = sqlite3.connect(str(path))
+    try:
+        return {row[0]: row[1] for row in connection.execute("SELECT digest, accessed FROM translations")}
+    finally:
+        connection.close()
+
+
+def test_least_recently_used_entry_is_evicted_from_memory(clock):
+    memory = TranslationMemory(memory_size=2)
+    memory.put("en", "es", "one", "uno")
+    memory.put("en", "es", "two", "dos")
+    assert memory.get("en", "es", "one") == "uno"
+    memory.put("en", "es", "three", "tres")
+    assert memory.get("en", "es", "two") is None
+    assert memory.get("en", "es", "one") == "uno"
+    assert memory.get("en", "es", "three") == "tres"
+    assert memory.get_statistics() == {"cache-hits": 3, "cache-misses": 1}
+
+
+def test_languages_are_part_of_the_key(clock):
+    memory = TranslationMemory()
+    memory.put("en", "es", "one", "uno")
+    assert memory.get("en", "fr", "one") is None
+
+
+def test_text_is_normalized_before_the_lookup(clock):
+    memory = TranslationMemory()
+    # The accent is a combining character in the stored text and part of the letter in the one looked up
+    memory.put("en", "es", "  cafe\u0301\n", "caf\u00e9")
+    assert memory.get("en", "es", "caf\u00e9") == "caf\u00e9"
+    assert digest(" cafe\u0301 ") == digest("caf\u00e9")
+
+
+def test_expired_entries_are_discarded_in_memory_and_on_disk(clock, tmp_path):
+    path = tmp_path / "memory.db"
+    memory = TranslationMemory(str(path), memory_size=1, ttl=60)
+    memory.put("en", "es", "one", "uno")
+    memory.put("en", "es", "two", "dos")
+    clock.now += 61
+    # The first one is only on disk, the second one is also in memory
+    assert memory.get("en", "es", "one") is None
+    assert memory.get("en", "es", "two") is None
+    memory.close()
+    assert digest("one") not in _rows(path)
+
+
+def test_entries_on_disk_survive_a_restart(clock, tmp_path):
+    path = str(tmp_path / "memory.db")
+    memory = TranslationMemory(path)
+    memory.put("en", "es", "one", "uno")
+    memory.close()
+    memory = TranslationMemory(path)
+    try:
+        assert memory.get("en", "es", "one") == "uno"
+    finally:
+        memory.close()
+
+
+def test_disk_size_is_enforced_every_64_writes(clock, tmp_path):
+    path = tmp_path / "memory.db"
+    memory = TranslationMemory(str(path), memory_size=1, disk_size=10)
+    for index in range(63):
+        clock.now += 1
+        memory.put("en", "es", f"text {index}", f"texto {index}")
+    assert len(_rows(path)) == 63
+    clock.now += 1
+    memory.put("en", "es", "text 63", "texto 63")
+    rows = _rows(path)
+    assert len(rows) == 10
+    # The most recently used entries are kept
+    assert set(rows) == {digest(f"text {index}") for index in range(54, 64)}
+    memory.close()
+
+
+def test_access_times_are_written_in_groups(clock, tmp_path):
+    path = tmp_path / "memory.db"
+    memory = TranslationMemory(str(path), memory_size=1)
+    written = clock.now
+    for index in range(65):
+        memory.put("en", "es", f"text {index}", f"texto {index}")
+    clock.now += 100
+    # The entries read from the disk are not updated one by one
+    assert memory.get("en", "es", "text 0") == "texto 0"
+    assert _rows(path)[digest("text 0")] == written
+    for index in range(1, 64):
+        assert memory.get("en", "es", f"text {index}") == f"texto {index}"
+    # The 64th read writes the group
+    rows = _rows(path)
+    assert all(rows[digest(f"text {index}")] == clock.now for index in range(64))
+    clock.now += 100
+    assert memory.get("en", "es", "text 0") == "texto 0"
+    assert _rows(path)[digest("text 0")] == clock.now - 100
+    # The pending ones are written when the memory is closed
+    memory.close()
+    assert _rows(path)[digest("text 0")] == clock.now
@@ -0,0 +1,67 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+import exporter
+import metrics
+
+
+def _statistics() -> dict:
+    return {"cache-hits": 7, "retries": 2, "queue-depth": 3, "cache-hit-ratio": 0.5, "circuit-state": "closed"}
+
+
+@pytest.fixture
+def endpoint():
+    metrics.reset()
+    metrics.register_collector(_statistics)
+    exporters = exporter.start(port=0)
+    try:
+        yield f"http://127.0.0.1:{exporters[0].get_port()}"
+    finally:
+        exporter.stop()
+        metrics.unregister_collector(_statistics)
+        metrics.reset()
+
+
+def _scrape(url: str) -> list:
+    with urllib.request.urlopen(url, timeout=5) as response:
+        assert response.headers["Content-Type"] == exporter.CONTENT_TYPE
+        return response.read().decode("utf-8").splitlines()
+
+
+def test_histograms_counters_and_statistics_are_scraped(endpoint):
+    metrics.observe("translate", 0.02)
+    metrics.observe("translate", 0.3)
+    metrics.increment("translation_errors", type="TimeoutError")
+    lines = _scrape(endpoint + "/metrics")
+    stage = "transclip_stage_duration_seconds"
+    assert f"# TYPE {stage} histogram" in lines
+    buckets = [line for line in lines if line.startswith(stage + '_bucket{stage="translate"')]
+    assert buckets[-1] == stage + '_bucket{stage="translate",le="+Inf"} 2'
+    assert any(line.startswith(stage + '_sum{stage="translate"} ') for line in lines)
+    assert stage + '_count{stage="translate"} 2' in lines
+    assert "# TYPE transclip_translation_errors_total counter" in lines
+    assert 'transclip_translation_errors_total{type="TimeoutError"} 1' in lines
+    for key, value in _statistics().items():
+        name = exporter.PREFIX + key.replace("-", "_")
+        if key in exporter.MONOTONIC_STATISTICS:
+            assert f"# TYPE {name}_total counter" in lines
+            assert f"{name}_total {value}" in lines
+        elif isinstance(value, (int, float)):
+            assert f"# TYPE {name} gauge" in lines
+            assert f"{name} {value}" in lines
+        else:
+            assert not any(line.startswith(name) for line in lines)
+
+
+def test_other_paths_are_not_found(endpoint):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(endpoint + "/other", timeout=5)
+    assert error.value.code == 404
+
+
+def test_stop_closes_the_endpoint(endpoint):
+    exporter.stop()
+    with pytest.raises(urllib.error.URLError):
+        urllib.request.urlopen(endpoint + "/metrics", timeout=5)
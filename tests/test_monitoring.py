@@ -0,0 +1,111 @@
+import time
+from threading import Condition, Event
+
+import pytest
+
+from clipboard import FakeClipboard
+from impl import AbstractTranslator, Requester
+from monitoring import ClipboardMonitor
+from sources import AdaptiveScheduler, FakeChangeSource, PollingChangeSource
+
+
+class _BlockingTranslator(AbstractTranslator):
+    """Converts the text to upper case, the texts indicated wait until they are released"""
+
+    def __init__(self, blocked: str):
+        super(_BlockingTranslator, self).__init__()
+        self.blocked = blocked
+        self.released = Event()
+
+    def translate(self, text: str) -> str:
+        if text == self.blocked:
+            self.released.wait(5.0)
+        return text.upper()
+
+
+class _FailingTranslator(AbstractTranslator):
+    """Fails until it is repaired, then converts the text to upper case"""
+
+    def __init__(self):
+        super(_FailingTranslator, self).__init__()
+        self.calls = 0
+        self.failing = True
+
+    def translate(self, text: str) -> str:
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("unreachable")
+        return text.upper()
+
+
+class _CountingRequester(Requester):
+    """Counts how many times each content is shown"""
+
+    def __init__(self):
+        super(_CountingRequester, self).__init__()
+        self.condition = Condition()
+        self.shown = {}
+
+    def set_content(self, target: str, content):
+        with self.condition:
+            self.shown[(target, content)] = self.shown.get((target, content), 0) + 1
+            self.condition.notify_all()
+
+    def wait_for(self, target: str, content: str, times: int = 1) -> None:
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.shown.get((target, content), 0) >= times, 5.0):
+                raise TimeoutError(f"'{content}' was not shown {times} times in {target}")
+
+
+def _wait_until(condition) -> None:
+    deadline = time.monotonic() + 5.0
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("The condition was not met in time")
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("copy_translation", [False, True])
+def test_content_copied_again_after_another_is_translated(copy_translation):
+    clipboard = FakeClipboard()
+    requester = _CountingRequester()
+    translator = _BlockingTranslator("second text")
+    monitor = ClipboardMonitor(
+        requester, translator, 0.5, FakeChangeSource(clipboard, 0.05), copy_translation=copy_translation
+    )
+    monitor.start_monitoring()
+    try:
+        clipboard.copy("first text")
+        requester.wait_for("target", "FIRST TEXT")
+        # The content written back by the monitor is read and recognized
+        _wait_until(lambda: monitor.get_skipped() >= 1)
+        clipboard.copy("second text")
+        requester.wait_for("source", "second text")
+        clipboard.copy("first text")
+        requester.wait_for("source", "first text", times=2)
+    finally:
+        translator.released.set()
+        monitor.stop_monitoring()
+    assert monitor.get_skipped() == 1
+
+
+def test_failed_content_is_retried_after_a_growing_delay(monkeypatch):
+    monkeypatch.setattr(ClipboardMonitor, "RETRY_DELAY", 0.1)
+    clipboard = FakeClipboard()
+    requester = _CountingRequester()
+    translator = _FailingTranslator()
+    scheduler = AdaptiveScheduler(0.01, 0.05, 1.5)
+    source = PollingChangeSource(0.01, clipboard.paste, clipboard.copy, scheduler)
+    monitor = ClipboardMonitor(requester, translator, 0.01, source)
+    monitor.start_monitoring()
+    try:
+        clipboard.copy("first text")
+        time.sleep(0.8)
+        # Sent at once and retried after 0.1, 0.2 and 0.4 seconds instead of on every reading
+        assert 2 <= translator.calls <= 5
+        # The retries do not bring the polling back to the minimum interval
+        assert scheduler.get_statistics()["poll-interval"] == 0.05
+        translator.failing = False
+        requester.wait_for("target", "FIRST TEXT")
+    finally:
+        monitor.stop_monitoring()
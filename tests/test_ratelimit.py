@@ -0,0 +1,78 @@
+from threading import Lock
+
+import pytest
+
+from impl import AbstractTranslator
+from ratelimit import RateLimitedTranslator
+from resilience import ResilientTranslator
+from translation import translate_packed
+
+
+class _CountingEngine(AbstractTranslator):
+    """Packs the batches like the engines do and counts the requests, it can drop the marker between the texts"""
+
+    def __init__(self, mangle: bool = False):
+        super(_CountingEngine, self).__init__()
+        self.mangle = mangle
+        self.requests = 0
+        self.lock = Lock()
+
+    def translate(self, text: str) -> str:
+        with self.lock:
+            self.requests += 1
+        if self.mangle:
+            text = text.replace("[[", "").replace("]]", "")
+        return text.upper()
+
+    def translate_batch(self, texts: list) -> list:
+        return translate_packed(self.translate, texts)
+
+
+class _CountingLimiter:
+    """Lets every request through and counts the tokens taken"""
+
+    def __init__(self):
+        self.tokens = 0
+        self.lock = Lock()
+
+    def acquire(self) -> None:
+        with self.lock:
+            self.tokens += 1
+
+    def try_acquire(self) -> bool:
+        self.acquire()
+        return True
+
+    def get_statistics(self) -> dict:
+        return {}
+
+
+def _rate_limited(engine, limiter):
+    return RateLimitedTranslator(engine, limiter)
+
+
+def _resilient(engine, limiter):
+    return ResilientTranslator(engine, timeout=5.0, limiter=limiter)
+
+
+@pytest.mark.parametrize("wrap", [_rate_limited, _resilient])
+@pytest.mark.parametrize(
+    "texts, mangle",
+    [
+        # Every text fills a request on its own
+        (["a" * 3000, "b" * 3000, "c" * 3000], False),
+        # The texts fit in one request but the marker is lost, so they are sent again one by one
+        (["first", "second", "third"], True),
+        (["first", "second", "third"], False),
+    ],
+)
+def test_every_engine_request_of_a_batch_takes_a_token(wrap, texts, mangle):
+    engine = _CountingEngine(mangle)
+    limiter = _CountingLimiter()
+    translator = wrap(engine, limiter)
+    try:
+        assert translator.translate_batch(texts) == [text.upper() for text in texts]
+    finally:
+        translator.close()
+    assert engine.requests > 0
+    assert limiter.tokens == engine.requests
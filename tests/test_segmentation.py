@@ -0,0 +1,163 @@
+import time
+from threading import Lock
+
+import pytest
+
+from impl import AbstractTranslator
+from segmentation import ChunkedTranslator, SegmentedTranslator, split_chunks
+
+
+class StubTranslator(AbstractTranslator):
+    """Converts the texts to upper case, the first pieces take longer so they are completed out of order"""
+
+    def __init__(self, delays: dict = None):
+        super(StubTranslator, self).__init__()
+        self.delays = delays or {}
+        self.requests = []
+        self.lock = Lock()
+
+    def translate(self, text: str) -> str:
+        with self.lock:
+            self.requests.append(text)
+        time.sleep(self.delays.get(text, 0.0))
+        return text.upper()
+
+    def get_source(self) -> str:
+        return "en"
+
+    def get_target(self) -> str:
+        return "es"
+
+
+def paragraphs(count: int) -> str:
+    return "\n\n".join(f"Paragraph number {index}. It has two sentences." for index in range(count))
+
+
+def test_split_chunks_respects_limit_and_joins_back():
+    text = paragraphs(40) + "\n\n" + "x" * 250 + "  tail"
+    chunks = split_chunks(text, 100)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+
+def test_short_text_is_sent_whole():
+    stub = StubTranslator()
+    translator = ChunkedTranslator(stub, 4500, 4)
+    try:
+        assert translator.translate("Hello world.") == "HELLO WORLD."
+    finally:
+        translator.close()
+    assert stub.requests == ["Hello world."]
+
+
+def test_chunks_completed_out_of_order_are_reassembled_in_order():
+    text = paragraphs(30)
+    chunks = split_chunks(text, 120)
+    assert len(chunks) > 4
+    # The earlier a piece is, the longer it takes
+    delays = {chunk.strip(): 0.01 * (len(chunks) - index) for index, chunk in enumerate(chunks)}
+    stub = StubTranslator(delays)
+    translator = ChunkedTranslator(stub, 120, 4)
+    try:
+        assert translator.translate(text) == text.upper()
+    finally:
+        translator.close()
+    assert sorted(stub.requests) == sorted(chunk.strip() for chunk in chunks)
+    assert all(len(request) <= 120 for request in stub.requests)
+
+
+def test_progress_receives_growing_prefixes_in_order():
+    text = paragraphs(30)
+    chunks = split_chunks(text, 120)
+    delays = {chunk.strip(): 0.005 * (index % 3) for index, chunk in enumerate(chunks)}
+    translator = ChunkedTranslator(StubTranslator(delays), 120, 4)
+    partials = []
+    translator.set_progress_listener(partials.append)
+    try:
+        result = translator.translate(text)
+    finally:
+        translator.close()
+    assert len(partials) > 0
+    for previous, current in zip(partials, partials[1:]):
+        assert len(current) > len(previous)
+        assert current.startswith(previous)
+    assert all(result.startswith(partial) for partial in partials)
+
+
+def test_batch_translates_long_texts_by_chunks():
+    long_text = paragraphs(20)
+    stub = StubTranslator()
+    translator = ChunkedTranslator(stub, 120, 4)
+    try:
+        assert translator.translate_batch(["Short one.", long_text]) == ["SHORT ONE.", long_text.upper()]
+    finally:
+        translator.close()
+    assert all(len(request) <= 120 for request in stub.requests)
+
+
+def test_failed_chunk_raises():
+    class FailingTranslator(StubTranslator):
+        def translate(self, text: str) -> str:
+            if "number 7" in text:
+                raise ConnectionError("unreachable")
+            return super().translate(text)
+
+    translator = ChunkedTranslator(FailingTranslator(), 120, 4)
+    try:
+        with pytest.raises(ConnectionError):
+            translator.translate(paragraphs(20))
+    finally:
+        translator.close()
+
+
+class BatchRecordingTranslator(StubTranslator):
+    """Records the batches apart from the single requests"""
+
+    def __init__(self):
+        super(BatchRecordingTranslator, self).__init__()
+        self.batches = []
+
+    def translate_batch(self, texts: list) -> list:
+        self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+
+def test_new_text_sends_its_segments_in_a_single_batch():
+    stub = BatchRecordingTranslator()
+    translator = SegmentedTranslator(stub)
+    text = "First paragraph.\n\n  Second paragraph.  \n\n\nFirst paragraph.\n\nThird one."
+    assert translator.translate(text) == text.upper()
+    # The repeated paragraph is sent once and the spaces around the paragraphs are kept
+    assert stub.batches == [["First paragraph.", "Second paragraph.", "Third one."]]
+    assert stub.requests == []
+
+
+def test_edited_text_only_sends_the_missing_segments():
+    stub = BatchRecordingTranslator()
+    translator = SegmentedTranslator(stub)
+    translator.translate("One.\n\nTwo.\n\nThree.")
+    assert translator.translate("One.\n\nTwo, edited.\n\nThree.") == "ONE.\n\nTWO, EDITED.\n\nTHREE."
+    # A single missing segment is sent as a plain request
+    assert stub.requests == ["Two, edited."]
+    translator.translate_batch(["One.\n\nFour.", "Five.\n\nTwo."])
+    assert stub.batches[1:] == [["Four.", "Five."]]
+    statistics = translator.get_statistics()
+    assert statistics["segments"] == 10
+    assert statistics["segments-translated"] == 6
+
+
+def test_sentence_mode_reuses_the_unchanged_sentences():
+    stub = BatchRecordingTranslator()
+    translator = SegmentedTranslator(stub, "sentence")
+    translator.translate("One sentence. Another one!")
+    assert translator.translate("One sentence. A new one?") == "ONE SENTENCE. A NEW ONE?"
+    assert stub.batches == [["One sentence.", "Another one!"]]
+    assert stub.requests == ["A new one?"]
+
+
+def test_forgotten_segments_are_translated_again():
+    stub = BatchRecordingTranslator()
+    translator = SegmentedTranslator(stub, capacity=2)
+    translator.translate("One.\n\nTwo.\n\nThree.")
+    translator.translate("One.\n\nThree.")
+    assert stub.requests == ["One."]
@@ -0,0 +1,167 @@
+import os
+import socket
+from threading import Thread
+
+import pytest
+
+from impl import AbstractTranslator
+from server import (
+    MAX_FRAME_SIZE,
+    ProtocolException,
+    RemoteTranslator,
+    TranslationServer,
+    receive_frame,
+    send_frame,
+)
+
+
+class _UpperTranslator(AbstractTranslator):
+    def translate(self, text: str) -> str:
+        return text.upper()
+
+    def get_source(self) -> str:
+        return "en"
+
+    def get_target(self) -> str:
+        return "es"
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = TranslationServer(_UpperTranslator(), str(tmp_path / "transclip.sock"))
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _listen(path: str) -> socket.socket:
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(8)
+    return listener
+
+
+def test_frames_are_read_back():
+    first, second = socket.socketpair()
+    try:
+        send_frame(first, {"text": "adiós ✓", "texts": ["a", "b"]})
+        assert receive_frame(second) == {"text": "adiós ✓", "texts": ["a", "b"]}
+        first.close()
+        assert receive_frame(second) is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_truncated_and_oversized_frames_are_rejected():
+    first, second = socket.socketpair()
+    try:
+        first.sendall(b"\x00\x00\x00\x10{}")
+        first.close()
+        with pytest.raises(ProtocolException):
+            receive_frame(second)
+    finally:
+        second.close()
+    first, second = socket.socketpair()
+    try:
+        first.sendall((MAX_FRAME_SIZE + 1).to_bytes(4, "big"))
+        with pytest.raises(ProtocolException):
+            receive_frame(second)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_client_translates_through_the_server(server):
+    client = RemoteTranslator(server.server_address, timeout=5.0)
+    try:
+        assert client.translate("hello") == "HELLO"
+        assert client.translate_batch(["a", "b"]) == ["A", "B"]
+        assert [client.get_source(), client.get_target()] == ["en", "es"]
+        assert client.get_statistics()["server-requests"] == 4
+    finally:
+        client.close()
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = str(tmp_path / "transclip.sock")
+    # A socket left by a server that ended without removing it
+    _listen(path).close()
+    assert os.path.exists(path)
+    server = TranslationServer(_UpperTranslator(), path)
+    server.server_close()
+    assert not os.path.exists(path)
+
+
+def test_socket_of_a_running_server_is_kept(server):
+    with pytest.raises(OSError):
+        TranslationServer(_UpperTranslator(), server.server_address)
+    assert os.path.exists(server.server_address)
+
+
+def test_regular_file_is_not_deleted(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("{}")
+    with pytest.raises(FileExistsError):
+        TranslationServer(_UpperTranslator(), str(path))
+    assert path.read_text() == "{}"
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_PEERCRED"), reason="The system does not report the peer user")
+def test_server_of_another_user_is_refused(server):
+    client = RemoteTranslator(server.server_address, timeout=5.0, owner=os.getuid() + 1)
+    with pytest.raises(PermissionError):
+        client.translate("hello")
+
+
+def test_connection_closed_by_the_server_is_replaced(tmp_path):
+    path = str(tmp_path / "transclip.sock")
+    listener = _listen(path)
+    accepted = []
+
+    def serve():
+        # Every connection answers a single request and is closed, like a server that restarts
+        for _ in range(2):
+            connection, _ = listener.accept()
+            accepted.append(connection)
+            request = receive_frame(connection)
+            send_frame(connection, {"result": request["text"].upper()})
+            connection.close()
+
+    thread = Thread(target=serve, daemon=True)
+    thread.start()
+    client = RemoteTranslator(path, timeout=5.0)
+    try:
+        assert client.translate("first") == "FIRST"
+        assert client.translate("second") == "SECOND"
+    finally:
+        client.close()
+        listener.close()
+    thread.join(5)
+    assert len(accepted) == 2
+
+
+def test_request_is_not_sent_again_after_a_timeout(tmp_path):
+    path = str(tmp_path / "transclip.sock")
+    listener = _listen(path)
+    received = []
+
+    def serve():
+        # The requests are read but never answered
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            received.append(receive_frame(connection))
+
+    Thread(target=serve, daemon=True).start()
+    client = RemoteTranslator(path, timeout=0.2)
+    try:
+        with pytest.raises(OSError):
+            client.translate("hello")
+    finally:
+        client.close()
+        listener.close()
+    assert len(received) == 1
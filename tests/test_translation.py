@@ -0,0 +1,220 @@
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Thread, Lock
+
+import pytest
+
+import translation
+from httpclient import EventLoopThread
+from impl import AbstractTranslator
+from translation import (
+    PooledGoogleTranslator,
+    PlainTextTranslator,
+    SingleFlightTranslator,
+    HttpStatusException,
+    TranslationException,
+)
+
+
+class _GoogleHandler(BaseHTTPRequestHandler):
+    """Answers like the translation page, the status and the Connection header are taken from the server"""
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+
+    def do_GET(self):
+        self.server.record(self.client_address)
+        body = '<html><div class="result-container">hola &amp; adiós</div></html>'.encode("utf-8")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.close_connections:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _GoogleServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super(_GoogleServer, self).__init__(("127.0.0.1", 0), _GoogleHandler)
+        self.status = 200
+        self.close_connections = False
+        self.requests = 0
+        self.clients = set()
+        self.lock = Lock()
+
+    def record(self, client_address) -> None:
+        with self.lock:
+            self.requests += 1
+            self.clients.add(client_address)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = _GoogleServer()
+    Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(translation, "GOOGLE_URL", f"http://127.0.0.1:{server.server_address[1]}/m")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_connection_is_reused_between_requests(server):
+    translator = PooledGoogleTranslator("en", "es")
+    try:
+        for index in range(5):
+            assert translator.translate(f"hello and goodbye {index}") == "hola & adiós"
+        statistics = translator.get_statistics()
+    finally:
+        translator.close()
+    assert server.requests == 5
+    assert len(server.clients) == 1
+    assert statistics == {"connections-opened": 1, "connections-reused": 4}
+
+
+def test_connection_closed_by_server_is_replaced(server):
+    server.close_connections = True
+    translator = PooledGoogleTranslator("en", "es")
+    try:
+        for index in range(3):
+            assert translator.translate(f"hello {index}") == "hola & adiós"
+        statistics = translator.get_statistics()
+    finally:
+        translator.close()
+    assert len(server.clients) == 3
+    assert statistics["connections-opened"] == 3
+    assert statistics["connections-reused"] == 0
+
+
+def test_unexpected_status_raises_with_the_status(server):
+    server.status = 503
+    translator = PooledGoogleTranslator("en", "es")
+    try:
+        with pytest.raises(HttpStatusException) as error:
+            translator.translate("hello")
+    finally:
+        translator.close()
+    assert error.value.status == 503
+
+
+def test_close_stops_the_event_loop(server):
+    translator = PooledGoogleTranslator("en", "es")
+    loop = EventLoopThread.get_instance()
+    loop.release()
+    translator.translate("hello")
+    translator.close()
+    loop.join(5)
+    assert not loop.is_alive()
+    # A new translator starts a new loop
+    translator = PooledGoogleTranslator("en", "es")
+    try:
+        assert translator.translate("hello") == "hola & adiós"
+    finally:
+        translator.close()
+
+
+def test_plain_translator_reads_the_page_and_reports_the_status(server):
+    translator = PlainTextTranslator("en", "es", timeout=5.0)
+    assert translator.translate("hello") == "hola & adiós"
+    server.status = 429
+    with pytest.raises(HttpStatusException) as error:
+        translator.translate("hello")
+    assert error.value.status == 429
+
+
+@pytest.mark.parametrize("source, target", [("en", "en"), ("english", "es"), ("en", "auto"), ("en", "")])
+def test_unsupported_languages_are_rejected(source, target):
+    with pytest.raises(TranslationException):
+        PlainTextTranslator(source, target)
+
+
+def test_region_and_automatic_languages_are_accepted():
+    PlainTextTranslator("auto", "zh-CN")
+
+
+class _GatedTranslator(AbstractTranslator):
+    """Counts the calls and keeps them waiting until the gate is opened, then answers or raises the error"""
+
+    def __init__(self, error: Exception = None):
+        super(_GatedTranslator, self).__init__()
+        self.error = error
+        self.calls = []
+        self.entered = Event()
+        self.gate = Event()
+
+    def translate(self, text: str) -> str:
+        self.calls.append(text)
+        self.entered.set()
+        self.gate.wait(5.0)
+        if self.error is not None:
+            raise self.error
+        return text.upper()
+
+    def get_source(self) -> str:
+        return "en"
+
+    def get_target(self) -> str:
+        return "es"
+
+
+def _run_concurrently(translator, engine: _GatedTranslator, texts: list) -> list:
+    """Translates each text in its own thread, the first one reaches the engine before the others start, and returns
+    the result or the error of each one"""
+    outcomes = [None] * len(texts)
+
+    def run(index):
+        try:
+            outcomes[index] = translator.translate(texts[index])
+        except Exception as ex:
+            outcomes[index] = ex
+
+    threads = [Thread(target=run, args=(index,)) for index in range(len(texts))]
+    threads[0].start()
+    engine.entered.wait(5.0)
+    for thread in threads[1:]:
+        thread.start()
+    # The others wait behind the first call before it is answered
+    deadline = time.monotonic() + 5.0
+    expected = len([text for text in texts[1:] if text == texts[0]])
+    while translator.get_statistics()["deduplicated"] < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    engine.gate.set()
+    for thread in threads:
+        thread.join(5.0)
+    return outcomes
+
+
+def test_concurrent_requests_of_the_same_text_share_one_call():
+    engine = _GatedTranslator()
+    translator = SingleFlightTranslator(engine)
+    assert _run_concurrently(translator, engine, ["hello"] * 8) == ["HELLO"] * 8
+    assert engine.calls == ["hello"]
+    statistics = translator.get_statistics()
+    assert statistics["backend-calls"] == 1
+    assert statistics["deduplicated"] == 7
+    # Once answered the next request reaches the engine again
+    assert translator.translate("hello") == "HELLO"
+    assert engine.calls == ["hello", "hello"]
+
+
+def test_error_of_the_shared_call_reaches_every_caller():
+    error = ConnectionError("unreachable")
+    engine = _GatedTranslator(error)
+    translator = SingleFlightTranslator(engine)
+    outcomes = _run_concurrently(translator, engine, ["hello"] * 4)
+    assert all(outcome is error for outcome in outcomes)
+    assert engine.calls == ["hello"]
+
+
+def test_different_texts_are_not_shared():
+    engine = _GatedTranslator()
+    translator = SingleFlightTranslator(engine)
+    assert _run_concurrently(translator, engine, ["hello", "goodbye"]) == ["HELLO", "GOODBYE"]
+    assert sorted(engine.calls) == ["goodbye", "hello"]
+    assert translator.get_statistics()["deduplicated"] == 0